@@ -1,652 +1,5070 @@
-import pygame
-import random
-import sys
-import math
-
-# ---------------------
-# PARAMETROS GLOBALES Y CONSTANTES
-# ---------------------
-NUM_CASILLAS_EXTERNAS = 68
-NUM_CASILLAS_INTERNAS = 8
-TAMANO_TABLERO = 600
-MARGEN = 20
-CELDA = 40
-
-# Colores
-COLOR_FONDO = (240, 240, 240)
-COLOR_TABLERO = (220, 220, 200)
-COLOR_TEXTO = (30, 30, 30)
-COLOR_BOTON = (100, 150, 200)
-COLOR_BOTON_HOVER = (120, 170, 220)
-COLOR_DADO = (250, 250, 250)
-COLOR_DADO_PUNTO = (30, 30, 30)
-COLORES_JUGADORES = {
-    "Rojo": (220, 60, 60),
-    "Azul": (60, 100, 220),
-    "Verde": (60, 160, 60),
-    "Amarillo": (220, 180, 40)
-}
-
-# ---------------------
-# CLASES DEL JUEGO: FICHA Y JUGADOR
-# ---------------------
-class Ficha:
-    def __init__(self, jugador, id_ficha):
-        self.jugador = jugador
-        self.id_ficha = id_ficha
-        self.estado = "carcel"
-    
-    def __str__(self):
-        if self.estado == "carcel":
-            return f"{self.jugador.nombre}{self.id_ficha}(carcel)"
-        elif isinstance(self.estado, int):
-            return f"{self.jugador.nombre}{self.id_ficha}(ext {self.estado})"
-        elif isinstance(self.estado, tuple) and self.estado[0] == "interna":
-            return f"{self.jugador.nombre}{self.id_ficha}(int {self.estado[1]})"
-        return f"{self.jugador.nombre}{self.id_ficha}(?)"
-
-class Jugador:
-    def __init__(self, nombre, color, salida, entrada_hogar):
-        self.nombre = nombre
-        self.color = color
-        self.salida = salida
-        self.entrada_hogar = entrada_hogar
-        self.fichas = [Ficha(self, i) for i in range(4)]
-        self.contador_dobles = 0
-        self.movimientos_extra = 0
-        self.ultima_ficha_movida = None
-    
-    def todas_llegaron(self):
-        for f in self.fichas:
-            if not (isinstance(f.estado, tuple) and f.estado[0] == "interna" and f.estado[1] == (NUM_CASILLAS_INTERNAS - 1)):
-                return False
-        return True
-
-# ---------------------
-# CREACION DE JUGADORES
-# ---------------------
-jugadores = [
-    Jugador("Rojo", "red", salida=0, entrada_hogar=67),
-    Jugador("Azul", "blue", salida=17, entrada_hogar=16),
-    Jugador("Verde", "green", salida=34, entrada_hogar=33),
-    Jugador("Amarillo", "yellow", salida=51, entrada_hogar=50),
-]
-
-# ---------------------
-# TABLERO EXTERNO Y CASILLAS SEGURAS
-# ---------------------
-posiciones_de_tablero = {i: [] for i in range(NUM_CASILLAS_EXTERNAS)}
-casillas_seguras = {j.salida for j in jugadores}
-
-# ---------------------
-# FUNCIONES DE UTILIDAD
-# ---------------------
-def es_bloqueo(pos):
-    if len(posiciones_de_tablero[pos]) == 2:
-        f0, f1 = posiciones_de_tablero[pos]
-        if f0.jugador == f1.jugador:
-            return True
-    return False
-
-def verificar_camino(inicio, pasos):
-    for i in range(1, pasos):
-        pos_verificar = (inicio + i) % NUM_CASILLAS_EXTERNAS
-        if es_bloqueo(pos_verificar):
-            return False, pos_verificar
-    return True, None
-
-# ---------------------
-# COORDENADAS PARA EL DIBUJO DEL TABLERO
-# ---------------------
-coordenadas_del_tablero_externo = {}
-longitud_lado = 17
-top_y = MARGEN
-left_x = MARGEN
-right_x = TAMANO_TABLERO - MARGEN
-bottom_y = TAMANO_TABLERO - MARGEN
-
-for i in range(longitud_lado):
-    pos = i
-    x = left_x + i * ((right_x - left_x) // (longitud_lado - 1))
-    y = top_y
-    coordenadas_del_tablero_externo[pos] = (x, y)
-for i in range(longitud_lado):
-    pos = 17 + i
-    x = right_x
-    y = top_y + i * ((bottom_y - top_y) // (longitud_lado - 1))
-    coordenadas_del_tablero_externo[pos] = (x, y)
-for i in range(longitud_lado):
-    pos = 34 + i
-    x = right_x - i * ((right_x - left_x) // (longitud_lado - 1))
-    y = bottom_y
-    coordenadas_del_tablero_externo[pos] = (x, y)
-for i in range(longitud_lado):
-    pos = 51 + i
-    x = left_x
-    y = bottom_y - i * ((bottom_y - top_y) // (longitud_lado - 1))
-    coordenadas_del_tablero_externo[pos] = (x, y)
-
-# Funciones para construir las vías internas
-def construir_coordenadas_de_la_via_interna_rojo():
-    coords = []
-    centro_x = TAMANO_TABLERO // 2
-    centro_y = TAMANO_TABLERO // 2
-    for i in range(NUM_CASILLAS_INTERNAS):
-        x = centro_x
-        y = centro_y - (i + 1) * CELDA
-        coords.append((x, y))
-    return coords
-
-def construir_coordenadas_de_la_via_interna_azul():
-    coords = []
-    centro_x = TAMANO_TABLERO // 2
-    centro_y = TAMANO_TABLERO // 2
-    for i in range(NUM_CASILLAS_INTERNAS):
-        x = centro_x + (i + 1) * CELDA
-        y = centro_y
-        coords.append((x, y))
-    return coords
-
-def construir_coordenadas_de_la_via_interna_verde():
-    coords = []
-    centro_x = TAMANO_TABLERO // 2
-    centro_y = TAMANO_TABLERO // 2
-    for i in range(NUM_CASILLAS_INTERNAS):
-        x = centro_x
-        y = centro_y + (i + 1) * CELDA
-        coords.append((x, y))
-    return coords
-
-def construir_coordenadas_de_la_via_interna_amarillo():
-    coords = []
-    centro_x = TAMANO_TABLERO // 2
-    centro_y = TAMANO_TABLERO // 2
-    for i in range(NUM_CASILLAS_INTERNAS):
-        x = centro_x - (i + 1) * CELDA
-        y = centro_y
-        coords.append((x, y))
-    return coords
-
-coordenadas_de_la_via_interna = {
-    "Rojo": construir_coordenadas_de_la_via_interna_rojo(),
-    "Azul": construir_coordenadas_de_la_via_interna_azul(),
-    "Verde": construir_coordenadas_de_la_via_interna_verde(),
-    "Amarillo": construir_coordenadas_de_la_via_interna_amarillo(),
-}
-
-# Posiciones de la cárcel
-posiciones_de_la_carcel = {
-    "Rojo": {"x": 80, "y": 100, "offset_y": 25},
-    "Azul": {"x": 500, "y": 100, "offset_y": 25},
-    "Verde": {"x": 400, "y": 400, "offset_y": 25},
-    "Amarillo": {"x": 150, "y": 400, "offset_y": 25},
-}
-
-# ---------------------
-# LOGICA DE MOVIMIENTO
-# ---------------------
-def puede_colocar(ficha, pos):
-    return (len(posiciones_de_tablero[pos]) < 2)
-
-def mover_ficha(ficha, pasos):
-    if ficha.estado == "carcel":
-        if pasos != 5:
-            return f"necesitas un 5 para sacar {ficha} de la carcel."
-        if puede_colocar(ficha, ficha.jugador.salida):
-            ficha.estado = ficha.jugador.salida
-            posiciones_de_tablero[ficha.jugador.salida].append(ficha)
-            ficha.jugador.ultima_ficha_movida = ficha
-            return f"{ficha} sale de la carcel a la casilla {ficha.jugador.salida + 1}."
-        else:
-            return f"la salida de {ficha.jugador.nombre} esta bloqueada."
-    
-    if isinstance(ficha.estado, int):
-        actual = ficha.estado
-        hogar = ficha.jugador.entrada_hogar
-        if hogar >= actual:
-            d = hogar - actual
-        else:
-            d = (NUM_CASILLAS_EXTERNAS - actual) + hogar
-        
-        if pasos == d:
-            valido, bloqueado = verificar_camino(actual, pasos)
-            if not valido:
-                return "movimiento no permitido: camino bloqueado por un bloqueo de dos fichas."
-            if ficha in posiciones_de_tablero[actual]:
-                posiciones_de_tablero[actual].remove(ficha)
-            ficha.estado = ("interna", 0)
-            ficha.jugador.movimientos_extra += 10
-            ficha.jugador.ultima_ficha_movida = ficha
-            return f"{ficha} entra a la via interna."
-        elif pasos > d:
-            return "movimiento no permitido: se requiere exactitud para entrar a la via interna."
-        else:
-            nuevo = (actual + pasos) % NUM_CASILLAS_EXTERNAS
-            valido, bloqueado = verificar_camino(actual, pasos)
-            if not valido:
-                return "movimiento no permitido: camino bloqueado por un bloqueo de dos fichas."
-            if posiciones_de_tablero[nuevo]:
-                ocupante = posiciones_de_tablero[nuevo][0]
-                if ocupante.jugador != ficha.jugador and nuevo not in casillas_seguras:
-                    if ocupante in posiciones_de_tablero[nuevo]:
-                        posiciones_de_tablero[nuevo].remove(ocupante)
-                    ocupante.estado = "carcel"
-                    if ficha in posiciones_de_tablero[actual]:
-                        posiciones_de_tablero[actual].remove(ficha)
-                    posiciones_de_tablero[nuevo].append(ficha)
-                    ficha.estado = nuevo
-                    bonus = 20
-                    bonus_dest = (nuevo + bonus) % NUM_CASILLAS_EXTERNAS
-                    valido_bonus, bloqueado_bonus = verificar_camino(nuevo, bonus)
-                    if not valido_bonus:
-                        return "movimiento bonus no permitido: camino bloqueado por un bloqueo de dos fichas."
-                    if not puede_colocar(ficha, bonus_dest):
-                        return "movimiento bonus no permitido: casilla destino bloqueada."
-                    if ficha in posiciones_de_tablero[nuevo]:
-                        posiciones_de_tablero[nuevo].remove(ficha)
-                    posiciones_de_tablero[bonus_dest].append(ficha)
-                    ficha.estado = bonus_dest
-                    ficha.jugador.ultima_ficha_movida = ficha
-                    return f"{ficha} captura a {ocupante} y se mueve 20 casillas adicionales a la casilla {bonus_dest + 1}."
-            if ficha in posiciones_de_tablero[actual]:
-                posiciones_de_tablero[actual].remove(ficha)
-            posiciones_de_tablero[nuevo].append(ficha)
-            ficha.estado = nuevo
-            ficha.jugador.ultima_ficha_movida = ficha
-            return f"{ficha} se mueve de la casilla {actual + 1} a {nuevo + 1}."
-    
-    if isinstance(ficha.estado, tuple) and ficha.estado[0] == "interna":
-        indice = ficha.estado[1]
-        nuevo_indice = indice + pasos
-        if nuevo_indice >= NUM_CASILLAS_INTERNAS:
-            return "movimiento no valido en la via interna (requiere exactitud)."
-        ficha.estado = ("interna", nuevo_indice)
-        ficha.jugador.ultima_ficha_movida = ficha
-        if nuevo_indice == NUM_CASILLAS_INTERNAS - 1:
-            ficha.jugador.movimientos_extra += 10
-            return f"{ficha} ha llegado a la meta."
-        return f"{ficha} avanza en la via interna a la casilla {nuevo_indice + 1}."
-    
-    return "movimiento desconocido."
-
-# ---------------------
-# INTERFAZ GRAFICA CON PYGAME
-# ---------------------
-class InterfazParquesPygame:
-    def __init__(self):
-        pygame.init()
-        self.screen_width = TAMANO_TABLERO
-        self.screen_height = TAMANO_TABLERO + 100  # Espacio adicional para controles
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
-        pygame.display.set_caption("Parques Tradicional")
-        
-        self.font = pygame.font.SysFont(None, 24)
-        self.title_font = pygame.font.SysFont(None, 32)
-        self.dado_font = pygame.font.SysFont(None, 30)
-        
-        # Variables de estado
-        self.indice_jugador_actual = 0
-        self.valores_dados = []
-        self.ficha_seleccionada = None
-        self.ultimo_doble = False
-        self.mensaje_estado = ""
-        self.mensaje_turno = ""
-        
-        # Botones
-        self.boton_lanzar = pygame.Rect(50, TAMANO_TABLERO + 20, 120, 40)
-        self.boton_terminar = pygame.Rect(200, TAMANO_TABLERO + 20, 120, 40)
-        
-        self.actualizar_mensaje_turno()
-        self.dibujar_tablero()
-    
-    def actualizar_mensaje_turno(self):
-        actual = jugadores[self.indice_jugador_actual]
-        self.mensaje_turno = f"Turno de: {actual.nombre} ({actual.color})"
-    
-    def dibujar_tablero(self):
-        # Fondo
-        self.screen.fill(COLOR_FONDO)
-        
-        # Dibujar el tablero
-        pygame.draw.rect(self.screen, COLOR_TABLERO, 
-                        (MARGEN, MARGEN, 
-                         TAMANO_TABLERO - 2*MARGEN, 
-                         TAMANO_TABLERO - 2*MARGEN))
-        
-        # Dibujar cuadrícula central
-        centro = TAMANO_TABLERO // 2
-        pygame.draw.line(self.screen, (0, 0, 0), 
-                        (centro, MARGEN), 
-                        (centro, TAMANO_TABLERO - MARGEN), 2)
-        pygame.draw.line(self.screen, (0, 0, 0), 
-                        (MARGEN, centro), 
-                        (TAMANO_TABLERO - MARGEN, centro), 2)
-        
-        # Dibujar casillas externas
-        for pos, (cx, cy) in coordenadas_del_tablero_externo.items():
-            # Dibujar casilla
-            rect = pygame.Rect(cx - 15, cy - 15, 30, 30)
-            pygame.draw.rect(self.screen, (200, 200, 200), rect)
-            pygame.draw.rect(self.screen, (100, 100, 100), rect, 1)
-            
-            # Numerar casillas importantes
-            num_casillas = pos + 1
-            if num_casillas in [1, 18, 35, 52, 68]:
-                texto = self.font.render(str(num_casillas), True, (0, 0, 0))
-                self.screen.blit(texto, (cx - 5, cy - 8))
-        
-        # Dibujar vías internas
-        for j in jugadores:
-            lista_coords = coordenadas_de_la_via_interna[j.nombre]
-            for i, (cx, cy) in enumerate(lista_coords):
-                rect = pygame.Rect(cx - 15, cy - 15, 30, 30)
-                pygame.draw.rect(self.screen, (240, 240, 240), rect)
-                pygame.draw.rect(self.screen, (100, 100, 100), rect, 1)
-                texto = self.font.render(str(i+1), True, (0, 0, 0))
-                self.screen.blit(texto, (cx - 5, cy - 8))
-        
-        # Dibujar fichas en casillas externas
-        for pos, fichas in posiciones_de_tablero.items():
-            if fichas:
-                cx, cy = coordenadas_del_tablero_externo[pos]
-                for i, ficha in enumerate(fichas):
-                    offset_x = i * 8 - 4
-                    offset_y = i * 8 - 4
-                    color = COLORES_JUGADORES[ficha.jugador.nombre]
-                    pygame.draw.circle(self.screen, color, 
-                                      (cx + offset_x, cy + offset_y), 10)
-                    pygame.draw.circle(self.screen, (0, 0, 0), 
-                                      (cx + offset_x, cy + offset_y), 10, 1)
-                    
-                    # Resaltar ficha seleccionada
-                    if ficha == self.ficha_seleccionada:
-                        pygame.draw.circle(self.screen, (255, 255, 255), 
-                                          (cx + offset_x, cy + offset_y), 12, 2)
-        
-        # Dibujar fichas en la vía interna
-        for j in jugadores:
-            for ficha in j.fichas:
-                if isinstance(ficha.estado, tuple) and ficha.estado[0] == "interna":
-                    indice = ficha.estado[1]
-                    cx, cy = coordenadas_de_la_via_interna[j.nombre][indice]
-                    color = COLORES_JUGADORES[j.nombre]
-                    pygame.draw.circle(self.screen, color, (cx, cy), 10)
-                    pygame.draw.circle(self.screen, (0, 0, 0), (cx, cy), 10, 1)
-                    
-                    # Resaltar ficha seleccionada
-                    if ficha == self.ficha_seleccionada:
-                        pygame.draw.circle(self.screen, (255, 255, 255), 
-                                          (cx, cy), 12, 2)
-        
-        # Dibujar fichas en la cárcel
-        for j in jugadores:
-            pos_carcel = posiciones_de_la_carcel[j.nombre]
-            color = COLORES_JUGADORES[j.nombre]
-            
-            # Etiqueta de la cárcel
-            texto = self.font.render(f"Cárcel {j.nombre}", True, color)
-            self.screen.blit(texto, (pos_carcel["x"] - 30, pos_carcel["y"] - 30))
-            
-            cont = 0
-            for ficha in j.fichas:
-                if ficha.estado == "carcel":
-                    px = pos_carcel["x"]
-                    py = pos_carcel["y"] + cont * pos_carcel["offset_y"]
-                    cont += 1
-                    
-                    # Dibujar triángulo para fichas en cárcel
-                    puntos = [
-                        (px, py - 10),
-                        (px - 10, py + 10),
-                        (px + 10, py + 10)
-                    ]
-                    pygame.draw.polygon(self.screen, color, puntos)
-                    pygame.draw.polygon(self.screen, (0, 0, 0), puntos, 1)
-                    
-                    # Resaltar ficha seleccionada
-                    if ficha == self.ficha_seleccionada:
-                        pygame.draw.polygon(self.screen, (255, 255, 255), [
-                            (px, py - 12),
-                            (px - 12, py + 12),
-                            (px + 12, py + 12)
-                        ], 2)
-        
-        # Dibujar panel de control
-        pygame.draw.rect(self.screen, (230, 230, 230), 
-                        (0, TAMANO_TABLERO, 
-                         self.screen_width, 100))
-        pygame.draw.line(self.screen, (150, 150, 150), 
-                        (0, TAMANO_TABLERO), 
-                        (self.screen_width, TAMANO_TABLERO), 2)
-        
-        # Botón Lanzar dados
-        boton_color = COLOR_BOTON_HOVER if self.boton_lanzar.collidepoint(pygame.mouse.get_pos()) else COLOR_BOTON
-        pygame.draw.rect(self.screen, boton_color, self.boton_lanzar, border_radius=5)
-        pygame.draw.rect(self.screen, (0, 0, 0), self.boton_lanzar, 2, border_radius=5)
-        texto = self.font.render("Lanzar dados", True, (255, 255, 255))
-        self.screen.blit(texto, (self.boton_lanzar.centerx - texto.get_width()//2, 
-                                self.boton_lanzar.centery - texto.get_height()//2))
-        
-        # Botón Terminar turno
-        boton_color = COLOR_BOTON_HOVER if self.boton_terminar.collidepoint(pygame.mouse.get_pos()) else COLOR_BOTON
-        pygame.draw.rect(self.screen, boton_color, self.boton_terminar, border_radius=5)
-        pygame.draw.rect(self.screen, (0, 0, 0), self.boton_terminar, 2, border_radius=5)
-        texto = self.font.render("Terminar turno", True, (255, 255, 255))
-        self.screen.blit(texto, (self.boton_terminar.centerx - texto.get_width()//2, 
-                                self.boton_terminar.centery - texto.get_height()//2))
-        
-        # Información de turno
-        texto = self.title_font.render(self.mensaje_turno, True, COLORES_JUGADORES[jugadores[self.indice_jugador_actual].nombre])
-        self.screen.blit(texto, (400, TAMANO_TABLERO + 15))
-        
-        # Mensaje de estado
-        if self.mensaje_estado:
-            texto = self.font.render(self.mensaje_estado, True, (200, 0, 0))
-            self.screen.blit(texto, (50, TAMANO_TABLERO + 70))
-        
-        # Mostrar dados lanzados
-        if self.valores_dados:
-            for i, valor in enumerate(self.valores_dados):
-                self.dibujar_dado(500 + i*60, TAMANO_TABLERO + 30, valor)
-        
-        pygame.display.flip()
-    
-    def dibujar_dado(self, x, y, valor):
-        # Dibujar el dado
-        dado_rect = pygame.Rect(x, y, 40, 40)
-        pygame.draw.rect(self.screen, COLOR_DADO, dado_rect, border_radius=5)
-        pygame.draw.rect(self.screen, (0, 0, 0), dado_rect, 2, border_radius=5)
-        
-        # Dibujar puntos según el valor
-        radio = 4
-        if valor == 1:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 20, y + 20), radio)
-        elif valor == 2:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 28), radio)
-        elif valor == 3:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 20, y + 20), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 28), radio)
-        elif valor == 4:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 28), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 28), radio)
-        elif valor == 5:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 12), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 20, y + 20), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 28), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 28), radio)
-        elif valor == 6:
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 10), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 10), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 20), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 20), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 12, y + 30), radio)
-            pygame.draw.circle(self.screen, COLOR_DADO_PUNTO, (x + 28, y + 30), radio)
-    
-    def lanzar_dados(self):
-        actual = jugadores[self.indice_jugador_actual]
-        d1 = random.randint(1, 6)
-        d2 = random.randint(1, 6)
-        self.ultimo_doble = (d1 == d2)
-        if d1 == d2:
-            actual.contador_dobles += 1
-        else:
-            actual.contador_dobles = 0
-
-        # Regla de tres dobles consecutivos
-        if actual.contador_dobles == 3:
-            if actual.ultima_ficha_movida is None:
-                if self.ficha_seleccionada is not None:
-                    actual.ultima_ficha_movida = self.ficha_seleccionada
-                else:
-                    for f in actual.fichas:
-                        if f.estado != "carcel":
-                            actual.ultima_ficha_movida = f
-                            break
-                    if actual.ultima_ficha_movida is None:
-                        actual.ultima_ficha_movida = actual.fichas[0]
-            ficha_a_carcel = actual.ultima_ficha_movida
-            if isinstance(ficha_a_carcel.estado, int):
-                pos = ficha_a_carcel.estado
-                if ficha_a_carcel in posiciones_de_tablero[pos]:
-                    posiciones_de_tablero[pos].remove(ficha_a_carcel)
-            ficha_a_carcel.estado = "carcel"
-            self.mensaje_estado = "Tres dobles consecutivos: la ficha " + str(ficha_a_carcel) + " regresa a la cárcel."
-            actual.contador_dobles = 0
-            return
-
-        self.valores_dados = [d1, d2]
-        self.mensaje_estado = "Selecciona una ficha y luego un dado para mover"
-    
-    def usar_dado(self, valor):
-        if self.ficha_seleccionada is None:
-            self.mensaje_estado = "Primero selecciona una ficha."
-            return
-        
-        resultado = mover_ficha(self.ficha_seleccionada, valor)
-        jugadores[self.indice_jugador_actual].ultima_ficha_movida = self.ficha_seleccionada
-        self.valores_dados.remove(valor)
-        self.ficha_seleccionada = None
-        self.mensaje_estado = resultado
-        
-        if not self.valores_dados:
-            self.terminar_turno()
-    
-    def terminar_turno(self):
-        self.valores_dados = []
-        self.ficha_seleccionada = None
-        actual = jugadores[self.indice_jugador_actual]
-        
-        if not self.ultimo_doble:
-            actual.contador_dobles = 0
-            self.indice_jugador_actual = (self.indice_jugador_actual + 1) % len(jugadores)
-            self.actualizar_mensaje_turno()
-        else:
-            self.ultimo_doble = False
-        
-        self.mensaje_estado = ""
-    
-    def manejar_click(self, pos):
-        x, y = pos
-        
-        # Verificar clic en botones
-        if self.boton_lanzar.collidepoint(x, y):
-            self.lanzar_dados()
-            return
-        elif self.boton_terminar.collidepoint(x, y):
-            self.terminar_turno()
-            return
-        
-        # Verificar clic en dados
-        if y > TAMANO_TABLERO:
-            if self.valores_dados:
-                for i, valor in enumerate(self.valores_dados):
-                    dado_rect = pygame.Rect(500 + i*60, TAMANO_TABLERO + 30, 40, 40)
-                    if dado_rect.collidepoint(x, y):
-                        self.usar_dado(valor)
-                        return
-        
-        # Verificar clic en el tablero
-        if y < TAMANO_TABLERO:
-            actual = jugadores[self.indice_jugador_actual]
-            ficha_click = None
-            
-            # Buscar en casillas externas
-            for pos_tablero, (cx, cy) in coordenadas_del_tablero_externo.items():
-                if abs(x - cx) < 15 and abs(y - cy) < 15:
-                    if posiciones_de_tablero[pos_tablero]:
-                        for f in posiciones_de_tablero[pos_tablero]:
-                            if f.jugador == actual:
-                                ficha_click = f
-                                break
-                if ficha_click:
-                    break
-            
-            # Buscar en vías internas
-            if not ficha_click:
-                lista_coords = coordenadas_de_la_via_interna[actual.nombre]
-                for idx, (cx, cy) in enumerate(lista_coords):
-                    if abs(x - cx) < 15 and abs(y - cy) < 15:
-                        for f in actual.fichas:
-                            if f.estado == ("interna", idx):
-                                ficha_click = f
-                                break
-                    if ficha_click:
-                        break
-            
-            # Buscar en la cárcel
-            if not ficha_click:
-                for j in jugadores:
-                    info_carcel = posiciones_de_la_carcel[j.nombre]
-                    x_carcel = info_carcel["x"]
-                    y_carcel = info_carcel["y"]
-                    offset = info_carcel["offset_y"]
-                    cont = 0
-                    for f in j.fichas:
-                        if f.estado == "carcel":
-                            py = y_carcel + cont * offset
-                            cont += 1
-                            
-                            # Verificar si el clic está dentro del triángulo
-                            distancia = math.sqrt((x - x_carcel)**2 + (y - py)**2)
-                            if distancia < 15 and f.jugador == actual:
-                                ficha_click = f
-                                break
-                    if ficha_click:
-                        break
-            
-            if ficha_click:
-                self.ficha_seleccionada = ficha_click
-                self.mensaje_estado = f"Seleccionada {ficha_click}"
-    
-    def ejecutar(self):
-        clock = pygame.time.Clock()
-        running = True
-        
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:  # Clic izquierdo
-                        self.manejar_click(event.pos)
-            
-            self.dibujar_tablero()
-            clock.tick(30)
-        
-        pygame.quit()
-        sys.exit()
-
-# ---------------------
-# EJECUCION DEL JUEGO
-# ---------------------
-def main():
-    juego = InterfazParquesPygame()
-    juego.ejecutar()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import random
+import sys
+import math
+import mmap
+import os
+import argparse
+import bisect
+import csv
+import itertools
+import json
+import signal
+import struct
+import time
+import gc
+import threading
+from array import array
+from collections import namedtuple, OrderedDict, deque
+
+# ---------------------
+# MODULOS QUE SE CARGAN AL USARLOS
+# ---------------------
+# pygame (la ventana), numpy (la simulacion por lotes) y asyncio (el
+# servidor) cuestan la mayor parte del arranque y cada uno lo usa un solo
+# modo. Se importan la primera vez que hacen falta, para que los procesos
+# cortos sin ventana (texto, simular, torneo) arranquen en pocos ms. Por
+# lo mismo, multiprocessing y secrets se importan donde se usan.
+pygame = None
+np = None
+asyncio = None
+_hay_numpy = None
+
+def cargar_pygame():
+    global pygame
+    if pygame is None:
+        try:
+            import pygame as modulo
+        except ImportError:
+            raise ImportError("la ventana necesita pygame (pip install pygame); "
+                              "sin ventana: python \"Parques final.py\" texto") from None
+        pygame = modulo
+    return pygame
+
+def hay_numpy():
+    global np, _hay_numpy
+    if _hay_numpy is None:
+        try:
+            import numpy as modulo
+        except ImportError:
+            _hay_numpy = False
+        else:
+            np = modulo
+            _hay_numpy = True
+    return _hay_numpy
+
+def cargar_asyncio():
+    global asyncio
+    if asyncio is None:
+        import asyncio as modulo
+        asyncio = modulo
+    return asyncio
+
+# ---------------------
+# PARAMETROS GLOBALES Y CONSTANTES
+# ---------------------
+NUM_CASILLAS_EXTERNAS = 68
+NUM_CASILLAS_INTERNAS = 8
+TAMANO_TABLERO = 600
+MARGEN = 20
+CELDA = 40
+
+# Colores
+COLOR_FONDO = (240, 240, 240)
+COLOR_TABLERO = (220, 220, 200)
+COLOR_TEXTO = (30, 30, 30)
+COLOR_BOTON = (100, 150, 200)
+COLOR_BOTON_HOVER = (120, 170, 220)
+COLOR_DADO = (250, 250, 250)
+COLOR_DADO_PUNTO = (30, 30, 30)
+COLORES_JUGADORES = {
+    "Rojo": (220, 60, 60),
+    "Azul": (60, 100, 220),
+    "Verde": (60, 160, 60),
+    "Amarillo": (220, 180, 40)
+}
+
+# Jugadores: nombre, color, salida y entrada al hogar
+DATOS_JUGADORES = (
+    ("Rojo", "red", 0, 67),
+    ("Azul", "blue", 17, 16),
+    ("Verde", "green", 34, 33),
+    ("Amarillo", "yellow", 51, 50),
+)
+NUM_JUGADORES = len(DATOS_JUGADORES)
+FICHAS_POR_JUGADOR = 4
+NUM_FICHAS = NUM_JUGADORES * FICHAS_POR_JUGADOR
+SALIDAS = tuple(d[2] for d in DATOS_JUGADORES)
+ENTRADAS_HOGAR = tuple(d[3] for d in DATOS_JUGADORES)
+CASILLAS_SEGURAS = frozenset(SALIDAS)
+
+# Codificacion unica de la posicion de una ficha (un byte):
+#   0..67  casilla del tablero externo
+#   68..75 casilla de la via interna (68 + indice)
+#   76     carcel
+BASE_INTERNA = NUM_CASILLAS_EXTERNAS
+META = BASE_INTERNA + NUM_CASILLAS_INTERNAS - 1
+CARCEL = BASE_INTERNA + NUM_CASILLAS_INTERNAS
+NUM_CODIGOS = CARCEL + 1
+NINGUNA = 255  # Sin ficha (p. ej. ultima_ficha_movida vacia)
+
+# Mascaras de bits del tablero externo: el bit p representa la casilla p.
+# MASCARAS_CAMINO[inicio][pasos] marca las casillas intermedias de un
+# movimiento (inicio + 1 .. inicio + pasos - 1), dando la vuelta en la 68.
+TODAS_LAS_CASILLAS = (1 << NUM_CASILLAS_EXTERNAS) - 1
+
+def mascara_camino(inicio, pasos):
+    if pasos <= 1:
+        return 0
+    m = ((1 << (pasos - 1)) - 1) << (inicio + 1)
+    while m > TODAS_LAS_CASILLAS:
+        m = (m & TODAS_LAS_CASILLAS) | (m >> NUM_CASILLAS_EXTERNAS)
+    return m
+
+MASCARAS_CAMINO = [[mascara_camino(inicio, pasos) for pasos in range(NUM_CASILLAS_EXTERNAS + 1)]
+                   for inicio in range(NUM_CASILLAS_EXTERNAS)]
+
+# ---------------------
+# TABLAS DE MOVIMIENTO PRECALCULADAS
+# ---------------------
+# Resultado de mover una ficha de un jugador desde un codigo con unos pasos.
+# Se calcula una sola vez para todos los (jugador, codigo, pasos) posibles con
+# dos dados; mover_ficha solo consulta la tabla y comprueba bloqueos.
+BONUS_CAPTURA = 20
+MAX_PASOS = 12  # suma de dos dados
+
+MOV_NECESITA_CINCO = 0   # en la carcel sin un 5
+MOV_SALIDA = 1           # sale de la carcel a su casilla de salida
+MOV_NORMAL = 2           # avanza por el tablero externo
+MOV_ENTRA_INTERNA = 3    # llega exacto a la entrada y pasa a la via interna
+MOV_EXCESO = 4           # se pasa de la entrada a la via interna
+MOV_INTERNA = 5          # avanza dentro de la via interna
+MOV_META = 6             # llega a la ultima casilla interna
+MOV_EXCESO_INTERNA = 7   # se pasa de la meta
+
+# Resultado de aplicar un movimiento. Los rechazados no cambian el estado.
+RES_NECESITA_CINCO = 0
+RES_SALIDA_BLOQUEADA = 1
+RES_CAMINO_BLOQUEADO = 2
+RES_EXCESO = 3
+RES_EXCESO_INTERNA = 4
+RES_SALE = 5
+RES_MUEVE = 6
+RES_CAPTURA = 7            # captura y avanza las 20 casillas de bonus
+RES_BONUS_BLOQUEADO = 8    # captura, pero el camino del bonus esta bloqueado
+RES_BONUS_OCUPADO = 9      # captura, pero la casilla del bonus esta llena
+RES_ENTRA_INTERNA = 10
+RES_AVANZA_INTERNA = 11
+RES_META = 12
+RES_PENALIZACION = 13      # tres dobles: la ultima ficha movida vuelve a la carcel
+RECHAZOS = frozenset((RES_NECESITA_CINCO, RES_SALIDA_BLOQUEADA, RES_CAMINO_BLOQUEADO,
+                      RES_EXCESO, RES_EXCESO_INTERNA))
+CAPTURAS = frozenset((RES_CAPTURA, RES_BONUS_BLOQUEADO, RES_BONUS_OCUPADO))
+
+DISTANCIA_HOGAR = [bytes((ENTRADAS_HOGAR[j] - pos) % NUM_CASILLAS_EXTERNAS
+                         for pos in range(NUM_CASILLAS_EXTERNAS))
+                   for j in range(NUM_JUGADORES)]
+
+def clasificar_movimiento(j, codigo, pasos):
+    if codigo == CARCEL:
+        if pasos != 5:
+            return MOV_NECESITA_CINCO, CARCEL
+        return MOV_SALIDA, SALIDAS[j]
+    if codigo < NUM_CASILLAS_EXTERNAS:
+        d = DISTANCIA_HOGAR[j][codigo]
+        if pasos == d:
+            return MOV_ENTRA_INTERNA, BASE_INTERNA
+        elif pasos > d:
+            return MOV_EXCESO, codigo
+        return MOV_NORMAL, (codigo + pasos) % NUM_CASILLAS_EXTERNAS
+    nuevo = codigo + pasos
+    if nuevo > META:
+        return MOV_EXCESO_INTERNA, codigo
+    if nuevo == META:
+        return MOV_META, META
+    return MOV_INTERNA, nuevo
+
+# Indice plano: (j * NUM_CODIGOS + codigo) * PASOS_TABLA + pasos
+PASOS_TABLA = MAX_PASOS + 1
+TIPO_MOVIMIENTO = bytearray(NUM_JUGADORES * NUM_CODIGOS * PASOS_TABLA)
+DESTINO_MOVIMIENTO = bytearray(NUM_JUGADORES * NUM_CODIGOS * PASOS_TABLA)
+for _j in range(NUM_JUGADORES):
+    for _codigo in range(NUM_CODIGOS):
+        for _pasos in range(PASOS_TABLA):
+            _k = (_j * NUM_CODIGOS + _codigo) * PASOS_TABLA + _pasos
+            TIPO_MOVIMIENTO[_k], DESTINO_MOVIMIENTO[_k] = clasificar_movimiento(_j, _codigo, _pasos)
+
+DESTINO_BONUS = bytes((pos + BONUS_CAPTURA) % NUM_CASILLAS_EXTERNAS for pos in range(NUM_CASILLAS_EXTERNAS))
+
+# ---------------------
+# CLAVES ZOBRIST
+# ---------------------
+# Hash de 64 bits de la posicion: XOR de una clave por cada (ficha, codigo),
+# (ficha, puesto de llegada en su casilla), jugador en turno, contador de
+# dobles de cada jugador, ultimo doble y dados pendientes. El motor lo
+# actualiza en O(1) en cada cambio. No entran ultima_ficha_movida ni
+# movimientos_extra (la busqueda mezcla la primera aparte, ver Z_ULTIMA_FICHA).
+_rng_zobrist = random.Random(0x5A0B7157)
+
+def _clave_zobrist():
+    return _rng_zobrist.getrandbits(64)
+
+Z_FICHA = [[_clave_zobrist() for codigo in range(NUM_CODIGOS)] for i in range(NUM_FICHAS)]
+# El puesto 0 (primera en llegar, o fuera del tablero externo) no cambia el hash
+Z_ORDEN = [[0] + [_clave_zobrist() for rango in range(1, NUM_FICHAS)] for i in range(NUM_FICHAS)]
+Z_TURNO = [_clave_zobrist() for j in range(NUM_JUGADORES)]
+Z_DOBLES = [[0] + [_clave_zobrist() for c in range(1, 4)] for j in range(NUM_JUGADORES)]
+Z_ULTIMO_DOBLE = _clave_zobrist()
+# Dados pendientes como multiconjunto: ninguno, uno o dos valores
+Z_DADOS = {(): 0}
+for _d1 in range(1, 7):
+    Z_DADOS[(_d1,)] = _clave_zobrist()
+    for _d2 in range(_d1, 7):
+        Z_DADOS[(_d1, _d2)] = _clave_zobrist()
+
+def clave_dados(dados):
+    if len(dados) == 2 and dados[0] > dados[1]:
+        return Z_DADOS[(dados[1], dados[0])]
+    return Z_DADOS[tuple(dados)]
+
+# Los movimientos guardan los dados en el orden en que salieron: la cache de
+# movimientos legales distingue [3, 2] de [2, 3] con esta clave
+Z_DADOS_INVERTIDOS = _clave_zobrist()
+
+# Movimientos posibles: (indice de ficha, pasos, dados usados). Hay pocos, asi
+# que se crean una sola vez y todas las listas de movimientos comparten las
+# mismas tuplas. OPCIONES_DADOS da, para unos dados pendientes, las formas de
+# usarlos: cada dado por separado (sin repetir en dobles) y la suma.
+OPCIONES_DADOS = {}
+MOVIMIENTOS_CON = {}
+for _d1 in range(1, 7):
+    OPCIONES_DADOS[(_d1,)] = ((_d1,),)
+    for _d2 in range(1, 7):
+        if _d1 == _d2:
+            OPCIONES_DADOS[(_d1, _d2)] = ((_d1,), (_d1, _d2))
+        else:
+            OPCIONES_DADOS[(_d1, _d2)] = ((_d1,), (_d2,), (_d1, _d2))
+for _dados, _opciones in OPCIONES_DADOS.items():
+    for _usados in _opciones:
+        if _usados not in MOVIMIENTOS_CON:
+            MOVIMIENTOS_CON[_usados] = tuple((i, sum(_usados), _usados) for i in range(NUM_FICHAS))
+
+# Cache de movimientos legales compartida por todas las partidas del proceso,
+# indexada por el hash Zobrist de la posicion (con el orden de los dados,
+# ver clave_movimientos); al llenarse se vacia entera.
+LIMITE_CACHE_MOVIMIENTOS = 100000
+_cache_movimientos = {}
+
+# ---------------------
+# DADOS DETERMINISTAS
+# ---------------------
+# Generador basado en contador: el n-esimo numero de un flujo es
+# splitmix64(base + n), asi que se puede calcular igual en Python y con
+# numpy (simulacion por lotes) y dos motores con la misma semilla sacan los
+# mismos dados. Tiene la parte del API de random.Random que usa el juego.
+MASCARA_64 = (1 << 64) - 1
+
+def splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & MASCARA_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASCARA_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASCARA_64
+    return x ^ (x >> 31)
+
+def base_flujo(semilla, flujo=0):
+    # Flujo 0: dados de la partida; flujos 1..4: decisiones de cada asiento
+    return splitmix64((semilla * 4 + flujo) & MASCARA_64)
+
+class GeneradorDados:
+    __slots__ = ("base", "contador")
+    
+    def __init__(self, semilla=0, flujo=0):
+        self.base = base_flujo(semilla, flujo)
+        self.contador = 0
+    
+    def siguiente(self):
+        x = splitmix64((self.base + self.contador) & MASCARA_64)
+        self.contador += 1
+        return x
+    
+    def randint(self, a, b):
+        return a + (self.siguiente() >> 11) % (b - a + 1)
+    
+    def randrange(self, n):
+        return (self.siguiente() >> 11) % n
+    
+    def getstate(self):
+        return self.base, self.contador
+    
+    def setstate(self, estado):
+        self.base, self.contador = estado
+
+# Estado completo de una partida en bytes (ParquesGame.exportar_estado):
+# posiciones, orden de llegada, turno, numero de dados y sus valores, si el
+# ultimo lanzamiento fue doble, contadores de dobles, ultima ficha movida y
+# movimientos extra de cada jugador
+FORMATO_ESTADO = struct.Struct(">16s16sBB2sB4s4s4H")
+
+# ---------------------
+# CLASES DEL JUEGO: FICHA Y JUGADOR
+# ---------------------
+# Ficha y Jugador no guardan estado propio: son vistas sobre los arreglos
+# compactos de ParquesGame, que es quien se copia y se compara.
+class Ficha:
+    __slots__ = ("juego", "indice")
+    
+    def __init__(self, juego, indice):
+        self.juego = juego
+        self.indice = indice
+    
+    @property
+    def jugador(self):
+        return self.juego.jugadores[self.indice // FICHAS_POR_JUGADOR]
+    
+    @property
+    def id_ficha(self):
+        return self.indice % FICHAS_POR_JUGADOR
+    
+    @property
+    def estado(self):
+        return self.juego.posiciones[self.indice]
+    
+    def en_carcel(self):
+        return self.juego.posiciones[self.indice] == CARCEL
+    
+    def en_tablero(self):
+        return self.juego.posiciones[self.indice] < NUM_CASILLAS_EXTERNAS
+    
+    def en_via_interna(self):
+        return BASE_INTERNA <= self.juego.posiciones[self.indice] <= META
+    
+    def __str__(self):
+        nombre = DATOS_JUGADORES[self.indice // FICHAS_POR_JUGADOR][0]
+        estado = self.estado
+        if estado == CARCEL:
+            return f"{nombre}{self.id_ficha}(carcel)"
+        elif estado < NUM_CASILLAS_EXTERNAS:
+            return f"{nombre}{self.id_ficha}(ext {estado})"
+        elif estado <= META:
+            return f"{nombre}{self.id_ficha}(int {estado - BASE_INTERNA})"
+        return f"{nombre}{self.id_ficha}(?)"
+
+class Jugador:
+    __slots__ = ("juego", "indice", "nombre", "color", "salida", "entrada_hogar", "fichas")
+    
+    def __init__(self, juego, indice):
+        self.juego = juego
+        self.indice = indice
+        self.nombre, self.color, self.salida, self.entrada_hogar = DATOS_JUGADORES[indice]
+        base = indice * FICHAS_POR_JUGADOR
+        self.fichas = [Ficha(juego, base + i) for i in range(FICHAS_POR_JUGADOR)]
+    
+    @property
+    def contador_dobles(self):
+        return self.juego.contador_dobles[self.indice]
+    
+    @contador_dobles.setter
+    def contador_dobles(self, valor):
+        self.juego._fijar_dobles(self.indice, valor)
+    
+    @property
+    def movimientos_extra(self):
+        return self.juego.movimientos_extra[self.indice]
+    
+    @movimientos_extra.setter
+    def movimientos_extra(self, valor):
+        self.juego.movimientos_extra[self.indice] = valor
+    
+    @property
+    def ultima_ficha_movida(self):
+        i = self.juego.ultima_ficha_movida[self.indice]
+        if i == NINGUNA:
+            return None
+        return self.juego.ficha(i)
+    
+    @ultima_ficha_movida.setter
+    def ultima_ficha_movida(self, ficha):
+        self.juego.ultima_ficha_movida[self.indice] = NINGUNA if ficha is None else ficha.indice
+    
+    def todas_llegaron(self):
+        return self.juego.todas_llegaron(self.indice)
+
+# ---------------------
+# MOTOR DEL JUEGO (SIN PYGAME)
+# ---------------------
+# Cada partida es una instancia independiente: tablero, jugadores, dados y
+# estado del turno viven en el objeto, asi que se pueden simular muchas
+# partidas a la vez en un mismo proceso y la interfaz solo las dibuja.
+#
+# El estado es compacto: un bytearray con la posicion de las 16 fichas, otro
+# con el orden de llegada de cada ficha dentro de su casilla (la primera en
+# llegar es la que se captura) y la ocupacion de cada casilla externa (total
+# y por jugador). Las fichas de un jugador son los indices 4*j .. 4*j + 3.
+# Los bloqueos se mantienen en una mascara de bits (bit p = casilla p
+# bloqueada) que se actualiza al poner y quitar fichas.
+class ParquesGame:
+    def __init__(self, semilla=None, rng=None):
+        self.posiciones = bytearray([CARCEL]) * NUM_FICHAS
+        self.orden = bytearray(NUM_FICHAS)
+        self.ocupacion = bytearray(NUM_CASILLAS_EXTERNAS)
+        self.ocupacion_jugador = bytearray(NUM_CASILLAS_EXTERNAS * NUM_JUGADORES)
+        self.bloqueos = 0
+        self.contador_dobles = bytearray(NUM_JUGADORES)
+        self.movimientos_extra = array("H", bytes(2 * NUM_JUGADORES))
+        self.ultima_ficha_movida = bytearray([NINGUNA]) * NUM_JUGADORES
+        self.casillas_seguras = CASILLAS_SEGURAS
+        self.rng = rng if rng is not None else random.Random(semilla)
+        self._jugadores = None
+        # Observador de las acciones (p. ej. un EscritorRepeticion), o None
+        self.registro = None
+        
+        # Estado del turno
+        self.indice_jugador_actual = 0
+        self.valores_dados = []
+        self.ultimo_doble = False
+        self.hash = self.calcular_hash()
+    
+    # Las vistas Ficha/Jugador se crean solo si alguien las pide
+    @property
+    def jugadores(self):
+        if self._jugadores is None:
+            self._jugadores = [Jugador(self, j) for j in range(NUM_JUGADORES)]
+        return self._jugadores
+    
+    def ficha(self, indice):
+        return self.jugadores[indice // FICHAS_POR_JUGADOR].fichas[indice % FICHAS_POR_JUGADOR]
+    
+    def jugador_actual(self):
+        return self.jugadores[self.indice_jugador_actual]
+    
+    def todas_llegaron(self, j):
+        base = j * FICHAS_POR_JUGADOR
+        for i in range(base, base + FICHAS_POR_JUGADOR):
+            if self.posiciones[i] != META:
+                return False
+        return True
+    
+    def ganador(self):
+        for j in range(NUM_JUGADORES):
+            if self.todas_llegaron(j):
+                return self.jugadores[j]
+        return None
+    
+    def fichas_en(self, pos):
+        # Fichas en una casilla externa, en orden de llegada
+        if not self.ocupacion[pos]:
+            return []
+        indices = [i for i in range(NUM_FICHAS) if self.posiciones[i] == pos]
+        indices.sort(key=self.orden.__getitem__)
+        return [self.ficha(i) for i in indices]
+    
+    # ---------------------
+    # ESTADO COMPACTO: COPIA Y CLAVE
+    # ---------------------
+    # Formato de la clave: 16 posiciones, 16 ordenes de llegada, dobles,
+    # ultima ficha movida, jugador actual, ultimo doble y los dados (0 si
+    # no hay).
+    def clave(self):
+        dados = self.valores_dados
+        return bytes(self.posiciones) + bytes(self.orden) + bytes(self.contador_dobles) + bytes(self.ultima_ficha_movida) + bytes((
+            self.indice_jugador_actual,
+            self.ultimo_doble,
+            dados[0] if dados else 0,
+            dados[1] if len(dados) > 1 else 0,
+        ))
+    
+    def copiar(self):
+        copia = ParquesGame.__new__(ParquesGame)
+        copia.posiciones = self.posiciones[:]
+        copia.orden = self.orden[:]
+        copia.ocupacion = self.ocupacion[:]
+        copia.ocupacion_jugador = self.ocupacion_jugador[:]
+        copia.bloqueos = self.bloqueos
+        copia.contador_dobles = self.contador_dobles[:]
+        copia.movimientos_extra = self.movimientos_extra[:]
+        copia.ultima_ficha_movida = self.ultima_ficha_movida[:]
+        copia.casillas_seguras = self.casillas_seguras
+        copia.rng = type(self.rng)()
+        copia.rng.setstate(self.rng.getstate())
+        copia._jugadores = None
+        copia.registro = None
+        copia.indice_jugador_actual = self.indice_jugador_actual
+        copia.valores_dados = list(self.valores_dados)
+        copia.ultimo_doble = self.ultimo_doble
+        copia.hash = self.hash
+        return copia
+    
+    def cargar_posiciones(self, posiciones, orden=None):
+        # Reconstruye la ocupacion a partir de las 16 posiciones; sin orden
+        # explicito, las fichas de una casilla llegan en orden de indice
+        self.posiciones[:] = posiciones
+        self.orden[:] = bytes(NUM_FICHAS)
+        self.ocupacion[:] = bytes(NUM_CASILLAS_EXTERNAS)
+        self.ocupacion_jugador[:] = bytes(NUM_CASILLAS_EXTERNAS * NUM_JUGADORES)
+        for i, codigo in enumerate(self.posiciones):
+            if codigo < NUM_CASILLAS_EXTERNAS:
+                self.orden[i] = self.ocupacion[codigo]
+                self.ocupacion[codigo] += 1
+                self.ocupacion_jugador[codigo * NUM_JUGADORES + i // FICHAS_POR_JUGADOR] += 1
+        self.bloqueos = 0
+        for pos in range(NUM_CASILLAS_EXTERNAS):
+            self._actualizar_bloqueo(pos)
+        if orden is not None:
+            self.orden[:] = orden
+        self.hash = self.calcular_hash()
+    
+    # Estado completo en bytes (FORMATO_ESTADO): fichas, turno, dados,
+    # dobles, ultima ficha movida y movimientos extra. No incluye el
+    # generador de dados.
+    def exportar_estado(self):
+        dados = bytes(self.valores_dados)
+        return FORMATO_ESTADO.pack(bytes(self.posiciones), bytes(self.orden), self.indice_jugador_actual,
+                                   len(dados), dados, self.ultimo_doble, bytes(self.contador_dobles),
+                                   bytes(self.ultima_ficha_movida), *self.movimientos_extra)
+    
+    def importar_estado(self, datos):
+        (posiciones, orden, turno, n, dados, ultimo_doble, dobles, ultima,
+         *extra) = FORMATO_ESTADO.unpack(datos)
+        self.indice_jugador_actual = turno
+        self.valores_dados = list(dados[:n])
+        self.ultimo_doble = bool(ultimo_doble)
+        self.contador_dobles[:] = dobles
+        self.ultima_ficha_movida[:] = ultima
+        self.movimientos_extra[:] = array("H", extra)
+        self.cargar_posiciones(posiciones, orden)
+    
+    def colocar_ficha(self, i, codigo):
+        # Lleva la ficha a codigo sin aplicar reglas, como ultima en llegar a
+        # su casilla (lo usan los clientes que reproducen el estado del servidor)
+        self._quitar(i)
+        if codigo < NUM_CASILLAS_EXTERNAS:
+            self._poner(i, codigo)
+        else:
+            self._fijar(i, codigo)
+    
+    def fijar_turno(self, j):
+        self.hash ^= Z_TURNO[self.indice_jugador_actual] ^ Z_TURNO[j]
+        self.indice_jugador_actual = j
+    
+    def calcular_hash(self):
+        # Hash completo desde cero; el motor lo mantiene incrementalmente
+        h = Z_TURNO[self.indice_jugador_actual] ^ clave_dados(self.valores_dados)
+        for i in range(NUM_FICHAS):
+            h ^= Z_FICHA[i][self.posiciones[i]] ^ Z_ORDEN[i][self.orden[i]]
+        for j in range(NUM_JUGADORES):
+            h ^= Z_DOBLES[j][self.contador_dobles[j]]
+        if self.ultimo_doble:
+            h ^= Z_ULTIMO_DOBLE
+        return h
+    
+    def _fijar(self, i, codigo):
+        # Cambia el codigo de una ficha que no esta en el tablero externo
+        self.hash ^= Z_FICHA[i][self.posiciones[i]] ^ Z_FICHA[i][codigo]
+        self.posiciones[i] = codigo
+    
+    def _fijar_dobles(self, j, valor):
+        self.hash ^= Z_DOBLES[j][self.contador_dobles[j]] ^ Z_DOBLES[j][valor]
+        self.contador_dobles[j] = valor
+    
+    def _fijar_dados(self, dados):
+        self.hash ^= clave_dados(self.valores_dados) ^ clave_dados(dados)
+        self.valores_dados = dados
+    
+    def _fijar_ultimo_doble(self, valor):
+        if self.ultimo_doble != valor:
+            self.hash ^= Z_ULTIMO_DOBLE
+        self.ultimo_doble = valor
+    
+    # Estado del turno (no incluye las fichas): lo usa la busqueda para volver
+    # atras despues de tiradas y cambios de turno, junto con deshacer_movimiento
+    def guardar_turno(self):
+        return (self.indice_jugador_actual, self.valores_dados, self.ultimo_doble,
+                bytes(self.contador_dobles), bytes(self.ultima_ficha_movida), self.hash)
+    
+    def restaurar_turno(self, turno):
+        (self.indice_jugador_actual, self.valores_dados, self.ultimo_doble,
+         self.contador_dobles[:], self.ultima_ficha_movida[:], self.hash) = turno
+    
+    def _poner(self, i, pos):
+        rango = self.ocupacion[pos]
+        self.hash ^= (Z_FICHA[i][self.posiciones[i]] ^ Z_FICHA[i][pos]
+                      ^ Z_ORDEN[i][self.orden[i]] ^ Z_ORDEN[i][rango])
+        self.posiciones[i] = pos
+        self.orden[i] = rango
+        self.ocupacion[pos] += 1
+        self.ocupacion_jugador[pos * NUM_JUGADORES + i // FICHAS_POR_JUGADOR] += 1
+        self._actualizar_bloqueo(pos)
+    
+    def _quitar(self, i):
+        pos = self.posiciones[i]
+        if pos < NUM_CASILLAS_EXTERNAS:
+            self.ocupacion[pos] -= 1
+            self.ocupacion_jugador[pos * NUM_JUGADORES + i // FICHAS_POR_JUGADOR] -= 1
+            self._actualizar_bloqueo(pos)
+            if self.ocupacion[pos]:
+                # Las que llegaron despues avanzan un puesto en la casilla
+                orden = self.orden
+                r = orden[i]
+                for k in range(NUM_FICHAS):
+                    if self.posiciones[k] == pos and orden[k] > r:
+                        self.hash ^= Z_ORDEN[k][orden[k]] ^ Z_ORDEN[k][orden[k] - 1]
+                        orden[k] -= 1
+            self.hash ^= Z_ORDEN[i][self.orden[i]]
+            self.orden[i] = 0
+    
+    def _insertar(self, i, pos, rango):
+        # Inverso de _quitar: vuelve a poner la ficha en su puesto de llegada
+        if self.ocupacion[pos] > rango:
+            orden = self.orden
+            for k in range(NUM_FICHAS):
+                if self.posiciones[k] == pos and orden[k] >= rango:
+                    self.hash ^= Z_ORDEN[k][orden[k]] ^ Z_ORDEN[k][orden[k] + 1]
+                    orden[k] += 1
+        self.hash ^= (Z_FICHA[i][self.posiciones[i]] ^ Z_FICHA[i][pos]
+                      ^ Z_ORDEN[i][self.orden[i]] ^ Z_ORDEN[i][rango])
+        self.posiciones[i] = pos
+        self.orden[i] = rango
+        self.ocupacion[pos] += 1
+        self.ocupacion_jugador[pos * NUM_JUGADORES + i // FICHAS_POR_JUGADOR] += 1
+        self._actualizar_bloqueo(pos)
+    
+    def _primera_ficha_en(self, pos):
+        for i in range(NUM_FICHAS):
+            if self.posiciones[i] == pos and self.orden[i] == 0:
+                return i
+        return NINGUNA
+    
+    # ---------------------
+    # FUNCIONES DE UTILIDAD
+    # ---------------------
+    def _actualizar_bloqueo(self, pos):
+        # Bloqueo: exactamente dos fichas y las dos del mismo jugador
+        bit = 1 << pos
+        if self.ocupacion[pos] == 2:
+            base = pos * NUM_JUGADORES
+            for j in range(NUM_JUGADORES):
+                if self.ocupacion_jugador[base + j] == 2:
+                    self.bloqueos |= bit
+                    return
+        self.bloqueos &= ~bit
+    
+    def es_bloqueo(self, pos):
+        return bool((self.bloqueos >> pos) & 1)
+    
+    def verificar_camino(self, inicio, pasos):
+        if pasos <= NUM_CASILLAS_EXTERNAS:
+            choques = self.bloqueos & MASCARAS_CAMINO[inicio][pasos]
+        else:
+            choques = self.bloqueos & mascara_camino(inicio, pasos)
+        if not choques:
+            return True, None
+        # Primer bloqueo en el orden del recorrido: se rota la mascara para
+        # que el camino empiece en el bit 0
+        desde = inicio + 1
+        rotada = ((choques >> desde) | (choques << (NUM_CASILLAS_EXTERNAS - desde))) & TODAS_LAS_CASILLAS
+        primero = (rotada & -rotada).bit_length() - 1
+        return False, (desde + primero) % NUM_CASILLAS_EXTERNAS
+    
+    def puede_colocar(self, ficha, pos):
+        return (self.ocupacion[pos] < 2)
+    
+    # ---------------------
+    # LOGICA DE MOVIMIENTO
+    # ---------------------
+    # hacer_movimiento devuelve (resultado, registro). El registro guarda lo
+    # necesario para deshacer el movimiento en el sitio (origen y puesto de
+    # llegada de la ficha, ficha capturada, movimientos extra y ultima ficha
+    # movida del jugador); es None si el movimiento se rechaza.
+    def hacer_movimiento(self, i, pasos):
+        j = i // FICHAS_POR_JUGADOR
+        codigo = self.posiciones[i]
+        if 0 <= pasos <= MAX_PASOS:
+            k = (j * NUM_CODIGOS + codigo) * PASOS_TABLA + pasos
+            tipo = TIPO_MOVIMIENTO[k]
+            destino = DESTINO_MOVIMIENTO[k]
+        else:
+            tipo, destino = clasificar_movimiento(j, codigo, pasos)
+        
+        if tipo == MOV_NORMAL:
+            if self.bloqueos & MASCARAS_CAMINO[codigo][pasos]:
+                return RES_CAMINO_BLOQUEADO, None
+            registro_base = (i, codigo, self.orden[i])
+            extra = self.movimientos_extra[j]
+            ultima = self.ultima_ficha_movida[j]
+            if self.ocupacion[destino] and destino not in CASILLAS_SEGURAS:
+                ocupante = self._primera_ficha_en(destino)
+                if ocupante // FICHAS_POR_JUGADOR != j:
+                    victima = (ocupante, destino, self.orden[ocupante])
+                    self._quitar(ocupante)
+                    self._fijar(ocupante, CARCEL)
+                    self._quitar(i)
+                    self._poner(i, destino)
+                    # Se registra ya la ultima ficha movida: si el bonus falla
+                    # la partida se queda con la captura hecha
+                    self.ultima_ficha_movida[j] = i
+                    if self.bloqueos & MASCARAS_CAMINO[destino][BONUS_CAPTURA]:
+                        return RES_BONUS_BLOQUEADO, (RES_BONUS_BLOQUEADO,) + registro_base + victima + (extra, ultima)
+                    bonus_dest = DESTINO_BONUS[destino]
+                    if self.ocupacion[bonus_dest] >= 2:
+                        return RES_BONUS_OCUPADO, (RES_BONUS_OCUPADO,) + registro_base + victima + (extra, ultima)
+                    self._quitar(i)
+                    self._poner(i, bonus_dest)
+                    return RES_CAPTURA, (RES_CAPTURA,) + registro_base + victima + (extra, ultima)
+            self._quitar(i)
+            self._poner(i, destino)
+            self.ultima_ficha_movida[j] = i
+            return RES_MUEVE, (RES_MUEVE,) + registro_base + (NINGUNA, 0, 0, extra, ultima)
+        
+        if tipo == MOV_INTERNA or tipo == MOV_META:
+            registro = (RES_META if tipo == MOV_META else RES_AVANZA_INTERNA, i, codigo, 0,
+                        NINGUNA, 0, 0, self.movimientos_extra[j], self.ultima_ficha_movida[j])
+            self._fijar(i, destino)
+            self.ultima_ficha_movida[j] = i
+            if tipo == MOV_META:
+                self.movimientos_extra[j] += 10
+            return registro[0], registro
+        
+        if tipo == MOV_SALIDA:
+            if self.ocupacion[destino] >= 2:
+                return RES_SALIDA_BLOQUEADA, None
+            registro = (RES_SALE, i, codigo, 0, NINGUNA, 0, 0,
+                        self.movimientos_extra[j], self.ultima_ficha_movida[j])
+            self._poner(i, destino)
+            self.ultima_ficha_movida[j] = i
+            return RES_SALE, registro
+        
+        if tipo == MOV_ENTRA_INTERNA:
+            if self.bloqueos & MASCARAS_CAMINO[codigo][pasos]:
+                return RES_CAMINO_BLOQUEADO, None
+            registro = (RES_ENTRA_INTERNA, i, codigo, self.orden[i], NINGUNA, 0, 0,
+                        self.movimientos_extra[j], self.ultima_ficha_movida[j])
+            self._quitar(i)
+            self._fijar(i, destino)
+            self.movimientos_extra[j] += 10
+            self.ultima_ficha_movida[j] = i
+            return RES_ENTRA_INTERNA, registro
+        
+        if tipo == MOV_NECESITA_CINCO:
+            return RES_NECESITA_CINCO, None
+        if tipo == MOV_EXCESO:
+            return RES_EXCESO, None
+        return RES_EXCESO_INTERNA, None
+    
+    def deshacer_movimiento(self, registro):
+        resultado, i, origen, rango, victima, casilla_victima, rango_victima, extra, ultima = registro
+        j = i // FICHAS_POR_JUGADOR
+        # La ficha fue la ultima en llegar a su casilla final: quitarla no
+        # cambia el orden de las demas
+        self._quitar(i)
+        if origen < NUM_CASILLAS_EXTERNAS:
+            self._insertar(i, origen, rango)
+        else:
+            self._fijar(i, origen)
+        if victima != NINGUNA:
+            self._insertar(victima, casilla_victima, rango_victima)
+        self.movimientos_extra[j] = extra
+        self.ultima_ficha_movida[j] = ultima
+    
+    def mover_ficha(self, ficha, pasos):
+        resultado, registro = self.hacer_movimiento(ficha.indice, pasos)
+        return self.describir_movimiento(ficha, resultado, registro)
+    
+    def describir_movimiento(self, ficha, resultado, registro):
+        # Se llama justo despues del movimiento: la ficha ya esta en su destino
+        if resultado == RES_MUEVE:
+            return f"{ficha} se mueve de la casilla {registro[2] + 1} a {ficha.estado + 1}."
+        if resultado == RES_CAPTURA:
+            return f"{ficha} captura a {self.ficha(registro[4])} y se mueve 20 casillas adicionales a la casilla {ficha.estado + 1}."
+        if resultado == RES_AVANZA_INTERNA:
+            return f"{ficha} avanza en la via interna a la casilla {ficha.estado - BASE_INTERNA + 1}."
+        if resultado == RES_META:
+            return f"{ficha} ha llegado a la meta."
+        if resultado == RES_SALE:
+            return f"{ficha} sale de la carcel a la casilla {ficha.estado + 1}."
+        if resultado == RES_ENTRA_INTERNA:
+            return f"{ficha} entra a la via interna."
+        if resultado == RES_BONUS_BLOQUEADO:
+            return "movimiento bonus no permitido: camino bloqueado por un bloqueo de dos fichas."
+        if resultado == RES_BONUS_OCUPADO:
+            return "movimiento bonus no permitido: casilla destino bloqueada."
+        if resultado == RES_CAMINO_BLOQUEADO:
+            return "movimiento no permitido: camino bloqueado por un bloqueo de dos fichas."
+        if resultado == RES_NECESITA_CINCO:
+            return f"necesitas un 5 para sacar {ficha} de la carcel."
+        if resultado == RES_SALIDA_BLOQUEADA:
+            return f"la salida de {ficha.jugador.nombre} esta bloqueada."
+        if resultado == RES_EXCESO:
+            return "movimiento no permitido: se requiere exactitud para entrar a la via interna."
+        return "movimiento no valido en la via interna (requiere exactitud)."
+    
+    # ---------------------
+    # MOVIMIENTOS LEGALES
+    # ---------------------
+    # Un movimiento es (indice de ficha, pasos, dados usados): con un dado,
+    # dados = (valor,); con la suma de los dos, dados = (d1, d2).
+    def es_movimiento_legal(self, i, pasos):
+        codigo = self.posiciones[i]
+        if 0 <= pasos <= MAX_PASOS:
+            k = ((i // FICHAS_POR_JUGADOR) * NUM_CODIGOS + codigo) * PASOS_TABLA + pasos
+            tipo = TIPO_MOVIMIENTO[k]
+            destino = DESTINO_MOVIMIENTO[k]
+        else:
+            tipo, destino = clasificar_movimiento(i // FICHAS_POR_JUGADOR, codigo, pasos)
+        if tipo == MOV_NORMAL or tipo == MOV_ENTRA_INTERNA:
+            return not (self.bloqueos & MASCARAS_CAMINO[codigo][pasos])
+        if tipo == MOV_SALIDA:
+            return self.ocupacion[destino] < 2
+        return tipo == MOV_INTERNA or tipo == MOV_META
+    
+    def clave_movimientos(self):
+        dados = self.valores_dados
+        if len(dados) == 2 and dados[0] > dados[1]:
+            return self.hash ^ Z_DADOS_INVERTIDOS
+        return self.hash
+    
+    def movimientos_legales(self):
+        dados = self.valores_dados
+        if not dados:
+            return ()
+        j = self.indice_jugador_actual
+        clave = self.clave_movimientos()
+        movimientos = _cache_movimientos.get(clave)
+        if movimientos is not None:
+            return movimientos
+        
+        movimientos = []
+        base = j * FICHAS_POR_JUGADOR
+        for usados in OPCIONES_DADOS[tuple(dados)]:
+            candidatos = MOVIMIENTOS_CON[usados]
+            pasos = candidatos[0][1]
+            for i in range(base, base + FICHAS_POR_JUGADOR):
+                if self.es_movimiento_legal(i, pasos):
+                    movimientos.append(candidatos[i])
+        movimientos = tuple(movimientos)
+        
+        if len(_cache_movimientos) >= LIMITE_CACHE_MOVIMIENTOS:
+            _cache_movimientos.clear()
+        _cache_movimientos[clave] = movimientos
+        return movimientos
+    
+    def movimiento_legal_con(self, i, dados):
+        # El movimiento legal de la ficha i que gasta esos dados, en el orden
+        # que sea (los clientes y los diarios no tienen por que usar el de
+        # movimientos_legales), o None
+        usados = sorted(dados)
+        for movimiento in self.movimientos_legales():
+            if movimiento[0] == i and sorted(movimiento[2]) == usados:
+                return movimiento
+        return None
+    
+    def hay_movimientos(self):
+        return bool(self.movimientos_legales())
+    
+    # ---------------------
+    # LOGICA DEL TURNO
+    # ---------------------
+    def lanzar_dados(self, ficha_seleccionada=None):
+        d1 = self.rng.randint(1, 6)
+        d2 = self.rng.randint(1, 6)
+        if self.registro is not None:
+            self.registro.tirada(self, d1, d2, ficha_seleccionada)
+        return self.aplicar_tirada(d1, d2, ficha_seleccionada)
+    
+    def aplicar_tirada(self, d1, d2, ficha_seleccionada=None):
+        j = self.indice_jugador_actual
+        self._fijar_ultimo_doble(d1 == d2)
+        if d1 == d2:
+            self._fijar_dobles(j, self.contador_dobles[j] + 1)
+        else:
+            self._fijar_dobles(j, 0)
+
+        # Regla de tres dobles consecutivos
+        if self.contador_dobles[j] == 3:
+            resultado, registro = self.hacer_penalizacion(j, ficha_seleccionada)
+            self._fijar_dobles(j, 0)
+            return "Tres dobles consecutivos: la ficha " + str(self.ficha(registro[1])) + " regresa a la cárcel."
+
+        self._fijar_dados([d1, d2])
+        return "Selecciona una ficha y luego un dado para mover"
+    
+    def hacer_penalizacion(self, j, ficha_seleccionada=None):
+        # Manda a la carcel la ultima ficha movida del jugador (o, si no movio
+        # ninguna, la seleccionada o la primera fuera de la carcel). Devuelve
+        # un registro que deshacer_movimiento sabe revertir.
+        ultima = self.ultima_ficha_movida[j]
+        if ultima == NINGUNA:
+            if ficha_seleccionada is not None:
+                self.ultima_ficha_movida[j] = ficha_seleccionada.indice
+            else:
+                base = j * FICHAS_POR_JUGADOR
+                self.ultima_ficha_movida[j] = base
+                for i in range(base, base + FICHAS_POR_JUGADOR):
+                    if self.posiciones[i] != CARCEL:
+                        self.ultima_ficha_movida[j] = i
+                        break
+        i = self.ultima_ficha_movida[j]
+        registro = (RES_PENALIZACION, i, self.posiciones[i], self.orden[i], NINGUNA, 0, 0,
+                    self.movimientos_extra[j], ultima)
+        self._quitar(i)
+        self._fijar(i, CARCEL)
+        return RES_PENALIZACION, registro
+    
+    def usar_dado(self, ficha, valor):
+        return self.usar_dados(ficha, (valor,))
+    
+    def usar_suma(self, ficha):
+        return self.usar_dados(ficha, tuple(self.valores_dados))
+    
+    def usar_dados(self, ficha, dados):
+        resultado, registro = self.aplicar_movimiento((ficha.indice, sum(dados), dados))
+        return self.describir_movimiento(ficha, resultado, registro)
+    
+    def jugar(self, movimiento):
+        i, pasos, dados = movimiento
+        return self.usar_dados(self.ficha(i), dados)
+    
+    def aplicar_movimiento(self, movimiento):
+        # Como jugar() pero sin construir el mensaje: mueve la ficha, gasta los
+        # dados (aunque el movimiento se rechace) y termina el turno si no
+        # quedan. Devuelve (resultado, registro) de hacer_movimiento.
+        i, pasos, dados = movimiento
+        if self.registro is not None:
+            self.registro.movimiento(self, i, dados)
+        resultado, registro = self.hacer_movimiento(i, pasos)
+        self.ultima_ficha_movida[self.indice_jugador_actual] = i
+        restantes = list(self.valores_dados)
+        for valor in dados:
+            restantes.remove(valor)
+        self._fijar_dados(restantes)
+        
+        if not restantes:
+            self._terminar_turno()
+        return resultado, registro
+    
+    def terminar_turno(self):
+        # Pasar por decision del jugador (o de la interfaz); el fin de turno
+        # al gastar los dados no se registra aparte
+        if self.registro is not None:
+            self.registro.pasar(self)
+        self._terminar_turno()
+    
+    def _terminar_turno(self):
+        self._fijar_dados([])
+        
+        if not self.ultimo_doble:
+            j = self.indice_jugador_actual
+            self._fijar_dobles(j, 0)
+            self.indice_jugador_actual = (j + 1) % NUM_JUGADORES
+            self.hash ^= Z_TURNO[j] ^ Z_TURNO[self.indice_jugador_actual]
+        else:
+            self._fijar_ultimo_doble(False)
+
+# ---------------------
+# TABLA DE TRANSPOSICION
+# ---------------------
+# Tabla de tamano fijo indexada por el hash Zobrist (los bits bajos eligen la
+# entrada). Cada entrada guarda la clave completa, la profundidad buscada, el
+# valor, su tipo (exacto o cota) y el mejor movimiento. Reemplazo: se
+# sobrescribe si la entrada es de una busqueda anterior o si la nueva
+# profundidad es mayor o igual que la guardada.
+TT_EXACTO = 0
+TT_COTA_INFERIOR = 1
+TT_COTA_SUPERIOR = 2
+SIN_JUGADA = 0xFFFF
+
+def codificar_jugada(movimiento):
+    # (ficha, pasos, dados) -> entero de 16 bits; con dos dados usados es la suma
+    i, pasos, dados = movimiento
+    return i | (pasos << 4) | ((len(dados) == 2) << 8)
+
+def decodificar_jugada(codigo, valores_dados):
+    i = codigo & 0xF
+    pasos = (codigo >> 4) & 0xF
+    if codigo >> 8:
+        return (i, pasos, tuple(valores_dados))
+    return (i, pasos, (pasos,))
+
+class TablaTransposicion:
+    __slots__ = ("mascara", "claves", "profundidades", "valores", "tipos", "jugadas",
+                 "generaciones", "generacion")
+    
+    def __init__(self, bits=18):
+        tamano = 1 << bits
+        self.mascara = tamano - 1
+        self.claves = array("Q", bytes(8 * tamano))
+        self.profundidades = bytearray(tamano)
+        self.valores = array("d", bytes(8 * tamano))
+        self.tipos = bytearray(tamano)
+        self.jugadas = array("H", [SIN_JUGADA]) * tamano
+        self.generaciones = bytearray(tamano)
+        self.generacion = 1
+    
+    def nueva_busqueda(self):
+        # Las entradas de busquedas anteriores pasan a ser reemplazables
+        self.generacion = self.generacion % 255 + 1
+    
+    def buscar(self, clave):
+        k = clave & self.mascara
+        if self.generaciones[k] and self.claves[k] == clave:
+            return self.profundidades[k], self.valores[k], self.tipos[k], self.jugadas[k]
+        return None
+    
+    def guardar(self, clave, profundidad, valor, tipo, jugada=SIN_JUGADA):
+        k = clave & self.mascara
+        if (self.generaciones[k] == self.generacion and self.claves[k] != clave
+                and self.profundidades[k] > profundidad):
+            return
+        self.claves[k] = clave
+        self.profundidades[k] = profundidad
+        self.valores[k] = valor
+        self.tipos[k] = tipo
+        self.jugadas[k] = jugada
+        self.generaciones[k] = self.generacion
+    
+    def limpiar(self):
+        self.generaciones[:] = bytes(len(self.generaciones))
+
+# ---------------------
+# JUGADORES AUTOMATICOS (BOTS)
+# ---------------------
+# Un bot recibe la partida con los dados ya lanzados y devuelve uno de los
+# movimientos de juego.movimientos_legales() (o None para pasar). No debe
+# dejar la partida cambiada.
+class Bot:
+    nombre = "bot"
+    
+    def elegir_movimiento(self, juego):
+        raise NotImplementedError
+    
+    def cancelada(self):
+        # Las busquedas largas la consultan para abandonar antes de tiempo
+        # (la sustituye el trabajador de la interfaz)
+        return False
+
+class BotAleatorio(Bot):
+    nombre = "aleatorio"
+    
+    def __init__(self, semilla=None):
+        self.rng = random.Random(semilla)
+    
+    def elegir_movimiento(self, juego):
+        movimientos = juego.movimientos_legales()
+        if not movimientos:
+            return None
+        return movimientos[self.rng.randrange(len(movimientos))]
+
+class BotPrimeraLegal(Bot):
+    # El primer movimiento legal en el orden de movimientos_legales()
+    nombre = "primera"
+    
+    def __init__(self, rng=None):
+        pass
+    
+    def elegir_movimiento(self, juego):
+        movimientos = juego.movimientos_legales()
+        return movimientos[0] if movimientos else None
+
+class BotAzarDeterminista(Bot):
+    # Como BotAleatorio, pero con un GeneradorDados: la simulacion por lotes
+    # reproduce exactamente sus decisiones
+    nombre = "azar"
+    
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else GeneradorDados()
+    
+    def elegir_movimiento(self, juego):
+        movimientos = juego.movimientos_legales()
+        if not movimientos:
+            return None
+        return movimientos[self.rng.randrange(len(movimientos))]
+
+BOTS_DETERMINISTAS = {"primera": BotPrimeraLegal, "azar": BotAzarDeterminista}
+
+# Las 36 tiradas de dos dados agrupadas en 21 resultados con su probabilidad
+TIRADAS = tuple((d1, d2, (1 if d1 == d2 else 2) / 36)
+                for d1 in range(1, 7) for d2 in range(d1, 7))
+
+# Avance de una ficha segun su codigo, visto por su jugador: 0 en la carcel,
+# 10 + casillas recorridas en el tablero externo y la via interna, y un
+# premio extra al llegar a la meta
+PROGRESO = [[0] * NUM_CODIGOS for j in range(NUM_JUGADORES)]
+for _j in range(NUM_JUGADORES):
+    for _codigo in range(NUM_CASILLAS_EXTERNAS):
+        PROGRESO[_j][_codigo] = 10 + (_codigo - SALIDAS[_j]) % NUM_CASILLAS_EXTERNAS
+    for _codigo in range(BASE_INTERNA, META + 1):
+        PROGRESO[_j][_codigo] = 10 + NUM_CASILLAS_EXTERNAS + _codigo - BASE_INTERNA
+    PROGRESO[_j][META] += 15
+VALOR_VICTORIA = 10000.0
+
+def evaluar(juego, j):
+    # Avance del jugador j menos el del rival mas adelantado
+    posiciones = juego.posiciones
+    mejor_rival = -1
+    propio = 0
+    for k in range(NUM_JUGADORES):
+        tabla = PROGRESO[k]
+        base = k * FICHAS_POR_JUGADOR
+        total = (tabla[posiciones[base]] + tabla[posiciones[base + 1]]
+                 + tabla[posiciones[base + 2]] + tabla[posiciones[base + 3]])
+        if k == j:
+            propio = total
+        elif total > mejor_rival:
+            mejor_rival = total
+    return float(propio - mejor_rival)
+
+class _TiempoAgotado(Exception):
+    pass
+
+# Los valores de la busqueda dependen del jugador que la lanza: su clave se
+# mezcla con el hash para no reutilizar entradas de otro punto de vista
+Z_RAIZ = [_clave_zobrist() for j in range(NUM_JUGADORES)]
+# La ultima ficha movida decide a quien castiga el tercer doble; el hash del
+# motor no la lleva, asi que la busqueda la mezcla en su clave
+Z_ULTIMA_FICHA = [_clave_zobrist() for i in range(NUM_FICHAS)]
+
+class BotExpectiminimax(Bot):
+    # Expectiminimax "paranoico": el bot maximiza su evaluacion, los rivales
+    # la minimizan y los nodos de azar promedian las 21 tiradas (con dobles
+    # que repiten turno y la penalizacion de tres dobles). La profundidad
+    # cuenta decisiones (cada dado o suma usado); se profundiza de uno en uno
+    # hasta agotar el presupuesto de tiempo y se devuelve la mejor jugada de
+    # la ultima iteracion completa.
+    nombre = "expectiminimax"
+    
+    def __init__(self, presupuesto=0.05, profundidad_maxima=8, tabla=None, finales=None):
+        self.presupuesto = presupuesto
+        self.profundidad_maxima = profundidad_maxima
+        self.tabla = tabla if tabla is not None else TablaTransposicion()
+        # TablaFinales opcional: con todas las fichas de un jugador en la via
+        # interna su jugada sale de la tabla y no se ramifica
+        self.finales = finales
+        self.nodos = 0
+        self.profundidad_alcanzada = 0
+        self.sal = 0
+    
+    def elegir_movimiento(self, juego):
+        movimientos = self._distintos(juego, juego.movimientos_legales())
+        if not movimientos:
+            return None
+        if self.finales is not None and self.finales.cubre(juego, juego.indice_jugador_actual):
+            return self.finales.mejor_movimiento(juego)[0]
+        if len(movimientos) == 1:
+            return movimientos[0]
+        
+        self.limite = time.perf_counter() + self.presupuesto
+        self.raiz = juego.indice_jugador_actual
+        self.sal = Z_RAIZ[self.raiz]
+        self.nodos = 0
+        self.tabla.nueva_busqueda()
+        busqueda = juego.copiar()
+        mejor = movimientos[0]
+        self.profundidad_alcanzada = 0
+        # La busqueda solo crea tuplas sin ciclos; sin el recolector ciclico
+        # no hay pausas que se coman el presupuesto
+        gc_activo = gc.isenabled()
+        gc.disable()
+        try:
+            for profundidad in range(1, self.profundidad_maxima + 1):
+                try:
+                    valor, jugada = self._decision(busqueda, profundidad)
+                except _TiempoAgotado:
+                    break
+                mejor = jugada
+                self.profundidad_alcanzada = profundidad
+                if abs(valor) >= VALOR_VICTORIA:
+                    break
+        finally:
+            if gc_activo:
+                gc.enable()
+        return mejor
+    
+    def _distintos(self, juego, movimientos):
+        # Fichas del mismo jugador en la misma casilla dan el mismo resultado:
+        # basta con probar una
+        vistos = set()
+        distintos = []
+        for movimiento in movimientos:
+            clave = (juego.posiciones[movimiento[0]], movimiento[2])
+            if clave not in vistos:
+                vistos.add(clave)
+                distintos.append(movimiento)
+        return distintos
+    
+    def _clave(self, juego):
+        clave = juego.hash ^ self.sal
+        for i in juego.ultima_ficha_movida:
+            if i != NINGUNA:
+                clave ^= Z_ULTIMA_FICHA[i]
+        return clave
+    
+    def _contar_nodo(self):
+        self.nodos += 1
+        if not self.nodos & 15 and (time.perf_counter() > self.limite or self.cancelada()):
+            raise _TiempoAgotado()
+    
+    def _decision(self, juego, profundidad):
+        clave = self._clave(juego)
+        entrada = self.tabla.buscar(clave)
+        if entrada is not None and entrada[0] >= profundidad:
+            return entrada[1], decodificar_jugada(entrada[3], juego.valores_dados)
+        
+        j = juego.indice_jugador_actual
+        movimientos = self._distintos(juego, juego.movimientos_legales())
+        if movimientos and self.finales is not None and self.finales.cubre(juego, j):
+            # Carrera sin contacto: la tabla ya sabe la mejor jugada (o pasar)
+            jugada = self.finales.mejor_movimiento(juego)[0]
+            movimientos = [jugada] if jugada is not None else []
+        if not movimientos:
+            # Pasar tambien gasta profundidad: si nadie puede mover (carcel,
+            # conteo exacto a la meta) los turnos se pasarian sin fin
+            turno = juego.guardar_turno()
+            juego.terminar_turno()
+            valor = self._azar(juego, profundidad - 1) if profundidad > 1 else evaluar(juego, self.raiz)
+            juego.restaurar_turno(turno)
+            return valor, None
+        
+        maximiza = (j == self.raiz)
+        mejor_valor = None
+        mejor = None
+        for movimiento in movimientos:
+            self._contar_nodo()
+            turno = juego.guardar_turno()
+            resultado, registro = juego.aplicar_movimiento(movimiento)
+            if juego.todas_llegaron(j):
+                valor = VALOR_VICTORIA if maximiza else -VALOR_VICTORIA
+            elif profundidad <= 1:
+                valor = evaluar(juego, self.raiz)
+            elif juego.valores_dados:
+                valor = self._decision(juego, profundidad - 1)[0]
+            else:
+                valor = self._azar(juego, profundidad - 1)
+            juego.deshacer_movimiento(registro)
+            juego.restaurar_turno(turno)
+            if mejor_valor is None or (valor > mejor_valor if maximiza else valor < mejor_valor):
+                mejor_valor = valor
+                mejor = movimiento
+        
+        self.tabla.guardar(clave, profundidad, mejor_valor, TT_EXACTO, codificar_jugada(mejor))
+        return mejor_valor, mejor
+    
+    def _azar(self, juego, profundidad):
+        # Turno sin dados: se promedian las tiradas posibles del jugador actual
+        clave = self._clave(juego)
+        entrada = self.tabla.buscar(clave)
+        if entrada is not None and entrada[0] >= profundidad:
+            return entrada[1]
+        
+        j = juego.indice_jugador_actual
+        total = 0.0
+        for d1, d2, probabilidad in TIRADAS:
+            self._contar_nodo()
+            turno = juego.guardar_turno()
+            if d1 == d2 and juego.contador_dobles[j] == 2:
+                # Tercer doble: penalizacion y el mismo jugador vuelve a tirar
+                resultado, registro = juego.hacer_penalizacion(j)
+                juego._fijar_dobles(j, 0)
+                juego._fijar_ultimo_doble(False)
+                valor = self._azar(juego, profundidad - 1) if profundidad > 1 else evaluar(juego, self.raiz)
+                juego.deshacer_movimiento(registro)
+            else:
+                juego.aplicar_tirada(d1, d2)
+                valor = self._decision(juego, profundidad)[0]
+            juego.restaurar_turno(turno)
+            total += probabilidad * valor
+        
+        self.tabla.guardar(clave, profundidad, total, TT_EXACTO)
+        return total
+
+# ---------------------
+# FINALES: TABLA DE CARRERA HACIA LA META
+# ---------------------
+# Con las cuatro fichas de un jugador en la via interna nadie puede tocarlas:
+# lo que falta es solo cuestion de dados. Cada ficha se resume en lo que le
+# falta ("resto"): META - codigo en la via interna, o 7 + distancia a la
+# entrada si esta en las ultimas RESTO_ANILLO casillas del anillo (alli solo
+# puede avanzar hasta la entrada, y exactamente dos fichas propias en una
+# casilla cierran el paso a las de atras). El generador recorre las posiciones de menor a
+# mayor resto total (analisis retrogrado: cada jugada baja el total) y
+# guarda los turnos esperados hasta meter las cuatro fichas, jugando de la
+# mejor forma (incluido pasar) con las 21 tiradas. Los dobles vuelven a
+# tirar dentro del mismo turno; la penalizacion de tres dobles no se modela.
+# En la via interna el valor es exacto; con fichas en el anillo supone que
+# los rivales no estorban.
+#
+# Archivo: cabecera FORMATO_TABLA_FINALES y un float32 little-endian por
+# posicion, en el orden del sistema combinatorio de los restos ordenados
+# (a <= b <= c <= d -> C(a,1) + C(b+1,2) + C(c+2,3) + C(d+3,4)). Se abre con
+# mmap y cada consulta son cuatro sumas y una lectura.
+FORMATO_TABLA_FINALES = struct.Struct("<4sBBHI4x")
+MAGIA_TABLA_FINALES = b"PRQF"
+VERSION_TABLA_FINALES = 1
+RESTO_INTERNA = META - BASE_INTERNA
+RESTO_ANILLO = 12
+RUTA_TABLA_FINALES = "parques_finales.tbl"
+
+def _combinaciones(n, k):
+    return math.comb(n, k) if n >= k else 0
+
+def _rangos_finales(resto_maximo):
+    # RANGO[k][r] = C(r + k, k + 1): aporte de la ficha k-esima (ordenadas)
+    return [[_combinaciones(r + k, k + 1) for r in range(resto_maximo + 1)]
+            for k in range(FICHAS_POR_JUGADOR)]
+
+def _jugadas_restos(restos):
+    # Para cada numero de pasos (0..12), las posiciones distintas a las que
+    # se llega moviendo una ficha
+    cerradas = [r for r in set(restos) if r > RESTO_INTERNA and restos.count(r) == 2]
+    jugadas = [[] for pasos in range(MAX_PASOS + 1)]
+    for k, r in enumerate(restos):
+        if k and r == restos[k - 1]:
+            continue
+        # En el anillo no se puede pasar de la entrada a la via interna
+        maximo = r - RESTO_INTERNA if r > RESTO_INTERNA else r
+        for pasos in range(1, min(maximo, MAX_PASOS) + 1):
+            destino = r - pasos
+            # Bloqueo propio: dos fichas en una casilla intermedia del anillo
+            if any(destino < c < r for c in cerradas):
+                break
+            nuevos = list(restos)
+            nuevos[k] = destino
+            nuevos.sort()
+            jugadas[pasos].append(tuple(nuevos))
+    return tuple(map(tuple, jugadas))
+
+class TablaFinales:
+    def __init__(self, datos, resto_maximo, ruta=None, mapa=None):
+        self.resto_maximo = resto_maximo
+        self.ruta = ruta
+        self.mapa = mapa
+        self.valores = datos
+        self.rangos = _rangos_finales(resto_maximo)
+        self.memoria = {}  # _seguir con un dado pendiente
+        self.jugadas = {}  # restos -> _jugadas_restos(restos)
+    
+    @staticmethod
+    def tamano(resto_maximo):
+        return _combinaciones(resto_maximo + FICHAS_POR_JUGADOR, FICHAS_POR_JUGADOR)
+    
+    @classmethod
+    def abrir(cls, ruta):
+        with open(ruta, "rb") as f:
+            cabecera = f.read(FORMATO_TABLA_FINALES.size)
+            magia, version, fichas, resto_maximo, n = FORMATO_TABLA_FINALES.unpack(cabecera)
+            if (magia != MAGIA_TABLA_FINALES or version != VERSION_TABLA_FINALES
+                    or fichas != FICHAS_POR_JUGADOR or n != cls.tamano(resto_maximo)):
+                raise ValueError(f"{ruta} no es una tabla de finales de Parques")
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        datos = memoryview(mapa)[FORMATO_TABLA_FINALES.size:FORMATO_TABLA_FINALES.size + 4 * n]
+        if sys.byteorder == "little":
+            valores = datos.cast("f")
+        else:
+            valores = array("f", datos)
+            valores.byteswap()
+        return cls(valores, resto_maximo, ruta, mapa)
+    
+    @classmethod
+    def cargar(cls, ruta=RUTA_TABLA_FINALES, resto_anillo=RESTO_ANILLO):
+        # Abre la tabla y, si no existe, la genera y la guarda antes
+        if not os.path.exists(ruta):
+            cls.generar(resto_anillo).guardar(ruta)
+        return cls.abrir(ruta)
+    
+    def __reduce__(self):
+        # Para mandarla a otro proceso: se reabre el archivo (un mmap no se copia)
+        if self.ruta is not None:
+            return (TablaFinales.abrir, (self.ruta,))
+        return (TablaFinales, (array("f", self.valores), self.resto_maximo))
+    
+    def guardar(self, ruta):
+        valores = array("f", self.valores)
+        if sys.byteorder != "little":
+            valores.byteswap()
+        escribir_atomico(ruta, FORMATO_TABLA_FINALES.pack(
+            MAGIA_TABLA_FINALES, VERSION_TABLA_FINALES, FICHAS_POR_JUGADOR,
+            self.resto_maximo, len(valores)) + valores.tobytes())
+    
+    def cerrar(self):
+        if self.mapa is not None:
+            self.valores.release()
+            self.mapa.close()
+            self.mapa = None
+    
+    # ---------------------
+    # CONSULTAS
+    # ---------------------
+    def indice(self, restos):
+        a, b, c, d = restos
+        rangos = self.rangos
+        return rangos[0][a] + rangos[1][b] + rangos[2][c] + rangos[3][d]
+    
+    def valor(self, restos):
+        # Turnos esperados (contando el actual) desde el comienzo de un turno
+        return self.valores[self.indice(restos)]
+    
+    def restos(self, juego, j):
+        # Restos ordenados de las fichas de j, o None si alguna queda fuera
+        # de la tabla (carcel o lejos de la entrada)
+        restos = []
+        distancias = DISTANCIA_HOGAR[j]
+        for codigo in juego.posiciones[j * FICHAS_POR_JUGADOR:(j + 1) * FICHAS_POR_JUGADOR]:
+            if BASE_INTERNA <= codigo <= META:
+                restos.append(META - codigo)
+            elif codigo < NUM_CASILLAS_EXTERNAS and 0 < distancias[codigo] <= self.resto_maximo - RESTO_INTERNA:
+                restos.append(RESTO_INTERNA + distancias[codigo])
+            else:
+                return None
+        restos.sort()
+        return tuple(restos)
+    
+    def turnos_esperados(self, juego, j):
+        restos = self.restos(juego, j)
+        return None if restos is None else self.valor(restos)
+    
+    def cubre(self, juego, j, solo_interna=True):
+        # solo_interna: todas en la via interna, donde la tabla es exacta
+        restos = self.restos(juego, j)
+        return restos is not None and (not solo_interna or restos[-1] <= RESTO_INTERNA)
+    
+    def _jugadas(self, restos):
+        jugadas = self.jugadas.get(restos)
+        if jugadas is None:
+            jugadas = self.jugadas[restos] = _jugadas_restos(restos)
+        return jugadas
+    
+    def _seguir(self, restos, dados, doble):
+        # Mejor valor tras mover con dados pendientes; pasar cuesta lo que
+        # vale terminar el turno en restos
+        if not dados:
+            return self._fin_turno(restos, doble)
+        clave = (restos, dados, doble) if len(dados) == 1 else None
+        if clave is not None:
+            mejor = self.memoria.get(clave)
+            if mejor is not None:
+                return mejor
+        mejor = self._fin_turno(restos, doble)
+        jugadas = self._jugadas(restos)
+        for usados in OPCIONES_DADOS[dados]:
+            resto_dados = list(dados)
+            for valor in usados:
+                resto_dados.remove(valor)
+            resto_dados = tuple(resto_dados)
+            for nuevos in jugadas[sum(usados)]:
+                valor = self._seguir(nuevos, resto_dados, doble)
+                if valor < mejor:
+                    mejor = valor
+        if clave is not None:
+            self.memoria[clave] = mejor
+        return mejor
+    
+    def _fin_turno(self, restos, doble):
+        if restos[-1] == 0:
+            return 1.0
+        if doble:
+            return self.valores[self.indice(restos)]
+        return 1.0 + self.valores[self.indice(restos)]
+    
+    def mejor_movimiento(self, juego):
+        # (movimiento o None para pasar, turnos esperados) para el jugador
+        # actual con sus dados, o None si la posicion no esta en la tabla
+        j = juego.indice_jugador_actual
+        restos = self.restos(juego, j)
+        if restos is None or not juego.valores_dados:
+            return None
+        dados = tuple(juego.valores_dados)
+        doble = juego.ultimo_doble
+        mejor = None
+        mejor_valor = self._fin_turno(restos, doble)
+        for movimiento in juego.movimientos_legales():
+            i, pasos, usados = movimiento
+            resultado, registro = juego.hacer_movimiento(i, pasos)
+            nuevos = self.restos(juego, j)
+            juego.deshacer_movimiento(registro)
+            resto_dados = list(dados)
+            for valor in usados:
+                resto_dados.remove(valor)
+            if nuevos is None:
+                continue
+            valor = self._seguir(nuevos, tuple(resto_dados), doble)
+            if valor < mejor_valor - 1e-9:
+                mejor, mejor_valor = movimiento, valor
+        return mejor, mejor_valor
+    
+    # ---------------------
+    # GENERACION
+    # ---------------------
+    @classmethod
+    def generar(cls, resto_anillo=RESTO_ANILLO):
+        resto_maximo = RESTO_INTERNA + resto_anillo
+        tabla = cls(array("f", bytes(4 * cls.tamano(resto_maximo))), resto_maximo)
+        posiciones = sorted(itertools.combinations_with_replacement(range(resto_maximo + 1),
+                                                                    FICHAS_POR_JUGADOR), key=sum)
+        for restos in posiciones:
+            if restos[-1] == 0:
+                continue
+            tabla.valores[tabla.indice(restos)] = tabla._resolver(restos)
+        tabla.memoria.clear()
+        tabla.jugadas.clear()
+        return tabla
+    
+    def _resolver(self, restos):
+        # Pasar sin mover deja la misma posicion: valor x = sum p * min(jugar,
+        # c + x), con c = 1 (fin de turno) o 0 (doble). Se fija que tiradas
+        # pasan, se despeja x y se repite hasta que la eleccion no cambia
+        # (iteracion de politicas desde "pasar solo si no hay jugada", que
+        # siempre termina porque con 1-1 siempre se puede mover).
+        posibles = self._jugadas(restos)
+        jugadas = []
+        for d1, d2, probabilidad in TIRADAS:
+            doble = d1 == d2
+            mejor = math.inf
+            dados = (d1, d2)
+            for usados in OPCIONES_DADOS[dados]:
+                resto_dados = list(dados)
+                for valor in usados:
+                    resto_dados.remove(valor)
+                resto_dados = tuple(resto_dados)
+                for nuevos in posibles[sum(usados)]:
+                    valor = self._seguir(nuevos, resto_dados, doble)
+                    if valor < mejor:
+                        mejor = valor
+            jugadas.append((probabilidad, mejor, 0.0 if doble else 1.0))
+        pasan = [mejor == math.inf for probabilidad, mejor, c in jugadas]
+        while True:
+            fijo = sum(p * (c if pasa else mejor) for (p, mejor, c), pasa in zip(jugadas, pasan))
+            lazo = sum(p for (p, mejor, c), pasa in zip(jugadas, pasan) if pasa)
+            x = fijo / (1.0 - lazo)
+            nuevas = [c + x < mejor - 1e-12 for probabilidad, mejor, c in jugadas]
+            if nuevas == pasan:
+                return x
+            pasan = nuevas
+
+# ---------------------
+# SIMULACION DE PARTIDAS SIN INTERFAZ
+# ---------------------
+MAX_TURNOS = 2000
+
+ResultadoPartida = namedtuple("ResultadoPartida", "ganador turnos capturas penalizaciones")
+
+def jugar_turno(juego, politica):
+    # Un lanzamiento completo: tira, mueve mientras queden dados y termina
+    # el turno si la politica pasa o hubo penalizacion de tres dobles.
+    # Devuelve (capturas hechas, si hubo penalizacion).
+    juego.lanzar_dados()
+    if not juego.valores_dados:
+        juego.terminar_turno()
+        return 0, True
+    capturas = 0
+    while juego.valores_dados:
+        movimiento = politica.elegir_movimiento(juego)
+        if movimiento is None:
+            juego.terminar_turno()
+            break
+        resultado, registro = juego.aplicar_movimiento(movimiento)
+        if resultado in CAPTURAS:
+            capturas += 1
+    return capturas, False
+
+def simular_partida(politicas, semilla=None, max_turnos=MAX_TURNOS, rng=None, registro=None):
+    # politicas: un bot por asiento. ganador es None si se llega a max_turnos.
+    # Con registro (un EscritorRepeticion) la partida queda grabada.
+    juego = ParquesGame(semilla, rng=rng)
+    juego.registro = registro
+    capturas = 0
+    penalizaciones = 0
+    for turno in range(max_turnos):
+        c, penalizado = jugar_turno(juego, politicas[juego.indice_jugador_actual])
+        capturas += c
+        penalizaciones += penalizado
+        ganador = juego.ganador()
+        if ganador is not None:
+            return ResultadoPartida(ganador.indice, turno + 1, capturas, penalizaciones)
+    return ResultadoPartida(None, max_turnos, capturas, penalizaciones)
+
+def politicas_deterministas(nombres, semilla):
+    # Bots "primera" o "azar" por asiento, con los flujos que usa ParquesLote
+    return [BOTS_DETERMINISTAS[nombre](GeneradorDados(semilla, 1 + k))
+            for k, nombre in enumerate(nombres)]
+
+def simular_partida_determinista(nombres, semilla, max_turnos=MAX_TURNOS):
+    # La misma partida que juega ParquesLote con esa semilla y esas politicas
+    return simular_partida(politicas_deterministas(nombres, semilla), max_turnos=max_turnos,
+                           rng=GeneradorDados(semilla))
+
+# ---------------------
+# SIMULACION POR LOTES CON NUMPY
+# ---------------------
+# ParquesLote juega N partidas a la vez con arreglos de numpy (una fila por
+# partida) y las mismas reglas que ParquesGame: en cada paso todas las
+# partidas activas juegan un lanzamiento completo. Las politicas son las
+# deterministas ("primera", "azar"), asi que con la misma semilla el
+# resultado coincide con simular_partida_determinista.
+_tablas_lote = None
+
+def _numpy():
+    if not hay_numpy():
+        raise ImportError("la simulacion por lotes necesita numpy (pip install numpy)")
+    return np
+
+def _obtener_tablas_lote():
+    global _tablas_lote
+    if _tablas_lote is None:
+        _numpy()
+        segura = np.zeros(NUM_CASILLAS_EXTERNAS, dtype=bool)
+        segura[list(CASILLAS_SEGURAS)] = True
+        _tablas_lote = {
+            "tipo": np.frombuffer(bytes(TIPO_MOVIMIENTO), dtype=np.uint8),
+            "destino": np.frombuffer(bytes(DESTINO_MOVIMIENTO), dtype=np.uint8),
+            "bonus": np.frombuffer(DESTINO_BONUS, dtype=np.uint8),
+            "segura": segura,
+        }
+    return _tablas_lote
+
+def _splitmix64_np(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class ParquesLote:
+    def __init__(self, semillas, politicas=("primera",) * NUM_JUGADORES):
+        _numpy()
+        self.t = _obtener_tablas_lote()
+        semillas = [int(s) for s in semillas]
+        n = len(semillas)
+        self.n = n
+        self.posiciones = np.full((n, NUM_FICHAS), CARCEL, dtype=np.uint8)
+        self.orden = np.zeros((n, NUM_FICHAS), dtype=np.uint8)
+        self.ocupacion = np.zeros((n, NUM_CASILLAS_EXTERNAS), dtype=np.uint8)
+        self.ocupacion_jugador = np.zeros((n, NUM_CASILLAS_EXTERNAS, NUM_JUGADORES), dtype=np.uint8)
+        self.bloqueos = np.zeros((n, NUM_CASILLAS_EXTERNAS), dtype=bool)
+        self.turno = np.zeros(n, dtype=np.int64)
+        self.contador_dobles = np.zeros((n, NUM_JUGADORES), dtype=np.uint8)
+        self.ultima_ficha_movida = np.full((n, NUM_JUGADORES), NINGUNA, dtype=np.uint8)
+        self.ultimo_doble = np.zeros(n, dtype=bool)
+        self.activa = np.ones(n, dtype=bool)
+        self.ganador = np.full(n, -1, dtype=np.int8)
+        self.turnos = np.zeros(n, dtype=np.int32)
+        self.capturas = np.zeros(n, dtype=np.int32)
+        self.penalizaciones = np.zeros(n, dtype=np.int32)
+        # Flujos de numeros: 0 para los dados, 1..4 para las decisiones de cada asiento
+        self.base_dados = np.array([base_flujo(s, 0) for s in semillas], dtype=np.uint64)
+        self.contador_dados = np.zeros(n, dtype=np.uint64)
+        self.base_azar = np.array([[base_flujo(s, 1 + k) for k in range(NUM_JUGADORES)]
+                                   for s in semillas], dtype=np.uint64).reshape(n, NUM_JUGADORES)
+        self.contador_azar = np.zeros((n, NUM_JUGADORES), dtype=np.uint64)
+        self.azar_por_asiento = np.array([nombre == "azar" for nombre in politicas])
+        for nombre in politicas:
+            if nombre not in BOTS_DETERMINISTAS:
+                raise ValueError(f"politica desconocida: {nombre}")
+    
+    def ejecutar(self, max_turnos=MAX_TURNOS):
+        while self.activa.any():
+            self.paso(max_turnos)
+        return self
+    
+    def resultados(self):
+        for g in range(self.n):
+            ganador = int(self.ganador[g])
+            yield ResultadoPartida(ganador if ganador >= 0 else None, int(self.turnos[g]),
+                                   int(self.capturas[g]), int(self.penalizaciones[g]))
+    
+    # ---------------------
+    # UN LANZAMIENTO EN TODAS LAS PARTIDAS ACTIVAS
+    # ---------------------
+    def paso(self, max_turnos=MAX_TURNOS):
+        A = np.flatnonzero(self.activa)
+        if not A.size:
+            return
+        p = self.turno[A]
+        d1 = self._dado(A)
+        d2 = self._dado(A)
+        doble = d1 == d2
+        self.ultimo_doble[A] = doble
+        dobles = np.where(doble, self.contador_dobles[A, p] + 1, 0).astype(np.uint8)
+        self.contador_dobles[A, p] = dobles
+        
+        # Tercer doble: penalizacion y fin del lanzamiento
+        pen = dobles == 3
+        if pen.any():
+            self._penalizar(A[pen], p[pen])
+            self.contador_dobles[A[pen], p[pen]] = 0
+            self.penalizaciones[A[pen]] += 1
+        
+        M = A[~pen]
+        if M.size:
+            d1m = d1[~pen]
+            d2m = d2[~pen]
+            # Opciones en el orden de movimientos_legales: d1, d2 (si no es
+            # doble) y la suma. Quedan dados segun la opcion elegida.
+            pasos = np.stack([d1m, d2m, d1m + d2m], axis=1)
+            validas = np.stack([np.ones_like(doble[~pen]), d1m != d2m, np.ones_like(doble[~pen])], axis=1)
+            elegidos, opcion, pieza = self._elegir(M, pasos, validas)
+            G = M[elegidos]
+            self._mover(G, pieza, pasos[elegidos, opcion])
+            
+            # Segundo dado para quien uso solo uno
+            queda = opcion < 2
+            G2 = G[queda]
+            if G2.size:
+                restante = np.where(opcion[queda] == 0, d2m[elegidos][queda], d1m[elegidos][queda])
+                pasos2 = np.zeros((G2.size, 3), dtype=pasos.dtype)
+                pasos2[:, 0] = restante
+                validas2 = np.zeros((G2.size, 3), dtype=bool)
+                validas2[:, 0] = True
+                elegidos2, opcion2, pieza2 = self._elegir(G2, pasos2, validas2)
+                self._mover(G2[elegidos2], pieza2, restante[elegidos2])
+        
+        # Todos los lanzamientos terminan con terminar_turno
+        sigue = self.ultimo_doble[A]
+        cambia = A[~sigue]
+        self.contador_dobles[cambia, self.turno[cambia]] = 0
+        self.turno[cambia] = (self.turno[cambia] + 1) % NUM_JUGADORES
+        self.ultimo_doble[A] = False
+        
+        self.turnos[A] += 1
+        llegaron = (self.posiciones[A].reshape(-1, NUM_JUGADORES, FICHAS_POR_JUGADOR) == META).all(axis=2)
+        hay = llegaron.any(axis=1)
+        self.ganador[A[hay]] = llegaron[hay].argmax(axis=1)
+        self.activa[A[hay]] = False
+        self.activa[A[self.turnos[A] >= max_turnos]] = False
+    
+    def _dado(self, G):
+        x = _splitmix64_np(self.base_dados[G] + self.contador_dados[G])
+        self.contador_dados[G] += np.uint64(1)
+        return (1 + (x >> np.uint64(11)) % np.uint64(6)).astype(np.int64)
+    
+    def _actualizar_bloqueos(self, G, q):
+        self.bloqueos[G, q] = (self.ocupacion[G, q] == 2) & (self.ocupacion_jugador[G, q].max(axis=1) == 2)
+    
+    def _acumulado_bloqueos(self, G):
+        # acumulado[g, k]: bloqueos en las casillas 0..k-1 del tablero dado
+        # dos veces, para sumar cualquier camino de hasta 68 casillas
+        b = self.bloqueos[G]
+        acumulado = np.zeros((len(G), 2 * NUM_CASILLAS_EXTERNAS + 1), dtype=np.int16)
+        np.cumsum(np.concatenate([b, b], axis=1), axis=1, out=acumulado[:, 1:])
+        return acumulado
+    
+    def _camino_bloqueado(self, acumulado, inicio, pasos):
+        # Como MASCARAS_CAMINO: casillas intermedias inicio + 1 .. inicio + pasos - 1
+        fin = inicio + np.maximum(pasos, 1)
+        return (np.take_along_axis(acumulado, fin.reshape(len(acumulado), -1), axis=1)
+                > np.take_along_axis(acumulado, (inicio + 1).reshape(len(acumulado), -1), axis=1)
+                ).reshape(fin.shape)
+    
+    # ---------------------
+    # ELECCION DE MOVIMIENTO
+    # ---------------------
+    def _legales(self, G, pasos, validas):
+        # legal[g, opcion, ficha] para las 4 fichas del jugador en turno
+        t = self.t
+        p = self.turno[G]
+        fichas = p[:, None] * FICHAS_POR_JUGADOR + np.arange(FICHAS_POR_JUGADOR)
+        codigos = np.take_along_axis(self.posiciones[G], fichas, axis=1).astype(np.int64)
+        k = ((p[:, None, None] * NUM_CODIGOS + codigos[:, None, :]) * PASOS_TABLA
+             + np.where(validas, pasos, 0)[:, :, None])
+        tipo = t["tipo"][k]
+        destino = t["destino"][k].astype(np.int64)
+        en_tablero = np.minimum(codigos, NUM_CASILLAS_EXTERNAS - 1)
+        bloqueado = self._camino_bloqueado(self._acumulado_bloqueos(G),
+                                           np.broadcast_to(en_tablero[:, None, :], tipo.shape),
+                                           np.broadcast_to(pasos[:, :, None], tipo.shape))
+        ocupacion_destino = np.take_along_axis(
+            self.ocupacion[G], np.minimum(destino, NUM_CASILLAS_EXTERNAS - 1).reshape(len(G), -1),
+            axis=1).reshape(destino.shape)
+        legal = ((((tipo == MOV_NORMAL) | (tipo == MOV_ENTRA_INTERNA)) & ~bloqueado)
+                 | ((tipo == MOV_SALIDA) & (ocupacion_destino < 2))
+                 | (tipo == MOV_INTERNA) | (tipo == MOV_META))
+        return legal & validas[:, :, None]
+    
+    def _elegir(self, G, pasos, validas):
+        # Devuelve (indices de G que mueven, opcion, ficha) segun la politica
+        # de cada asiento; las partidas sin movimiento legal pasan
+        legal = self._legales(G, pasos, validas).reshape(len(G), -1)
+        cuantos = legal.sum(axis=1)
+        hay = cuantos > 0
+        primera = legal.argmax(axis=1)
+        
+        p = self.turno[G]
+        azar = hay & self.azar_por_asiento[p]
+        if azar.any():
+            Ga = G[azar]
+            pa = p[azar]
+            x = _splitmix64_np(self.base_azar[Ga, pa] + self.contador_azar[Ga, pa])
+            self.contador_azar[Ga, pa] += np.uint64(1)
+            k = ((x >> np.uint64(11)) % cuantos[azar].astype(np.uint64)).astype(np.int64)
+            acumulado = np.cumsum(legal[azar], axis=1)
+            primera[azar] = (acumulado > k[:, None]).argmax(axis=1)
+        
+        elegidos = np.flatnonzero(hay)
+        indice = primera[elegidos]
+        opcion = indice // FICHAS_POR_JUGADOR
+        pieza = p[elegidos] * FICHAS_POR_JUGADOR + indice % FICHAS_POR_JUGADOR
+        return elegidos, opcion, pieza
+    
+    # ---------------------
+    # APLICAR MOVIMIENTOS (UNO POR PARTIDA)
+    # ---------------------
+    def _quitar(self, G, piezas):
+        q = self.posiciones[G, piezas].astype(np.int64)
+        en = q < NUM_CASILLAS_EXTERNAS
+        G, piezas, q = G[en], piezas[en], q[en]
+        if not G.size:
+            return
+        self.ocupacion[G, q] -= 1
+        self.ocupacion_jugador[G, q, piezas // FICHAS_POR_JUGADOR] -= 1
+        self._actualizar_bloqueos(G, q)
+        rango = self.orden[G, piezas]
+        detras = (self.posiciones[G] == q[:, None]) & (self.orden[G] > rango[:, None])
+        self.orden[G] = self.orden[G] - detras
+        self.orden[G, piezas] = 0
+    
+    def _poner(self, G, piezas, q):
+        self.orden[G, piezas] = self.ocupacion[G, q]
+        self.ocupacion[G, q] += 1
+        self.ocupacion_jugador[G, q, piezas // FICHAS_POR_JUGADOR] += 1
+        self._actualizar_bloqueos(G, q)
+        self.posiciones[G, piezas] = q
+    
+    def _mover(self, G, piezas, pasos):
+        t = self.t
+        j = piezas // FICHAS_POR_JUGADOR
+        self.ultima_ficha_movida[G, j] = piezas
+        codigos = self.posiciones[G, piezas].astype(np.int64)
+        k = (j * NUM_CODIGOS + codigos) * PASOS_TABLA + pasos
+        tipo = t["tipo"][k]
+        destino = t["destino"][k].astype(np.int64)
+        
+        s = tipo == MOV_SALIDA
+        self._poner(G[s], piezas[s], destino[s])
+        
+        s = (tipo == MOV_INTERNA) | (tipo == MOV_META)
+        self.posiciones[G[s], piezas[s]] = destino[s]
+        
+        s = tipo == MOV_ENTRA_INTERNA
+        self._quitar(G[s], piezas[s])
+        self.posiciones[G[s], piezas[s]] = destino[s]
+        
+        s = tipo == MOV_NORMAL
+        Gn, pn, dn = G[s], piezas[s], destino[s]
+        if not Gn.size:
+            return
+        primero = (self.posiciones[Gn] == dn[:, None]) & (self.orden[Gn] == 0)
+        victima = primero.argmax(axis=1)
+        captura = ((self.ocupacion[Gn, dn] > 0) & ~t["segura"][dn]
+                   & (victima // FICHAS_POR_JUGADOR != pn // FICHAS_POR_JUGADOR))
+        
+        c = ~captura
+        self._quitar(Gn[c], pn[c])
+        self._poner(Gn[c], pn[c], dn[c])
+        
+        Gc, pc, dc, vc = Gn[captura], pn[captura], dn[captura], victima[captura]
+        if not Gc.size:
+            return
+        self._quitar(Gc, vc)
+        self.posiciones[Gc, vc] = CARCEL
+        self._quitar(Gc, pc)
+        self._poner(Gc, pc, dc)
+        self.capturas[Gc] += 1
+        # Bonus de 20 casillas si el camino esta libre y el destino no esta lleno
+        bloqueado = self._camino_bloqueado(self._acumulado_bloqueos(Gc), dc,
+                                           np.full(len(Gc), BONUS_CAPTURA))
+        bonus = t["bonus"][dc].astype(np.int64)
+        b = ~bloqueado & (self.ocupacion[Gc, bonus] < 2)
+        self._quitar(Gc[b], pc[b])
+        self._poner(Gc[b], pc[b], bonus[b])
+    
+    def _penalizar(self, G, p):
+        ultima = self.ultima_ficha_movida[G, p].astype(np.int64)
+        sin = ultima == NINGUNA
+        if sin.any():
+            fichas = p[sin, None] * FICHAS_POR_JUGADOR + np.arange(FICHAS_POR_JUGADOR)
+            fuera = np.take_along_axis(self.posiciones[G[sin]], fichas, axis=1) != CARCEL
+            ultima[sin] = np.where(fuera.any(axis=1), fichas[np.arange(len(fichas)), fuera.argmax(axis=1)],
+                                   p[sin] * FICHAS_POR_JUGADOR)
+            self.ultima_ficha_movida[G, p] = ultima
+        self._quitar(G, ultima)
+        self.posiciones[G, ultima] = CARCEL
+
+# ---------------------
+# TORNEOS ENTRE BOTS EN PARALELO
+# ---------------------
+# Todos contra todos por parejas: cada partida enfrenta dos politicas en
+# asientos alternos (A B A B, y B A B A en la siguiente). La semilla de cada
+# partida sale de la semilla del torneo, el emparejamiento y el numero de
+# partida, asi que el resultado no depende de cuantos procesos se usen ni
+# del orden en que terminen los bloques.
+Z_95 = 1.959963984540054
+
+def semilla_partida(semilla, emparejamiento, partida):
+    return splitmix64(base_flujo(semilla) ^ ((emparejamiento << 32) | partida))
+
+def crear_politica(nombre, semilla, asiento, presupuesto=0.05, tabla=None):
+    if nombre in BOTS_DETERMINISTAS:
+        return BOTS_DETERMINISTAS[nombre](GeneradorDados(semilla, 1 + asiento))
+    if nombre == BotAleatorio.nombre:
+        return BotAleatorio(base_flujo(semilla, 1 + asiento))
+    if nombre == BotExpectiminimax.nombre:
+        return BotExpectiminimax(presupuesto=presupuesto, tabla=tabla)
+    raise ValueError(f"politica desconocida: {nombre}")
+
+# Tabla de transposicion del proceso (2**18 entradas, unos 5 MB), en vez de
+# una nueva por asiento en cada partida del torneo
+_tabla_proceso = None
+
+def crear_politicas(nombres, semilla, presupuesto=0.05):
+    # Los bots de una partida. Los expectiminimax comparten la tabla del
+    # proceso (cada uno mezcla su asiento en las claves), vaciada al empezar
+    global _tabla_proceso
+    tabla = None
+    if BotExpectiminimax.nombre in nombres:
+        if _tabla_proceso is None:
+            _tabla_proceso = TablaTransposicion()
+        tabla = _tabla_proceso
+        tabla.limpiar()
+    return [crear_politica(nombre, semilla, asiento, presupuesto, tabla)
+            for asiento, nombre in enumerate(nombres)]
+
+POLITICAS_TORNEO = tuple(BOTS_DETERMINISTAS) + (BotAleatorio.nombre, BotExpectiminimax.nombre)
+
+class Marcador:
+    # Acumulador de un emparejamiento A contra B. Dos marcadores del mismo
+    # emparejamiento se suman con fusionar(), en cualquier orden.
+    __slots__ = ("partidas", "victorias_a", "victorias_b", "sin_ganador",
+                 "turnos", "turnos_cuadrado", "capturas", "penalizaciones")
+    
+    def __init__(self):
+        self.partidas = 0
+        self.victorias_a = 0
+        self.victorias_b = 0
+        self.sin_ganador = 0
+        self.turnos = 0
+        self.turnos_cuadrado = 0
+        self.capturas = 0
+        self.penalizaciones = 0
+    
+    def agregar(self, resultado, gana_a):
+        self.partidas += 1
+        if resultado.ganador is None:
+            self.sin_ganador += 1
+        elif gana_a:
+            self.victorias_a += 1
+        else:
+            self.victorias_b += 1
+        self.turnos += resultado.turnos
+        self.turnos_cuadrado += resultado.turnos * resultado.turnos
+        self.capturas += resultado.capturas
+        self.penalizaciones += resultado.penalizaciones
+    
+    def fusionar(self, otro):
+        for campo in Marcador.__slots__:
+            setattr(self, campo, getattr(self, campo) + getattr(otro, campo))
+        return self
+    
+    def tasa_a(self):
+        # Fraccion de victorias de A (las partidas sin ganador cuentan medio punto)
+        if not self.partidas:
+            return 0.0, 0.0, 0.0
+        return intervalo_wilson(self.victorias_a + 0.5 * self.sin_ganador, self.partidas)
+    
+    def media_turnos(self):
+        if not self.partidas:
+            return 0.0, 0.0
+        n = self.partidas
+        media = self.turnos / n
+        varianza = max(self.turnos_cuadrado / n - media * media, 0.0)
+        return media, Z_95 * math.sqrt(varianza / n)
+
+def intervalo_wilson(exitos, n, z=Z_95):
+    # (proporcion, limite inferior, limite superior) al 95 %
+    p = exitos / n
+    centro = (p + z * z / (2 * n)) / (1 + z * z / n)
+    radio = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return p, centro - radio, centro + radio
+
+def emparejamientos_torneo(politicas):
+    return [(a, b) for k, a in enumerate(politicas) for b in politicas[k + 1:]]
+
+def bloques_torneo(politicas, partidas, tamano_bloque):
+    # Tareas (emparejamiento, a, b, primera partida, cuantas)
+    for e, (a, b) in enumerate(emparejamientos_torneo(politicas)):
+        for inicio in range(0, partidas, tamano_bloque):
+            yield e, a, b, inicio, min(tamano_bloque, partidas - inicio)
+
+def jugar_bloque(tarea, semilla=0, presupuesto=0.05, max_turnos=MAX_TURNOS):
+    e, a, b, inicio, cuantas = tarea
+    marcador = Marcador()
+    for partida in range(inicio, inicio + cuantas):
+        s = semilla_partida(semilla, e, partida)
+        # Partidas pares: A en los asientos 0 y 2; impares: en 1 y 3
+        asientos = (a, b, a, b) if partida % 2 == 0 else (b, a, b, a)
+        politicas = crear_politicas(asientos, s, presupuesto)
+        resultado = simular_partida(politicas, max_turnos=max_turnos, rng=GeneradorDados(s))
+        gana_a = resultado.ganador is not None and asientos[resultado.ganador] == a
+        marcador.agregar(resultado, gana_a)
+    return e, marcador
+
+def _jugar_bloque_trabajador(argumentos):
+    return jugar_bloque(*argumentos)
+
+def ejecutar_torneo(politicas, partidas, semilla=0, procesos=None, tamano_bloque=50,
+                    presupuesto=0.05, max_turnos=MAX_TURNOS, al_recibir=None):
+    # Devuelve {(a, b): Marcador}. al_recibir(marcadores, hechas, total) se
+    # llama cada vez que llega un bloque, con los marcadores ya fusionados.
+    parejas = emparejamientos_torneo(politicas)
+    marcadores = {pareja: Marcador() for pareja in parejas}
+    tareas = [(tarea, semilla, presupuesto, max_turnos)
+              for tarea in bloques_torneo(politicas, partidas, tamano_bloque)]
+    total = partidas * len(parejas)
+    hechas = 0
+    
+    def recibir(e, marcador):
+        nonlocal hechas
+        marcadores[parejas[e]].fusionar(marcador)
+        hechas += marcador.partidas
+        if al_recibir is not None:
+            al_recibir(marcadores, hechas, total)
+    
+    if procesos == 1:
+        for argumentos in tareas:
+            recibir(*_jugar_bloque_trabajador(argumentos))
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(procesos) as pool:
+            for e, marcador in pool.imap_unordered(_jugar_bloque_trabajador, tareas):
+                recibir(e, marcador)
+    return marcadores
+
+def informe_torneo(marcadores):
+    lineas = []
+    for (a, b), m in marcadores.items():
+        if not m.partidas:
+            continue
+        p, bajo, alto = m.tasa_a()
+        media, radio = m.media_turnos()
+        lineas.append(f"{a} vs {b}: {m.partidas} partidas, {a} gana {100 * p:.1f}% "
+                      f"[{100 * bajo:.1f}, {100 * alto:.1f}], sin ganador {m.sin_ganador}, "
+                      f"turnos {media:.1f} +- {radio:.1f}, capturas/partida {m.capturas / m.partidas:.2f}")
+    return "\n".join(lineas)
+
+# ---------------------
+# REPETICIONES: REGISTRO BINARIO DE PARTIDAS
+# ---------------------
+# Archivo de solo anexar: cabecera (semilla e intervalo de puntos de
+# control) y un registro por accion: tirada (3 bytes), movimiento (3 bytes)
+# o pasar (1 byte). Cada INTERVALO_CONTROL acciones se anade un punto de
+# control con el estado completo, y al cerrar se escribe un indice
+# (accion, posicion en el archivo) de los puntos de control. Para ir a la
+# accion n se carga el punto de control anterior y se reproducen solo las
+# acciones que faltan. Un archivo sin indice (partida cortada) se lee igual:
+# el indice se reconstruye recorriendo los registros.
+CABECERA_REPETICION = struct.Struct(">4sBQH")
+MAGIA_REPETICION = b"PRQR"
+MAGIA_INDICE = b"PRQI"
+VERSION_REPETICION = 1
+INTERVALO_CONTROL = 64
+FORMATO_CONTROL = struct.Struct(">I")
+FORMATO_ENTRADA_INDICE = struct.Struct(">IQ")
+FORMATO_PIE = struct.Struct(">Q4s")
+
+REG_TIRADA = 1    # dados (d1 << 4 | d2), ficha seleccionada o NINGUNA
+REG_MOVER = 2     # ficha, dados usados (d1 << 4 | d2, d2 = 0 si es uno)
+REG_PASAR = 3
+REG_CONTROL = 4   # numero de accion y ParquesGame.exportar_estado()
+REG_INDICE = 5    # n y n entradas (accion, posicion); luego el pie
+LONGITUD_REGISTRO = {REG_TIRADA: 2, REG_MOVER: 2, REG_PASAR: 0,
+                     REG_CONTROL: FORMATO_CONTROL.size + FORMATO_ESTADO.size}
+
+def empaquetar_dados(dados):
+    return (dados[0] << 4) | (dados[1] if len(dados) > 1 else 0)
+
+def desempaquetar_dados(byte):
+    return (byte >> 4, byte & 15) if byte & 15 else (byte >> 4,)
+
+def registro_tirada(d1, d2, ficha_seleccionada=None):
+    seleccion = NINGUNA if ficha_seleccionada is None else ficha_seleccionada.indice
+    return bytes((REG_TIRADA, (d1 << 4) | d2, seleccion))
+
+def registro_movimiento(i, dados):
+    return bytes((REG_MOVER, i, empaquetar_dados(dados)))
+
+REGISTRO_PASAR = bytes((REG_PASAR,))
+
+class EscritorRepeticion:
+    # Se asigna a juego.registro: el motor le avisa de cada accion
+    def __init__(self, archivo, semilla=0, intervalo=INTERVALO_CONTROL):
+        self.archivo = archivo
+        self.intervalo = intervalo
+        self.acciones = 0
+        self.indice = []
+        self.archivo.write(CABECERA_REPETICION.pack(MAGIA_REPETICION, VERSION_REPETICION,
+                                                    semilla & MASCARA_64, intervalo))
+        self.posicion = CABECERA_REPETICION.size
+    
+    @classmethod
+    def abrir(cls, ruta, juego=None, semilla=0, intervalo=INTERVALO_CONTROL):
+        escritor = cls(open(ruta, "wb"), semilla, intervalo)
+        if juego is not None:
+            escritor.control(juego)
+            agregar_registro(juego, escritor)
+        return escritor
+    
+    def _escribir(self, datos):
+        self.archivo.write(datos)
+        self.posicion += len(datos)
+    
+    def control(self, juego):
+        # Punto de control con el estado actual (antes de la siguiente accion)
+        self.indice.append((self.acciones, self.posicion))
+        self._escribir(bytes((REG_CONTROL,)) + FORMATO_CONTROL.pack(self.acciones) + juego.exportar_estado())
+    
+    def _accion(self, juego, datos):
+        if self.acciones % self.intervalo == 0 and (not self.indice or self.indice[-1][0] != self.acciones):
+            self.control(juego)
+        self._escribir(datos)
+        self.acciones += 1
+    
+    def tirada(self, juego, d1, d2, ficha_seleccionada=None):
+        self._accion(juego, registro_tirada(d1, d2, ficha_seleccionada))
+    
+    def movimiento(self, juego, i, dados):
+        self._accion(juego, registro_movimiento(i, dados))
+    
+    def pasar(self, juego):
+        self._accion(juego, REGISTRO_PASAR)
+    
+    def cerrar(self):
+        posicion_indice = self.posicion
+        datos = bytearray((REG_INDICE,)) + FORMATO_CONTROL.pack(len(self.indice))
+        for entrada in self.indice:
+            datos += FORMATO_ENTRADA_INDICE.pack(*entrada)
+        self._escribir(bytes(datos) + FORMATO_PIE.pack(posicion_indice, MAGIA_INDICE))
+        self.archivo.close()
+
+def leer_registros(f, desde):
+    # (posicion, tipo, datos) hasta el indice o el final del archivo
+    f.seek(desde)
+    posicion = desde
+    while True:
+        tipo = f.read(1)
+        if not tipo:
+            return
+        tipo = tipo[0]
+        if tipo == REG_INDICE:
+            return
+        longitud = LONGITUD_REGISTRO.get(tipo)
+        if longitud is None:
+            raise ValueError(f"registro desconocido {tipo} en {posicion}")
+        datos = f.read(longitud)
+        if len(datos) < longitud:
+            return  # registro cortado al final de un archivo sin cerrar
+        yield posicion, tipo, datos
+        posicion += 1 + len(datos)
+
+def decodificar_accion(tipo, datos):
+    # (REG_TIRADA, d1, d2, seleccion), (REG_MOVER, ficha, dados), (REG_PASAR,)
+    # o None si el registro no es una accion
+    if tipo == REG_TIRADA:
+        return (REG_TIRADA, datos[0] >> 4, datos[0] & 15, datos[1])
+    if tipo == REG_MOVER:
+        return (REG_MOVER, datos[0], desempaquetar_dados(datos[1]))
+    if tipo == REG_PASAR:
+        return (REG_PASAR,)
+    return None
+
+def aplicar_accion(juego, accion):
+    # Repite sobre juego una accion leida de una repeticion
+    tipo = accion[0]
+    if tipo == REG_TIRADA:
+        _, d1, d2, seleccion = accion
+        juego.aplicar_tirada(d1, d2, None if seleccion == NINGUNA else juego.ficha(seleccion))
+    elif tipo == REG_MOVER:
+        _, i, dados = accion
+        juego.aplicar_movimiento((i, sum(dados), dados))
+    else:
+        juego.terminar_turno()
+
+class LectorRepeticion:
+    # Lectura en streaming: acciones() recorre el archivo sin cargarlo entero;
+    # estado_en(n) salta al punto de control mas cercano
+    def __init__(self, ruta):
+        self.archivo = open(ruta, "rb")
+        magia, version, self.semilla, self.intervalo = CABECERA_REPETICION.unpack(
+            self.archivo.read(CABECERA_REPETICION.size))
+        if magia != MAGIA_REPETICION or version != VERSION_REPETICION:
+            raise ValueError(f"{ruta} no es una repeticion de Parques")
+        self._indice = None
+        self.total = None
+    
+    def cerrar(self):
+        self.archivo.close()
+    
+    def _registros(self, desde=CABECERA_REPETICION.size):
+        return leer_registros(self.archivo, desde)
+    
+    def acciones(self, desde=CABECERA_REPETICION.size):
+        # Acciones decodificadas (ver decodificar_accion)
+        for posicion, tipo, datos in self._registros(desde):
+            accion = decodificar_accion(tipo, datos)
+            if accion is not None:
+                yield accion
+    
+    def indice(self):
+        # [(accion, posicion)] de los puntos de control: del pie del archivo
+        # si se cerro bien, o recorriendo los registros si no
+        if self._indice is not None:
+            return self._indice
+        f = self.archivo
+        f.seek(0, 2)
+        tamano = f.tell()
+        if tamano >= CABECERA_REPETICION.size + FORMATO_PIE.size:
+            f.seek(tamano - FORMATO_PIE.size)
+            posicion_indice, magia = FORMATO_PIE.unpack(f.read(FORMATO_PIE.size))
+            if magia == MAGIA_INDICE:
+                f.seek(posicion_indice + 1)
+                n, = FORMATO_CONTROL.unpack(f.read(FORMATO_CONTROL.size))
+                datos = f.read(n * FORMATO_ENTRADA_INDICE.size)
+                self._indice = [FORMATO_ENTRADA_INDICE.unpack_from(datos, k * FORMATO_ENTRADA_INDICE.size)
+                                for k in range(n)]
+                return self._indice
+        indice = []
+        acciones = 0
+        for posicion, tipo, datos in self._registros():
+            if tipo == REG_CONTROL:
+                indice.append((FORMATO_CONTROL.unpack_from(datos)[0], posicion))
+            else:
+                acciones += 1
+        self._indice = indice
+        self.total = acciones
+        return indice
+    
+    def estado_en(self, accion):
+        # ParquesGame tal como estaba antes de la accion numero "accion"
+        # (0: estado inicial). Devuelve None si la partida es mas corta.
+        indice = self.indice()
+        k = bisect.bisect_right(indice, (accion, float("inf"))) - 1
+        if k < 0:
+            raise ValueError("la repeticion no tiene puntos de control")
+        numero, posicion = indice[k]
+        self.archivo.seek(posicion + 1 + FORMATO_CONTROL.size)
+        juego = ParquesGame()
+        juego.importar_estado(self.archivo.read(FORMATO_ESTADO.size))
+        inicio = posicion + 1 + FORMATO_CONTROL.size + FORMATO_ESTADO.size
+        for accion_leida in itertools.islice(self.acciones(inicio), accion - numero):
+            aplicar_accion(juego, accion_leida)
+            numero += 1
+        return juego if numero == accion else None
+    
+    def reproducir(self):
+        # (numero de accion, accion, juego despues de aplicarla) desde el principio
+        juego = self.estado_en(0)
+        for numero, accion in enumerate(self.acciones()):
+            aplicar_accion(juego, accion)
+            yield numero, accion, juego
+
+class VariosRegistros:
+    # Reparte los avisos del motor entre varios registros (por ejemplo una
+    # repeticion y el autoguardado a la vez)
+    def __init__(self, *registros):
+        self.registros = registros
+    
+    def tirada(self, juego, d1, d2, ficha_seleccionada=None):
+        for registro in self.registros:
+            registro.tirada(juego, d1, d2, ficha_seleccionada)
+    
+    def movimiento(self, juego, i, dados):
+        for registro in self.registros:
+            registro.movimiento(juego, i, dados)
+    
+    def pasar(self, juego):
+        for registro in self.registros:
+            registro.pasar(juego)
+
+def agregar_registro(juego, registro):
+    if juego.registro is None:
+        juego.registro = registro
+    else:
+        juego.registro = VariosRegistros(juego.registro, registro)
+
+# ---------------------
+# ANALISIS DE REPETICIONES EN PARALELO
+# ---------------------
+# Recorre directorios de repeticiones (.prq) en una sola pasada. Cada
+# proceso reproduce un bloque de archivos sobre un EstadisticasPartidas y
+# el proceso principal las va sumando con fusionar(), como los Marcador
+# del torneo. Todo tiene tamano fijo (la duracion es un histograma por
+# clases) y nunca hay mas de 2 bloques por proceso pendientes, asi que la
+# memoria no depende del tamano del corpus.
+CLASE_DURACION = 10        # lanzamientos por clase del histograma
+CLASES_DURACION = 201      # la ultima junta las partidas de 2000 lanzamientos o mas
+MAX_ERRORES_GUARDADOS = 10
+NUM_RESULTADOS = RES_PENALIZACION + 1
+
+class EstadisticasPartidas:
+    __slots__ = ("partidas", "sin_ganador", "victorias", "lanzamientos", "lanzamientos_cuadrado",
+                 "duraciones", "resultados", "opciones", "opciones_bloqueadas", "salidas_ocupadas",
+                 "penalizaciones", "archivos_con_error", "errores")
+    
+    def __init__(self):
+        self.partidas = 0
+        self.sin_ganador = 0
+        self.victorias = [0] * NUM_JUGADORES
+        self.lanzamientos = 0
+        self.lanzamientos_cuadrado = 0
+        self.duraciones = [0] * CLASES_DURACION
+        # Cuantas veces salio cada RES_* al jugar un movimiento
+        self.resultados = [0] * NUM_RESULTADOS
+        # Opciones (ficha, dados) de quien decide que podrian mover y cuantas
+        # frena un bloqueo en el camino o una salida con dos fichas
+        self.opciones = 0
+        self.opciones_bloqueadas = 0
+        self.salidas_ocupadas = 0
+        self.penalizaciones = [0] * NUM_JUGADORES
+        self.archivos_con_error = 0
+        self.errores = []  # los primeros MAX_ERRORES_GUARDADOS (ruta, motivo)
+    
+    def fusionar(self, otra):
+        for campo in EstadisticasPartidas.__slots__:
+            valor = getattr(self, campo)
+            if isinstance(valor, list):
+                if campo == "errores":
+                    valor.extend(otra.errores[:MAX_ERRORES_GUARDADOS - len(valor)])
+                else:
+                    for k, n in enumerate(getattr(otra, campo)):
+                        valor[k] += n
+            else:
+                setattr(self, campo, valor + getattr(otra, campo))
+        return self
+    
+    def contar_opciones(self, juego):
+        dados = juego.valores_dados
+        if not dados:
+            return
+        j = juego.indice_jugador_actual
+        base = j * FICHAS_POR_JUGADOR
+        for usados in OPCIONES_DADOS[tuple(dados)]:
+            pasos = MOVIMIENTOS_CON[usados][0][1]
+            for i in range(base, base + FICHAS_POR_JUGADOR):
+                codigo = juego.posiciones[i]
+                k = (j * NUM_CODIGOS + codigo) * PASOS_TABLA + pasos
+                tipo = TIPO_MOVIMIENTO[k]
+                if tipo == MOV_NORMAL or tipo == MOV_ENTRA_INTERNA:
+                    self.opciones += 1
+                    if juego.bloqueos & MASCARAS_CAMINO[codigo][pasos]:
+                        self.opciones_bloqueadas += 1
+                elif tipo == MOV_SALIDA:
+                    self.opciones += 1
+                    if juego.ocupacion[DESTINO_MOVIMIENTO[k]] >= 2:
+                        self.salidas_ocupadas += 1
+                elif tipo == MOV_INTERNA or tipo == MOV_META:
+                    self.opciones += 1
+    
+    def analizar(self, ruta):
+        # Reproduce una repeticion. Un archivo que no se puede leer o con una
+        # accion imposible se cuenta como error y no suma nada. Los
+        # movimientos rechazados (la ventana deja intentarlos) si valen.
+        parcial = EstadisticasPartidas()
+        try:
+            lector = LectorRepeticion(ruta)
+        except (OSError, ValueError, struct.error) as e:
+            self._error(ruta, e)
+            return
+        try:
+            juego = lector.estado_en(0)
+            lanzamientos = 0
+            for accion in lector.acciones():
+                tipo = accion[0]
+                if not accion_valida(juego, accion):
+                    raise ValueError(f"accion imposible {accion}")
+                if tipo == REG_TIRADA:
+                    lanzamientos += 1
+                    j = juego.indice_jugador_actual
+                    if accion[1] == accion[2] and juego.contador_dobles[j] == 2:
+                        parcial.penalizaciones[j] += 1
+                    aplicar_accion(juego, accion)
+                elif tipo == REG_MOVER:
+                    parcial.contar_opciones(juego)
+                    _, i, dados = accion
+                    resultado, registro = juego.aplicar_movimiento((i, sum(dados), dados))
+                    parcial.resultados[resultado] += 1
+                else:
+                    parcial.contar_opciones(juego)
+                    juego.terminar_turno()
+        except (OSError, ValueError, struct.error) as e:
+            self._error(ruta, e)
+            return
+        finally:
+            lector.cerrar()
+        
+        parcial.partidas = 1
+        ganador = juego.ganador()
+        if ganador is None:
+            parcial.sin_ganador = 1
+        else:
+            parcial.victorias[ganador.indice] = 1
+        parcial.lanzamientos = lanzamientos
+        parcial.lanzamientos_cuadrado = lanzamientos * lanzamientos
+        parcial.duraciones[min(lanzamientos // CLASE_DURACION, CLASES_DURACION - 1)] = 1
+        self.fusionar(parcial)
+    
+    def _error(self, ruta, e):
+        self.archivos_con_error += 1
+        if len(self.errores) < MAX_ERRORES_GUARDADOS:
+            self.errores.append((ruta, str(e)))
+    
+    def percentil_duracion(self, p):
+        # Limite superior de la clase donde cae el percentil p (en lanzamientos)
+        objetivo = p / 100 * self.partidas
+        acumuladas = 0
+        for clase, n in enumerate(self.duraciones):
+            acumuladas += n
+            if n and acumuladas >= objetivo:
+                return (clase + 1) * CLASE_DURACION
+        return 0
+    
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in EstadisticasPartidas.__slots__}
+
+def rutas_repeticiones(rutas):
+    # Archivos .prq de cada ruta, en el orden en que los da el sistema: cada
+    # directorio se lee entrada a entrada con scandir, sin cargarlo en una
+    # lista (el analisis suma, no depende del orden)
+    for ruta in rutas:
+        if not os.path.isdir(ruta):
+            yield ruta
+            continue
+        pendientes = [ruta]
+        while pendientes:
+            with os.scandir(pendientes.pop()) as entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(entrada.path)
+                    elif entrada.name.endswith(".prq"):
+                        yield entrada.path
+
+def _analizar_bloque(rutas):
+    estadisticas = EstadisticasPartidas()
+    for ruta in rutas:
+        estadisticas.analizar(ruta)
+    return estadisticas
+
+def analizar_repeticiones(rutas, procesos=None, tamano_bloque=64, al_recibir=None):
+    # rutas: iterable de archivos .prq (se consume poco a poco). al_recibir
+    # (estadisticas acumuladas) se llama al sumar cada bloque.
+    total = EstadisticasPartidas()
+    rutas = iter(rutas)
+    bloques = iter(lambda: list(itertools.islice(rutas, tamano_bloque)), [])
+    if procesos == 1:
+        for bloque in bloques:
+            total.fusionar(_analizar_bloque(bloque))
+            if al_recibir is not None:
+                al_recibir(total)
+        return total
+    import multiprocessing
+    procesos = procesos or os.cpu_count() or 1
+    with multiprocessing.Pool(procesos) as pool:
+        pendientes = deque()
+        for bloque in bloques:
+            pendientes.append(pool.apply_async(_analizar_bloque, (bloque,)))
+            while len(pendientes) >= 2 * procesos or (pendientes and pendientes[0].ready()):
+                total.fusionar(pendientes.popleft().get())
+                if al_recibir is not None:
+                    al_recibir(total)
+        while pendientes:
+            total.fusionar(pendientes.popleft().get())
+            if al_recibir is not None:
+                al_recibir(total)
+    return total
+
+def informe_analisis(e):
+    if not e.partidas:
+        return f"Ninguna partida leida ({e.archivos_con_error} archivos con error)"
+    n = e.partidas
+    media = e.lanzamientos / n
+    desviacion = math.sqrt(max(e.lanzamientos_cuadrado / n - media * media, 0.0))
+    capturas = sum(e.resultados[r] for r in CAPTURAS)
+    movimientos = sum(e.resultados)
+    bloqueados = e.resultados[RES_CAMINO_BLOQUEADO] + e.resultados[RES_SALIDA_BLOQUEADA]
+    lineas = [
+        f"{n} partidas, {e.sin_ganador} sin terminar, {e.archivos_con_error} archivos con error",
+        f"Lanzamientos por partida: media {media:.1f} (desviacion {desviacion:.1f}), "
+        f"p10 <= {e.percentil_duracion(10)}, p50 <= {e.percentil_duracion(50)}, p90 <= {e.percentil_duracion(90)}",
+        f"Capturas: {capturas / n:.2f} por partida; bonus de {BONUS_CAPTURA} casillas aplicado en "
+        f"{100 * e.resultados[RES_CAPTURA] / max(1, capturas):.1f}%, camino bloqueado "
+        f"{100 * e.resultados[RES_BONUS_BLOQUEADO] / max(1, capturas):.1f}%, destino lleno "
+        f"{100 * e.resultados[RES_BONUS_OCUPADO] / max(1, capturas):.1f}%",
+        f"Bloqueos: frenan {100 * e.opciones_bloqueadas / max(1, e.opciones):.2f}% de las opciones de "
+        f"movimiento; salida con dos fichas {100 * e.salidas_ocupadas / max(1, e.opciones):.2f}%; "
+        f"{bloqueados} de {movimientos} movimientos jugados rechazados por bloqueo",
+        f"Tres dobles: {sum(e.penalizaciones) / n:.3f} penalizaciones por partida",
+        "Victorias por asiento:",
+    ]
+    for j, (nombre, color, salida, entrada) in enumerate(DATOS_JUGADORES):
+        p, bajo, alto = intervalo_wilson(e.victorias[j], n)
+        lineas.append(f"  {nombre:<9}(salida {salida:2d}, entrada {entrada:2d}) {100 * p:5.1f}% "
+                      f"[{100 * bajo:.1f}, {100 * alto:.1f}], tres dobles {e.penalizaciones[j]}")
+    for ruta, motivo in e.errores:
+        lineas.append(f"Error en {ruta}: {motivo}")
+    return "\n".join(lineas)
+
+# ---------------------
+# AUTOGUARDADO: DIARIO INCREMENTAL
+# ---------------------
+# Dos archivos: "ruta" con una foto del estado (exportar_estado) y
+# "ruta.diario" con las acciones posteriores en el mismo formato que las
+# repeticiones. Cada accion se anade al diario y se vacia al sistema
+# operativo (sobrevive a que el proceso muera); fsync se hace por lotes,
+# cada SINCRONIZAR_CADA acciones o ESPERA_SINCRONIZACION segundos. Cada
+# COMPACTAR_CADA acciones la foto se reescribe (archivo temporal +
+# os.replace) y el diario vuelve a empezar. Foto y diario llevan un numero
+# de generacion: un diario de otra generacion ya esta dentro de la foto y
+# se ignora, asi que un corte en mitad de la compactacion no repite acciones.
+CABECERA_GUARDADO = struct.Struct(">4sI")
+MAGIA_FOTO = b"PRQG"
+MAGIA_DIARIO = b"PRQD"
+SINCRONIZAR_CADA = 16
+ESPERA_SINCRONIZACION = 1.0
+COMPACTAR_CADA = 256
+
+def ruta_autoguardado():
+    # En el directorio de datos del usuario, no en el directorio de trabajo
+    if sys.platform == "win32" and os.environ.get("APPDATA"):
+        base = os.environ["APPDATA"]
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "parques", "partida.guardado")
+
+def escribir_atomico(ruta, datos):
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    try:
+        # Que el cambio de nombre tambien llegue al disco
+        directorio = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directorio)
+    except OSError:
+        pass
+    finally:
+        os.close(directorio)
+
+def accion_valida(juego, accion):
+    # Comprobacion antes de repetir una accion del diario: un diario corrupto
+    # no debe dejar el motor en un estado imposible. Un movimiento solo tiene
+    # que ser de una ficha del jugador en turno y gastar dados que tiene (en
+    # cualquier orden): la ventana deja intentar movimientos que el motor
+    # rechaza, y tambien se registran.
+    tipo = accion[0]
+    if tipo == REG_TIRADA:
+        return (not juego.valores_dados and 1 <= accion[1] <= 6 and 1 <= accion[2] <= 6
+                and (accion[3] == NINGUNA or accion[3] < NUM_FICHAS))
+    if tipo == REG_MOVER:
+        if accion[1] // FICHAS_POR_JUGADOR != juego.indice_jugador_actual:
+            return False
+        restantes = list(juego.valores_dados)
+        for valor in accion[2]:
+            if valor not in restantes:
+                return False
+            restantes.remove(valor)
+        return True
+    return True
+
+class DiarioPartida:
+    # Se asigna a juego.registro como EscritorRepeticion
+    def __init__(self, ruta, sincronizar_cada=SINCRONIZAR_CADA, espera=ESPERA_SINCRONIZACION,
+                 compactar_cada=COMPACTAR_CADA):
+        self.ruta = ruta
+        self.ruta_diario = ruta + ".diario"
+        self.sincronizar_cada = sincronizar_cada
+        self.espera = espera
+        self.compactar_cada = compactar_cada
+        self.generacion = 0
+        self.diario = None
+        self.acciones = 0        # acciones en el diario actual
+        self.sin_sincronizar = 0
+        self.ultima_sincronizacion = time.monotonic()
+        self.restauradas = None  # acciones repetidas al restaurar (None: sin guardado)
+        self.aviso = None        # por que se dejo de leer el diario antes del final
+    
+    @classmethod
+    def abrir(cls, ruta, juego, **opciones):
+        # Restaura en juego la partida guardada en ruta (si la hay), compacta
+        # y empieza a registrar sus acciones
+        diario = cls(ruta, **opciones)
+        diario.restaurar(juego)
+        diario.compactar(juego)
+        agregar_registro(juego, diario)
+        return diario
+    
+    def restaurar(self, juego):
+        try:
+            with open(self.ruta, "rb") as f:
+                datos = f.read()
+        except FileNotFoundError:
+            return False
+        tamano = CABECERA_GUARDADO.size + FORMATO_ESTADO.size
+        magia, generacion = CABECERA_GUARDADO.unpack_from(datos) if len(datos) == tamano else (None, 0)
+        if magia != MAGIA_FOTO:
+            return False
+        juego.importar_estado(datos[CABECERA_GUARDADO.size:])
+        self.generacion = generacion
+        self.restauradas = 0
+        try:
+            f = open(self.ruta_diario, "rb")
+        except FileNotFoundError:
+            return True
+        with f:
+            cabecera = f.read(CABECERA_GUARDADO.size)
+            if len(cabecera) < CABECERA_GUARDADO.size or CABECERA_GUARDADO.unpack(cabecera) != (MAGIA_DIARIO, generacion):
+                return True
+            # Si algo no cuadra se queda lo anterior, pero se avisa de donde
+            try:
+                for posicion, tipo, datos in leer_registros(f, CABECERA_GUARDADO.size):
+                    accion = decodificar_accion(tipo, datos)
+                    if accion is None or not accion_valida(juego, accion):
+                        self.aviso = (f"{self.ruta_diario}: la accion {self.restauradas} ({accion}, byte "
+                                      f"{posicion}) no es valida; se descarta desde ahi")
+                        break
+                    aplicar_accion(juego, accion)
+                    self.restauradas += 1
+            except ValueError as e:
+                self.aviso = f"{self.ruta_diario}: {e} tras {self.restauradas} acciones; se descarta desde ahi"
+        return True
+    
+    def compactar(self, juego):
+        # Nueva foto con el estado actual y diario vacio de la generacion nueva
+        self._cerrar_diario()
+        self.generacion = (self.generacion + 1) & 0xFFFFFFFF
+        escribir_atomico(self.ruta, CABECERA_GUARDADO.pack(MAGIA_FOTO, self.generacion) + juego.exportar_estado())
+        self.diario = open(self.ruta_diario, "wb")
+        self.diario.write(CABECERA_GUARDADO.pack(MAGIA_DIARIO, self.generacion))
+        self.diario.flush()
+        self.acciones = 0
+        self.sin_sincronizar = 0
+    
+    def _accion(self, juego, datos):
+        # El motor avisa antes de aplicar la accion, asi que la foto de una
+        # compactacion aqui es el estado previo a "datos"
+        if self.acciones >= self.compactar_cada:
+            self.compactar(juego)
+        self.diario.write(datos)
+        self.diario.flush()
+        self.acciones += 1
+        self.sin_sincronizar += 1
+        ahora = time.monotonic()
+        if self.sin_sincronizar >= self.sincronizar_cada or ahora - self.ultima_sincronizacion >= self.espera:
+            self.sincronizar(ahora)
+    
+    def sincronizar(self, ahora=None):
+        if self.diario is not None and self.sin_sincronizar:
+            os.fsync(self.diario.fileno())
+            self.sin_sincronizar = 0
+        self.ultima_sincronizacion = time.monotonic() if ahora is None else ahora
+    
+    def tirada(self, juego, d1, d2, ficha_seleccionada=None):
+        self._accion(juego, registro_tirada(d1, d2, ficha_seleccionada))
+    
+    def movimiento(self, juego, i, dados):
+        self._accion(juego, registro_movimiento(i, dados))
+    
+    def pasar(self, juego):
+        self._accion(juego, REGISTRO_PASAR)
+    
+    def _cerrar_diario(self):
+        if self.diario is not None:
+            self.sincronizar()
+            self.diario.close()
+            self.diario = None
+    
+    def cerrar(self, juego=None):
+        # Con juego, deja todo en la foto (el proximo arranque no repite nada)
+        if juego is not None and self.diario is not None:
+            self.compactar(juego)
+        self._cerrar_diario()
+    
+    def borrar(self):
+        # Partida terminada: el proximo arranque empieza de cero
+        self._cerrar_diario()
+        for ruta in (self.ruta, self.ruta_diario):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+# ---------------------
+# DATOS DE ENTRENAMIENTO: POSICIONES EN FRAGMENTOS .NPY
+# ---------------------
+# Cada posicion en la que alguien decide (antes de mover o de pasar) es una
+# fila de ANCHO_DATASET bytes: el codigo de cada ficha, las fichas de cada
+# jugador en cada casilla del anillo (ocupacion_jugador), el jugador en
+# turno, los dados que le quedan (0 si falta alguno), sus dobles seguidos
+# y, al final, el ganador de la partida (NINGUNA si no lo hubo).
+#
+# EscritorDataset es un registro mas del motor: guarda en memoria solo las
+# filas de la partida en curso y, al terminarla, las copia con el ganador a
+# un fragmento .npy abierto con np.memmap. Cada fragmento tiene sitio para
+# filas_por_fragmento filas; al cerrarlo se corrige la cabecera con las
+# filas reales y se recorta el archivo, asi que np.load lo lee tal cual.
+# indice.json lista los fragmentos cerrados y se reescribe de forma
+# atomica, de modo que una exportacion cortada pierde como mucho el
+# fragmento abierto y otra exportacion sobre el mismo directorio sigue
+# donde quedo.
+COLUMNAS_DATASET = {
+    "posiciones": (0, NUM_FICHAS),
+    "ocupacion": (NUM_FICHAS, NUM_FICHAS + NUM_CASILLAS_EXTERNAS * NUM_JUGADORES),
+}
+COL_TURNO = COLUMNAS_DATASET["ocupacion"][1]
+COL_DADOS = COL_TURNO + 1
+COL_DOBLES = COL_DADOS + 2
+COL_GANADOR = COL_DOBLES + 1
+ANCHO_DATASET = COL_GANADOR + 1
+COLUMNAS_DATASET.update(turno=(COL_TURNO, COL_DADOS), dados=(COL_DADOS, COL_DOBLES),
+                        dobles=(COL_DOBLES, COL_GANADOR), ganador=(COL_GANADOR, ANCHO_DATASET))
+VERSION_DATASET = 1
+FILAS_POR_FRAGMENTO = 1 << 20
+INDICE_DATASET = "indice.json"
+LONGITUD_CABECERA_NPY = 128  # cabecera .npy 1.0 de tamano fijo, para poder corregirla
+
+def fila_dataset(juego, ganador=NINGUNA):
+    j = juego.indice_jugador_actual
+    dados = juego.valores_dados
+    return (bytes(juego.posiciones) + bytes(juego.ocupacion_jugador)
+            + bytes((j, dados[0] if dados else 0, dados[1] if len(dados) > 1 else 0,
+                     juego.contador_dobles[j], ganador)))
+
+def cabecera_npy(filas, ancho=ANCHO_DATASET):
+    texto = "{'descr': '|u1', 'fortran_order': False, 'shape': (%d, %d), }" % (filas, ancho)
+    relleno = LONGITUD_CABECERA_NPY - 10 - len(texto) - 1
+    return (b"\x93NUMPY\x01\x00" + struct.pack("<H", LONGITUD_CABECERA_NPY - 10)
+            + texto.encode("latin1") + b" " * relleno + b"\n")
+
+class EscritorDataset:
+    def __init__(self, directorio, filas_por_fragmento=FILAS_POR_FRAGMENTO):
+        _numpy()
+        self.directorio = directorio
+        self.filas_por_fragmento = filas_por_fragmento
+        os.makedirs(directorio, exist_ok=True)
+        ruta_indice = os.path.join(directorio, INDICE_DATASET)
+        if os.path.exists(ruta_indice):
+            with open(ruta_indice) as f:
+                self.indice = json.load(f)
+            if self.indice["ancho"] != ANCHO_DATASET:
+                raise ValueError(f"{ruta_indice}: filas de {self.indice['ancho']} bytes, se esperaban {ANCHO_DATASET}")
+        else:
+            self.indice = {"version": VERSION_DATASET, "ancho": ANCHO_DATASET, "columnas": COLUMNAS_DATASET,
+                           "filas": 0, "partidas": 0, "fragmentos": []}
+        self.partida = bytearray()
+        self.mapa = None
+        self.ruta = None
+        self.filas = 0
+    
+    # Avisos del motor (ver VariosRegistros)
+    def tirada(self, juego, d1, d2, ficha_seleccionada=None):
+        pass
+    
+    def movimiento(self, juego, i, dados):
+        self.partida += fila_dataset(juego)
+    
+    def pasar(self, juego):
+        if juego.valores_dados:
+            self.partida += fila_dataset(juego)
+    
+    def terminar_partida(self, ganador):
+        filas = np.frombuffer(self.partida, dtype=np.uint8).reshape(-1, ANCHO_DATASET)
+        filas[:, COL_GANADOR] = NINGUNA if ganador is None else ganador
+        hechas = 0
+        while hechas < len(filas):
+            if self.mapa is None:
+                self._abrir_fragmento()
+            n = min(len(filas) - hechas, self.filas_por_fragmento - self.filas)
+            self.mapa[self.filas:self.filas + n] = filas[hechas:hechas + n]
+            self.filas += n
+            hechas += n
+            if self.filas == self.filas_por_fragmento:
+                self._cerrar_fragmento()
+        del filas
+        self.partida = bytearray()
+        self.indice["partidas"] += 1
+    
+    def _abrir_fragmento(self):
+        nombre = f"posiciones_{len(self.indice['fragmentos']):06d}.npy"
+        self.ruta = os.path.join(self.directorio, nombre)
+        with open(self.ruta, "wb") as f:
+            f.write(cabecera_npy(self.filas_por_fragmento))
+            f.truncate(LONGITUD_CABECERA_NPY + self.filas_por_fragmento * ANCHO_DATASET)
+        self.mapa = np.memmap(self.ruta, dtype=np.uint8, mode="r+", offset=LONGITUD_CABECERA_NPY,
+                              shape=(self.filas_por_fragmento, ANCHO_DATASET))
+        self.filas = 0
+    
+    def _cerrar_fragmento(self):
+        self.mapa.flush()
+        self.mapa = None
+        with open(self.ruta, "r+b") as f:
+            f.write(cabecera_npy(self.filas))
+            f.truncate(LONGITUD_CABECERA_NPY + self.filas * ANCHO_DATASET)
+            f.flush()
+            os.fsync(f.fileno())
+        self.indice["fragmentos"].append({"archivo": os.path.basename(self.ruta), "filas": self.filas})
+        self.indice["filas"] += self.filas
+        escribir_atomico(os.path.join(self.directorio, INDICE_DATASET),
+                         json.dumps(self.indice, indent=1).encode())
+    
+    def cerrar(self):
+        # La partida a medias (si la hay) no tiene resultado y se descarta
+        self.partida = bytearray()
+        if self.mapa is not None:
+            self._cerrar_fragmento()
+
+class LectorDataset:
+    # Lee los fragmentos con np.load(mmap_mode="r"): nada se carga entero en
+    # memoria. lotes() devuelve (estados, ganadores) de hasta "tamano" filas.
+    # Con mezclar, el orden de los fragmentos y el de las filas dentro de
+    # cada uno es aleatorio; cada lote se copia directamente del mapa a un
+    # unico buffer reutilizado (valido hasta pedir el siguiente). Sin
+    # mezclar, los lotes son vistas del mapa, sin ninguna copia.
+    def __init__(self, directorio):
+        _numpy()
+        self.directorio = directorio
+        with open(os.path.join(directorio, INDICE_DATASET)) as f:
+            self.indice = json.load(f)
+        if self.indice["ancho"] != ANCHO_DATASET:
+            raise ValueError(f"{directorio}: filas de {self.indice['ancho']} bytes, se esperaban {ANCHO_DATASET}")
+        self.mapas = [None] * len(self.indice["fragmentos"])
+    
+    def __len__(self):
+        return self.indice["filas"]
+    
+    def fragmento(self, k):
+        if self.mapas[k] is None:
+            entrada = self.indice["fragmentos"][k]
+            mapa = np.load(os.path.join(self.directorio, entrada["archivo"]), mmap_mode="r")
+            if mapa.shape != (entrada["filas"], ANCHO_DATASET):
+                raise ValueError(f"{entrada['archivo']}: forma {mapa.shape}, el indice dice "
+                                 f"{(entrada['filas'], ANCHO_DATASET)}")
+            self.mapas[k] = mapa
+        return self.mapas[k]
+    
+    def lotes(self, tamano, semilla=None, epocas=1, mezclar=True):
+        rng = np.random.default_rng(semilla)
+        buffer = np.empty((tamano, ANCHO_DATASET), dtype=np.uint8)
+        for epoca in range(epocas):
+            orden = rng.permutation(len(self.mapas)) if mezclar else range(len(self.mapas))
+            for k in orden:
+                datos = self.fragmento(k)
+                if not mezclar:
+                    for inicio in range(0, len(datos), tamano):
+                        lote = datos[inicio:inicio + tamano]
+                        yield lote[:, :COL_GANADOR], lote[:, COL_GANADOR]
+                    continue
+                filas = rng.permutation(len(datos))
+                for inicio in range(0, len(filas), tamano):
+                    # Ordenadas, las lecturas del mapa van hacia delante
+                    elegidas = np.sort(filas[inicio:inicio + tamano])
+                    lote = buffer[:len(elegidas)]
+                    np.take(datos, elegidas, axis=0, out=lote)
+                    yield lote[:, :COL_GANADOR], lote[:, COL_GANADOR]
+
+def exportar_dataset(directorio, politicas, partidas, semilla=0, desde=0, presupuesto=0.05,
+                     max_turnos=MAX_TURNOS, filas_por_fragmento=FILAS_POR_FRAGMENTO):
+    # Autojuego: la partida k usa semilla_partida(semilla, 0, k), como "simular"
+    escritor = EscritorDataset(directorio, filas_por_fragmento)
+    try:
+        for k in range(desde, desde + partidas):
+            semilla_k = semilla_partida(semilla, 0, k)
+            bots = crear_politicas(politicas, semilla_k, presupuesto)
+            resultado = simular_partida(bots, max_turnos=max_turnos, rng=GeneradorDados(semilla_k),
+                                        registro=escritor)
+            escritor.terminar_partida(resultado.ganador)
+    finally:
+        escritor.cerrar()
+    return escritor.indice
+
+# ---------------------
+# SERVIDOR DE PARTIDAS EN RED (ASYNCIO)
+# ---------------------
+# Un proceso atiende muchas salas. Cada sala es una ParquesGame con dados
+# del servidor; los clientes solo piden acciones (lanzar, mover, pasar) y el
+# servidor las valida contra movimientos_legales() antes de aplicarlas. No
+# hay una tarea por sala: el turno se vigila con un call_later que se
+# reprograma en cada accion, asi que una sala en espera no cuesta nada.
+#
+# Cada mensaje va en una trama: 4 bytes de longitud (big endian) y la carga,
+# cuyo primer byte es el tipo de mensaje. MSG_JSON lleva un objeto JSON;
+# MSG_INSTANTANEA y MSG_DELTA son el protocolo binario del estado (abajo).
+MSG_JSON = 0
+MSG_INSTANTANEA = 1
+MSG_DELTA = 2
+MAX_TRAMA = 1 << 16
+TIEMPO_TURNO = 30.0        # segundos para actuar antes de que el servidor juegue
+TIEMPO_RECONEXION = 120.0  # segundos que se guarda una sala sin conexiones
+LIMITE_BUFFER_SALIDA = 1 << 18  # un cliente mas lento que esto se desconecta
+
+def trama(tipo, carga):
+    return struct.pack(">IB", len(carga) + 1, tipo) + carga
+
+def trama_json(mensaje):
+    return trama(MSG_JSON, json.dumps(mensaje, separators=(",", ":")).encode())
+
+async def leer_trama(reader):
+    # (tipo, carga); IncompleteReadError si la conexion se cierra
+    longitud, = struct.unpack(">I", await reader.readexactly(4))
+    if not 1 <= longitud <= MAX_TRAMA:
+        raise ValueError(f"trama de {longitud} bytes")
+    datos = await reader.readexactly(longitud)
+    return datos[0], datos[1:]
+
+# ---------------------
+# PROTOCOLO BINARIO: INSTANTANEAS Y DELTAS
+# ---------------------
+# Instantanea (45 bytes): secuencia, turno, ultimo doble, contadores de
+# dobles, dados y las posiciones y puestos de llegada de las 16 fichas.
+# Delta: secuencia y una lista de eventos de pocos bytes cada uno. El
+# cliente aplica los eventos en orden sobre su ParquesGame; si la
+# secuencia no es la siguiente a la ultima que vio, pide una resincronizacion.
+FORMATO_INSTANTANEA = struct.Struct(">IBB4sB2s16s16s")
+FORMATO_SECUENCIA = struct.Struct(">I")
+
+EV_DADOS = 1     # n, valores
+EV_MUEVE = 2     # ficha, codigo nuevo
+EV_CAPTURA = 3   # ficha capturada (vuelve a la carcel)
+EV_CARCEL = 4    # ficha que vuelve a la carcel por tres dobles
+EV_TURNO = 5     # jugador en turno
+EV_DOBLES = 6    # jugador, contador de dobles, ultimo lanzamiento fue doble
+HISTORIAL_DELTAS = 64  # deltas que guarda cada sala para resincronizar
+
+def codificar_instantanea(juego, secuencia):
+    dados = bytes(juego.valores_dados)
+    return FORMATO_INSTANTANEA.pack(secuencia, juego.indice_jugador_actual, juego.ultimo_doble,
+                                    bytes(juego.contador_dobles), len(dados), dados,
+                                    bytes(juego.posiciones), bytes(juego.orden))
+
+def aplicar_instantanea(juego, carga):
+    secuencia, turno, ultimo_doble, dobles, n, dados, posiciones, orden = FORMATO_INSTANTANEA.unpack(carga)
+    juego.indice_jugador_actual = turno
+    juego.ultimo_doble = bool(ultimo_doble)
+    juego.contador_dobles[:] = dobles
+    juego.valores_dados = list(dados[:n])
+    juego.cargar_posiciones(posiciones, orden)
+    return secuencia
+
+def foto_estado(juego):
+    # Lo necesario para calcular el delta de la siguiente accion
+    return (bytes(juego.posiciones), juego.indice_jugador_actual, tuple(juego.valores_dados),
+            bytes(juego.contador_dobles), juego.ultimo_doble)
+
+def codificar_delta(secuencia, antes, juego):
+    posiciones, turno, dados, dobles, ultimo_doble = antes
+    carga = bytearray(FORMATO_SECUENCIA.pack(secuencia))
+    # Primero las fichas que vuelven a la carcel y despues las que avanzan:
+    # es el orden en que el motor las quita y las pone, asi el cliente
+    # obtiene los mismos puestos de llegada
+    cambiadas = [i for i in range(NUM_FICHAS) if juego.posiciones[i] != posiciones[i]]
+    a_carcel = [i for i in cambiadas if juego.posiciones[i] == CARCEL]
+    avanzan = [i for i in cambiadas if juego.posiciones[i] != CARCEL]
+    for i in a_carcel:
+        carga += bytes((EV_CAPTURA if avanzan else EV_CARCEL, i))
+    for i in avanzan:
+        carga += bytes((EV_MUEVE, i, juego.posiciones[i]))
+    for j in range(NUM_JUGADORES):
+        if (juego.contador_dobles[j] != dobles[j]
+                or (j == juego.indice_jugador_actual and juego.ultimo_doble != ultimo_doble)):
+            carga += bytes((EV_DOBLES, j, juego.contador_dobles[j], juego.ultimo_doble))
+    if tuple(juego.valores_dados) != dados:
+        carga += bytes((EV_DADOS, len(juego.valores_dados))) + bytes(juego.valores_dados)
+    if juego.indice_jugador_actual != turno:
+        carga += bytes((EV_TURNO, juego.indice_jugador_actual))
+    return bytes(carga)
+
+def aplicar_delta(juego, carga):
+    # Devuelve (secuencia, [(evento, argumentos...)])
+    secuencia, = FORMATO_SECUENCIA.unpack_from(carga)
+    eventos = []
+    k = FORMATO_SECUENCIA.size
+    while k < len(carga):
+        evento = carga[k]
+        if evento == EV_MUEVE:
+            i, codigo = carga[k + 1], carga[k + 2]
+            juego.colocar_ficha(i, codigo)
+            eventos.append((evento, i, codigo))
+            k += 3
+        elif evento == EV_CAPTURA or evento == EV_CARCEL:
+            i = carga[k + 1]
+            juego.colocar_ficha(i, CARCEL)
+            eventos.append((evento, i))
+            k += 2
+        elif evento == EV_DOBLES:
+            j, contador, doble = carga[k + 1], carga[k + 2], carga[k + 3]
+            juego._fijar_dobles(j, contador)
+            juego._fijar_ultimo_doble(bool(doble))
+            eventos.append((evento, j, contador, doble))
+            k += 4
+        elif evento == EV_DADOS:
+            n = carga[k + 1]
+            dados = list(carga[k + 2:k + 2 + n])
+            juego._fijar_dados(dados)
+            eventos.append((evento, dados))
+            k += 2 + n
+        elif evento == EV_TURNO:
+            juego.fijar_turno(carga[k + 1])
+            eventos.append((evento, carga[k + 1]))
+            k += 2
+        else:
+            raise ValueError(f"evento desconocido: {evento}")
+    return secuencia, eventos
+
+class ErrorAccion(Exception):
+    pass
+
+def mensaje_cliente(tipo, carga):
+    # Un mensaje de cliente es un objeto JSON; cualquier otra cosa se le
+    # contesta con un error en vez de tumbar la conexion
+    if tipo != MSG_JSON:
+        raise ErrorAccion("tipo de mensaje desconocido")
+    try:
+        mensaje = json.loads(carga)
+    except ValueError:
+        raise ErrorAccion("mensaje mal formado")
+    if not isinstance(mensaje, dict):
+        raise ErrorAccion("mensaje mal formado")
+    return mensaje
+
+class Sala:
+    def __init__(self, servidor, nombre, semilla=None, ruta_repeticion=None):
+        self.servidor = servidor
+        self.nombre = nombre
+        # Sin semilla, dados del sistema operativo: no se pueden predecir
+        # observando tiradas anteriores
+        self.juego = ParquesGame(semilla, rng=None if semilla is not None else random.SystemRandom())
+        # Grabacion de la partida para auditarla despues
+        self.repeticion = None
+        if ruta_repeticion is not None:
+            self.repeticion = EscritorRepeticion.abrir(ruta_repeticion, self.juego, semilla or 0)
+        self.tokens = [None] * NUM_JUGADORES      # para reconectarse al asiento
+        self.conexiones = [None] * NUM_JUGADORES  # writer de cada asiento
+        self.espectadores = set()
+        self.binarios = set()  # conexiones que piden el protocolo binario
+        self.temporizador = None
+        self.cierre = None
+        self.ultimo_evento = None
+        self.secuencia = 0
+        self.deltas = deque(maxlen=HISTORIAL_DELTAS)  # tramas ya codificadas
+        self.antes = foto_estado(self.juego)
+    
+    # ---------------------
+    # ASIENTOS Y CONEXIONES
+    # ---------------------
+    def sentar(self, writer, asiento=None, token=None, binario=False):
+        # Devuelve el asiento ocupado (None: espectador)
+        if token is not None:
+            if token not in self.tokens:
+                raise ErrorAccion("token desconocido")
+            asiento = self.tokens.index(token)
+        elif asiento is not None:
+            if not isinstance(asiento, int) or not 0 <= asiento < NUM_JUGADORES:
+                raise ErrorAccion("asiento no valido")
+            if self.tokens[asiento] is not None:
+                raise ErrorAccion("asiento ocupado")
+            import secrets
+            self.tokens[asiento] = secrets.token_hex(16)
+        if binario:
+            self.binarios.add(writer)
+        if asiento is None:
+            self.espectadores.add(writer)
+        else:
+            anterior = self.conexiones[asiento]
+            if anterior is not None and anterior is not writer:
+                anterior.close()
+            self.conexiones[asiento] = writer
+        if self.cierre is not None:
+            self.cierre.cancel()
+            self.cierre = None
+        if self.temporizador is None and self.juego.ganador() is None:
+            self.programar_turno()
+        return asiento
+    
+    def salir(self, writer):
+        self.espectadores.discard(writer)
+        self.binarios.discard(writer)
+        for k in range(NUM_JUGADORES):
+            if self.conexiones[k] is writer:
+                self.conexiones[k] = None
+        if not self.espectadores and not any(self.conexiones):
+            self.cierre = asyncio.get_running_loop().call_later(
+                self.servidor.tiempo_reconexion, self.servidor.cerrar_sala, self.nombre)
+    
+    def cerrar(self):
+        for handle in (self.temporizador, self.cierre):
+            if handle is not None:
+                handle.cancel()
+        if self.repeticion is not None:
+            self.repeticion.cerrar()
+            self.repeticion = None
+        self.temporizador = self.cierre = None
+    
+    # ---------------------
+    # ACCIONES
+    # ---------------------
+    def accion(self, asiento, mensaje):
+        juego = self.juego
+        if juego.ganador() is not None:
+            raise ErrorAccion("la partida termino")
+        if asiento is None or asiento != juego.indice_jugador_actual:
+            raise ErrorAccion("no es tu turno")
+        tipo = mensaje.get("tipo")
+        if tipo == "lanzar":
+            if juego.valores_dados:
+                raise ErrorAccion("ya lanzaste los dados")
+            texto = juego.lanzar_dados()
+        elif tipo == "mover":
+            try:
+                i = int(mensaje["ficha"])
+                dados = tuple(int(d) for d in mensaje["dados"])
+            except (KeyError, TypeError, ValueError):
+                raise ErrorAccion("movimiento mal formado")
+            movimiento = juego.movimiento_legal_con(i, dados)
+            if movimiento is None:
+                raise ErrorAccion("movimiento no permitido")
+            resultado, registro = juego.aplicar_movimiento(movimiento)
+            texto = juego.describir_movimiento(juego.ficha(i), resultado, registro)
+        elif tipo == "pasar":
+            juego.terminar_turno()
+            texto = "pasa el turno"
+        else:
+            raise ErrorAccion(f"accion desconocida: {tipo}")
+        self.despues_de_accion(asiento, tipo, texto)
+    
+    def despues_de_accion(self, asiento, tipo, texto):
+        juego = self.juego
+        # Como en la interfaz: si con los dados que quedan no hay jugada, pasa
+        if juego.valores_dados and not juego.hay_movimientos():
+            juego.terminar_turno()
+            texto += " Sin movimientos posibles: pasa el turno."
+        self.ultimo_evento = {"asiento": asiento, "accion": tipo, "texto": texto}
+        if juego.ganador() is None:
+            self.programar_turno()
+        elif self.temporizador is not None:
+            self.temporizador.cancel()
+            self.temporizador = None
+        
+        self.secuencia += 1
+        delta = trama(MSG_DELTA, codificar_delta(self.secuencia, self.antes, juego))
+        self.antes = foto_estado(juego)
+        self.deltas.append(delta)
+        self.difundir(delta)
+    
+    def programar_turno(self):
+        if self.temporizador is not None:
+            self.temporizador.cancel()
+        self.temporizador = asyncio.get_running_loop().call_later(
+            self.servidor.tiempo_turno, self.turno_vencido)
+    
+    def turno_vencido(self):
+        # El jugador no actuo a tiempo (o no esta conectado): pierde lo que
+        # le quedaba del lanzamiento, como si pulsara "Terminar turno"
+        self.temporizador = None
+        asiento = self.juego.indice_jugador_actual
+        self.juego.terminar_turno()
+        self.despues_de_accion(asiento, "tiempo", "Se acabo el tiempo del turno.")
+    
+    # ---------------------
+    # MENSAJES A LOS CLIENTES
+    # ---------------------
+    def mensaje_estado(self):
+        juego = self.juego
+        ganador = juego.ganador()
+        return {
+            "tipo": "estado",
+            "sala": self.nombre,
+            "secuencia": self.secuencia,
+            "posiciones": list(juego.posiciones),
+            "orden": list(juego.orden),
+            "turno": juego.indice_jugador_actual,
+            "dados": list(juego.valores_dados),
+            "dobles": list(juego.contador_dobles),
+            "ganador": ganador.indice if ganador is not None else None,
+            "evento": self.ultimo_evento,
+        }
+    
+    def instantanea(self):
+        return trama(MSG_INSTANTANEA, codificar_instantanea(self.juego, self.secuencia))
+    
+    def estado_para(self, writer):
+        return self.instantanea() if writer in self.binarios else trama_json(self.mensaje_estado())
+    
+    def resincronizar(self, writer, desde):
+        # Deltas posteriores a "desde" si siguen en el historial; si no, una
+        # instantanea
+        perdidas = self.secuencia - desde
+        if 0 <= perdidas <= len(self.deltas):
+            for k in range(len(self.deltas) - perdidas, len(self.deltas)):
+                self.servidor.enviar(writer, self.deltas[k])
+        else:
+            self.servidor.enviar(writer, self.instantanea())
+    
+    def difundir(self, delta):
+        # Cada formato se codifica una sola vez y se envian los mismos bytes
+        # a todos los que lo usan (jugadores y espectadores)
+        datos_json = None
+        for writer in [w for w in self.conexiones if w is not None] + list(self.espectadores):
+            if writer in self.binarios:
+                self.servidor.enviar(writer, delta)
+            else:
+                if datos_json is None:
+                    datos_json = trama_json(self.mensaje_estado())
+                self.servidor.enviar(writer, datos_json)
+
+class ServidorParques:
+    def __init__(self, tiempo_turno=TIEMPO_TURNO, tiempo_reconexion=TIEMPO_RECONEXION, semilla=None,
+                 directorio_repeticiones=None):
+        cargar_asyncio()
+        self.salas = {}
+        self.directorio_repeticiones = directorio_repeticiones
+        self.tiempo_turno = tiempo_turno
+        self.tiempo_reconexion = tiempo_reconexion
+        # Con semilla, cada sala saca sus dados de (semilla, numero de sala):
+        # partidas reproducibles para pruebas
+        self.semilla = semilla
+        self.creadas = 0
+        self.servidor = None
+        self.clientes = {}  # writer -> tarea que lo atiende
+    
+    async def iniciar(self, host="127.0.0.1", puerto=0):
+        self.servidor = await asyncio.start_server(self.atender, host, puerto)
+        return self.servidor.sockets[0].getsockname()[1]
+    
+    async def detener(self):
+        if self.servidor is not None:
+            self.servidor.close()
+        # Cerrar las conexiones abiertas deja salir a cada atender() por su camino normal
+        for writer in list(self.clientes):
+            writer.close()
+        await asyncio.gather(*self.clientes.values(), return_exceptions=True)
+        for sala in self.salas.values():
+            sala.cerrar()
+        self.salas.clear()
+        if self.servidor is not None:
+            await self.servidor.wait_closed()
+    
+    def sala(self, nombre):
+        sala = self.salas.get(nombre)
+        if sala is None:
+            semilla = None if self.semilla is None else base_flujo(self.semilla, self.creadas)
+            ruta = None
+            if self.directorio_repeticiones is not None:
+                limpio = "".join(c if c.isalnum() or c in "-_" else "_" for c in nombre[:40])
+                ruta = os.path.join(self.directorio_repeticiones, f"{self.creadas:06d}-{limpio}.prq")
+            self.creadas += 1
+            sala = self.salas[nombre] = Sala(self, nombre, semilla, ruta)
+        return sala
+    
+    def cerrar_sala(self, nombre):
+        sala = self.salas.pop(nombre, None)
+        if sala is not None:
+            sala.cerrar()
+    
+    def enviar(self, writer, datos):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > LIMITE_BUFFER_SALIDA:
+            writer.close()
+            return
+        writer.write(datos)
+    
+    async def atender(self, reader, writer):
+        # Primer mensaje: {"tipo": "unirse", "sala": ..., "asiento": k | None,
+        # "token": ..., "formato": "json" | "binario"}; despues, acciones de
+        # juego (o "resincronizar") hasta que se cierre
+        sala = None
+        self.clientes[writer] = asyncio.current_task()
+        try:
+            mensaje = mensaje_cliente(*await leer_trama(reader))
+            if mensaje.get("tipo") != "unirse":
+                raise ErrorAccion("se esperaba unirse")
+            sala = self.sala(str(mensaje.get("sala", "")))
+            asiento = sala.sentar(writer, mensaje.get("asiento"), mensaje.get("token"),
+                                  mensaje.get("formato") == "binario")
+            self.enviar(writer, trama_json({
+                "tipo": "bienvenida", "asiento": asiento,
+                "token": sala.tokens[asiento] if asiento is not None else None}))
+            self.enviar(writer, sala.estado_para(writer))
+            
+            while True:
+                tipo, carga = await leer_trama(reader)
+                try:
+                    mensaje = mensaje_cliente(tipo, carga)
+                    if mensaje.get("tipo") == "resincronizar":
+                        sala.resincronizar(writer, int(mensaje.get("desde", -1)))
+                    else:
+                        sala.accion(asiento, mensaje)
+                except (ErrorAccion, ValueError, TypeError) as error:
+                    self.enviar(writer, trama_json({"tipo": "error", "motivo": str(error)}))
+        except ErrorAccion as error:
+            self.enviar(writer, trama_json({"tipo": "error", "motivo": str(error)}))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            del self.clientes[writer]
+            if sala is not None:
+                sala.salir(writer)
+            writer.close()
+
+class ClienteParques:
+    # Cliente minimo (pruebas, bots remotos): conecta, envia y recibe
+    # mensajes. Con formato "binario" mantiene en self.juego una copia del
+    # estado de la sala a partir de instantaneas y deltas.
+    def __init__(self, reader, writer, formato="json"):
+        self.reader = reader
+        self.writer = writer
+        self.formato = formato
+        self.juego = ParquesGame() if formato == "binario" else None
+        self.secuencia = None
+    
+    @classmethod
+    async def conectar(cls, host, puerto, sala, asiento=None, token=None, formato="json"):
+        cargar_asyncio()
+        reader, writer = await asyncio.open_connection(host, puerto)
+        cliente = cls(reader, writer, formato)
+        await cliente.enviar({"tipo": "unirse", "sala": sala, "asiento": asiento,
+                              "token": token, "formato": formato})
+        return cliente
+    
+    async def enviar(self, mensaje):
+        self.writer.write(trama_json(mensaje))
+        await self.writer.drain()
+    
+    async def recibir(self):
+        # Los mensajes binarios se aplican a self.juego y se devuelven como
+        # {"tipo": "instantanea" | "delta", "secuencia": ..., "eventos": ...}.
+        # Un delta fuera de secuencia se descarta y se pide resincronizar.
+        while True:
+            tipo, carga = await leer_trama(self.reader)
+            if tipo == MSG_JSON:
+                return json.loads(carga)
+            if tipo == MSG_INSTANTANEA:
+                self.secuencia = aplicar_instantanea(self.juego, carga)
+                return {"tipo": "instantanea", "secuencia": self.secuencia}
+            secuencia, = FORMATO_SECUENCIA.unpack_from(carga)
+            if self.secuencia is not None and secuencia == self.secuencia + 1:
+                self.secuencia, eventos = aplicar_delta(self.juego, carga)
+                return {"tipo": "delta", "secuencia": secuencia, "eventos": eventos}
+            if self.secuencia is None or secuencia > self.secuencia + 1:
+                await self.enviar({"tipo": "resincronizar",
+                                   "desde": -1 if self.secuencia is None else self.secuencia})
+    
+    async def cerrar(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def servir(host, puerto, tiempo_turno=TIEMPO_TURNO, directorio_repeticiones=None):
+    servidor = ServidorParques(tiempo_turno=tiempo_turno, directorio_repeticiones=directorio_repeticiones)
+    puerto = await servidor.iniciar(host, puerto)
+    print(f"Servidor de Parques en {host}:{puerto}", flush=True)
+    async with servidor.servidor:
+        await servidor.servidor.serve_forever()
+
+# ---------------------
+# INTERFAZ DE TEXTO (SIN PYGAME)
+# ---------------------
+# La misma partida que la ventana, por consola: Enter lanza los dados, un
+# numero elige uno de los movimientos legales, "p" pasa y "q" sale. Los
+# bots juegan su turno entero sin preguntar. entrada y salida se pueden
+# cambiar (pruebas, otra terminal).
+class InterfazTexto:
+    def __init__(self, juego=None, bots=None, entrada=input, salida=print):
+        self.juego = juego if juego is not None else ParquesGame()
+        self.bots = bots or {}
+        self.entrada = entrada
+        self.salida = salida
+    
+    def mostrar_estado(self):
+        juego = self.juego
+        for j in juego.jugadores:
+            marca = ">" if j.indice == juego.indice_jugador_actual else " "
+            fichas = " ".join(str(f) for f in j.fichas)
+            self.salida(f"{marca} {j.nombre:<9}{fichas}")
+    
+    def preguntar(self, texto):
+        try:
+            return self.entrada(texto).strip().lower()
+        except EOFError:
+            return "q"
+    
+    def turno_bot(self, bot):
+        juego = self.juego
+        nombre = juego.jugador_actual().nombre
+        mensaje = juego.lanzar_dados()
+        if not juego.valores_dados:
+            self.salida(f"{nombre} ({bot.nombre}): {mensaje}")
+            juego.terminar_turno()
+            return
+        self.salida(f"{nombre} ({bot.nombre}) saca {' y '.join(map(str, juego.valores_dados))}")
+        while juego.valores_dados:
+            movimiento = bot.elegir_movimiento(juego)
+            if movimiento is None:
+                juego.terminar_turno()
+                self.salida(f"{nombre} pasa.")
+                return
+            self.salida("  " + juego.jugar(movimiento))
+    
+    def turno_humano(self):
+        # Devuelve False si el jugador quiere salir
+        juego = self.juego
+        nombre = juego.jugador_actual().nombre
+        self.mostrar_estado()
+        if self.preguntar(f"{nombre}: Enter para lanzar los dados (q sale) ") == "q":
+            return False
+        mensaje = juego.lanzar_dados()
+        if not juego.valores_dados:
+            self.salida(mensaje)
+            juego.terminar_turno()
+            return True
+        while juego.valores_dados:
+            movimientos = juego.movimientos_legales()
+            if not movimientos:
+                self.salida("Sin movimientos posibles: pasa el turno.")
+                juego.terminar_turno()
+                return True
+            self.salida(f"Dados: {' y '.join(map(str, juego.valores_dados))}")
+            for k, (i, pasos, dados) in enumerate(movimientos, 1):
+                self.salida(f"  {k}) {juego.ficha(i)} avanza {pasos} ({'+'.join(map(str, dados))})")
+            respuesta = self.preguntar("Movimiento (p pasa, q sale): ")
+            if respuesta == "q":
+                return False
+            if respuesta == "p":
+                juego.terminar_turno()
+                return True
+            if not respuesta.isdigit() or not 1 <= int(respuesta) <= len(movimientos):
+                self.salida("Elige un numero de la lista.")
+                continue
+            self.salida(juego.jugar(movimientos[int(respuesta) - 1]))
+        return True
+    
+    def ejecutar(self):
+        juego = self.juego
+        while juego.ganador() is None:
+            bot = self.bots.get(juego.indice_jugador_actual)
+            if bot is not None:
+                self.turno_bot(bot)
+            elif not self.turno_humano():
+                return None
+        ganador = juego.ganador()
+        self.mostrar_estado()
+        self.salida(f"¡{ganador.nombre} ha ganado!")
+        return ganador
+
+# ---------------------
+# COORDENADAS PARA EL DIBUJO DEL TABLERO
+# ---------------------
+# Solo las usa la ventana: las tablas empiezan vacias y construir_geometria
+# las llena la primera vez (InterfazParquesPygame la llama al crearse).
+coordenadas_del_tablero_externo = {}
+coordenadas_de_la_via_interna = {}
+longitud_lado = 17
+top_y = MARGEN
+left_x = MARGEN
+right_x = TAMANO_TABLERO - MARGEN
+bottom_y = TAMANO_TABLERO - MARGEN
+
+def construir_coordenadas_del_tablero_externo():
+    for i in range(longitud_lado):
+        pos = i
+        x = left_x + i * ((right_x - left_x) // (longitud_lado - 1))
+        y = top_y
+        coordenadas_del_tablero_externo[pos] = (x, y)
+    for i in range(longitud_lado):
+        pos = 17 + i
+        x = right_x
+        y = top_y + i * ((bottom_y - top_y) // (longitud_lado - 1))
+        coordenadas_del_tablero_externo[pos] = (x, y)
+    for i in range(longitud_lado):
+        pos = 34 + i
+        x = right_x - i * ((right_x - left_x) // (longitud_lado - 1))
+        y = bottom_y
+        coordenadas_del_tablero_externo[pos] = (x, y)
+    for i in range(longitud_lado):
+        pos = 51 + i
+        x = left_x
+        y = bottom_y - i * ((bottom_y - top_y) // (longitud_lado - 1))
+        coordenadas_del_tablero_externo[pos] = (x, y)
+
+# Funciones para construir las vías internas
+def construir_coordenadas_de_la_via_interna_rojo():
+    coords = []
+    centro_x = TAMANO_TABLERO // 2
+    centro_y = TAMANO_TABLERO // 2
+    for i in range(NUM_CASILLAS_INTERNAS):
+        x = centro_x
+        y = centro_y - (i + 1) * CELDA
+        coords.append((x, y))
+    return coords
+
+def construir_coordenadas_de_la_via_interna_azul():
+    coords = []
+    centro_x = TAMANO_TABLERO // 2
+    centro_y = TAMANO_TABLERO // 2
+    for i in range(NUM_CASILLAS_INTERNAS):
+        x = centro_x + (i + 1) * CELDA
+        y = centro_y
+        coords.append((x, y))
+    return coords
+
+def construir_coordenadas_de_la_via_interna_verde():
+    coords = []
+    centro_x = TAMANO_TABLERO // 2
+    centro_y = TAMANO_TABLERO // 2
+    for i in range(NUM_CASILLAS_INTERNAS):
+        x = centro_x
+        y = centro_y + (i + 1) * CELDA
+        coords.append((x, y))
+    return coords
+
+def construir_coordenadas_de_la_via_interna_amarillo():
+    coords = []
+    centro_x = TAMANO_TABLERO // 2
+    centro_y = TAMANO_TABLERO // 2
+    for i in range(NUM_CASILLAS_INTERNAS):
+        x = centro_x - (i + 1) * CELDA
+        y = centro_y
+        coords.append((x, y))
+    return coords
+
+def construir_geometria():
+    if coordenadas_del_tablero_externo:
+        return
+    construir_coordenadas_del_tablero_externo()
+    coordenadas_de_la_via_interna.update({
+        "Rojo": construir_coordenadas_de_la_via_interna_rojo(),
+        "Azul": construir_coordenadas_de_la_via_interna_azul(),
+        "Verde": construir_coordenadas_de_la_via_interna_verde(),
+        "Amarillo": construir_coordenadas_de_la_via_interna_amarillo(),
+    })
+
+# Posiciones de la cárcel
+posiciones_de_la_carcel = {
+    "Rojo": {"x": 80, "y": 100, "offset_y": 25},
+    "Azul": {"x": 500, "y": 100, "offset_y": 25},
+    "Verde": {"x": 400, "y": 400, "offset_y": 25},
+    "Amarillo": {"x": 150, "y": 400, "offset_y": 25},
+}
+
+# ---------------------
+# IA EN SEGUNDO PLANO
+# ---------------------
+# La busqueda de los bots es Python puro y no suelta el GIL: se hace en otro
+# proceso para que la ventana siga dibujando. La interfaz manda una foto del
+# estado (exportar_estado) con un numero de pedido; el proceso responde por
+# una tuberia y un hilo de escucha convierte cada respuesta en un evento de
+# pygame. "vigente" es memoria compartida con el pedido en curso: si la
+# interfaz lo cambia, la busqueda se abandona y su respuesta no se envia.
+# El proceso se arranca con "spawn": un fork heredaria la ventana y los
+# manejadores de senales de SDL.
+def _bucle_trabajador_ia(conexion, vigente, bots):
+    # Ctrl+C lo gestiona la ventana; el trabajador termina con ella
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Menos prioridad que la ventana: con un solo nucleo se sigue dibujando
+    if hasattr(os, "nice"):
+        os.nice(5)
+    juego = ParquesGame()
+    while True:
+        try:
+            pedido = conexion.recv()
+        except EOFError:
+            return
+        if pedido is None:
+            return
+        numero, estado = pedido
+        if vigente.value != numero:
+            continue  # cancelado antes de empezar
+        juego.importar_estado(estado)
+        bot = bots[juego.indice_jugador_actual]
+        bot.cancelada = lambda: vigente.value != numero
+        movimiento = bot.elegir_movimiento(juego)
+        if vigente.value == numero:
+            conexion.send((numero, movimiento))
+
+class TrabajadorIA:
+    def __init__(self, bots, tipo_evento):
+        self.tipo_evento = tipo_evento
+        import multiprocessing
+        contexto = multiprocessing.get_context("spawn")
+        self.vigente = contexto.RawValue("q", 0)
+        self.numero = 0
+        self.conexion, remota = contexto.Pipe()
+        self.proceso = contexto.Process(target=_bucle_trabajador_ia,
+                                               args=(remota, self.vigente, bots), daemon=True)
+        self.proceso.start()
+        remota.close()
+        self.escucha = threading.Thread(target=self._escuchar, daemon=True)
+        self.escucha.start()
+    
+    def pedir(self, juego):
+        # Devuelve el numero de pedido; la respuesta llega como evento
+        # tipo_evento con los atributos numero y movimiento
+        self.numero += 1
+        self.vigente.value = self.numero
+        self.conexion.send((self.numero, juego.exportar_estado()))
+        return self.numero
+    
+    def cancelar(self):
+        self.vigente.value = 0
+    
+    def _escuchar(self):
+        while True:
+            try:
+                numero, movimiento = self.conexion.recv()
+            except (EOFError, OSError):
+                return
+            pygame.event.post(pygame.event.Event(self.tipo_evento, numero=numero, movimiento=movimiento))
+    
+    def cerrar(self):
+        self.cancelar()
+        try:
+            self.conexion.send(None)
+        except OSError:
+            pass
+        self.proceso.join(1)
+        if self.proceso.is_alive():
+            self.proceso.terminate()
+            self.proceso.join()
+        self.conexion.close()
+
+# ---------------------
+# INTERFAZ GRAFICA CON PYGAME
+# ---------------------
+PAUSA_BOT_MS = 500
+LIMITE_CACHE_TEXTOS = 256
+# Bucle por eventos: como mucho FPS_MAXIMO cuadros por segundo mientras algo
+# se mueve, y sin despertar mas de una vez cada ESPERA_MAXIMA_MS si no pasa nada
+FPS_MAXIMO = 60
+ESPERA_MAXIMA_MS = 1000
+
+# Perfilador: un registro por cuadro dibujado con el tiempo de cada parte
+# (eventos, bots, calculo de elementos, repintado y envio a la pantalla),
+# los rectangulos, blits y trazos del cuadro y los movimientos aplicados
+# por la interfaz (mover_ficha) con su latencia. "cuadro_ms" es el trabajo
+# del cuadro sin las esperas; "intervalo_ms" el tiempo entre dos cuadros.
+CAMPOS_PERFIL = ("t_ms", "cuadro_ms", "intervalo_ms", "eventos_ms", "bot_ms", "elementos_ms",
+                 "repintado_ms", "presentar_ms", "rects", "blits", "trazos", "movimientos", "mover_ms")
+VENTANA_PERFIL = 600          # cuadros que entran en los percentiles del HUD
+LIMITE_LINEA_TIEMPO = 100000  # cuadros que se guardan para exportar
+REFRESCO_HUD_MS = 250
+RECT_HUD = (TAMANO_TABLERO - 300, 4, 296, 100)
+
+class Perfilador:
+    def __init__(self, ventana=VENTANA_PERFIL, limite=LIMITE_LINEA_TIEMPO):
+        self.inicio = time.perf_counter()
+        self.ultimo_fin = None
+        self.actual = dict.fromkeys(CAMPOS_PERFIL, 0)
+        self.recientes = deque(maxlen=ventana)
+        self.linea_tiempo = deque(maxlen=limite)
+        self.cuadros = 0
+        self.movimientos = 0
+        self.mover_ms = 0.0
+        self.mover_max_ms = 0.0
+        # Funciones a las que se pasa cada registro al cerrar el cuadro
+        self.oyentes = []
+    
+    def sumar(self, campo, valor):
+        self.actual[campo] += valor
+    
+    def movimiento(self, ms):
+        self.actual["movimientos"] += 1
+        self.actual["mover_ms"] += ms
+        self.movimientos += 1
+        self.mover_ms += ms
+        if ms > self.mover_max_ms:
+            self.mover_max_ms = ms
+    
+    def terminar_cuadro(self):
+        ahora = time.perf_counter()
+        registro = self.actual
+        registro["t_ms"] = round((ahora - self.inicio) * 1000, 3)
+        registro["intervalo_ms"] = 0 if self.ultimo_fin is None else (ahora - self.ultimo_fin) * 1000
+        registro["cuadro_ms"] = (registro["eventos_ms"] + registro["bot_ms"] + registro["elementos_ms"]
+                                 + registro["repintado_ms"] + registro["presentar_ms"])
+        self.ultimo_fin = ahora
+        self.recientes.append(registro)
+        self.linea_tiempo.append(registro)
+        self.cuadros += 1
+        self.actual = dict.fromkeys(CAMPOS_PERFIL, 0)
+        for oyente in self.oyentes:
+            oyente(registro)
+    
+    def percentiles(self, campo, puntos=(50, 95, 99)):
+        valores = sorted(registro[campo] for registro in self.recientes)
+        if not valores:
+            return [0.0] * len(puntos)
+        return [valores[min(len(valores) - 1, len(valores) * p // 100)] for p in puntos]
+    
+    def media(self, campo):
+        return sum(registro[campo] for registro in self.recientes) / max(1, len(self.recientes))
+    
+    def resumen(self):
+        # Contadores para consultar desde fuera (o volcar al salir)
+        resumen = {"cuadros": self.cuadros, "movimientos": self.movimientos,
+                   "mover_ms_medio": self.mover_ms / max(1, self.movimientos),
+                   "mover_ms_max": self.mover_max_ms}
+        for campo in ("cuadro_ms", "intervalo_ms"):
+            for p, valor in zip((50, 95, 99), self.percentiles(campo)):
+                resumen[f"{campo}_p{p}"] = valor
+        for campo in ("eventos_ms", "bot_ms", "elementos_ms", "repintado_ms", "presentar_ms",
+                      "rects", "blits", "trazos"):
+            resumen[f"{campo}_medio"] = self.media(campo)
+        return resumen
+    
+    def lineas_hud(self):
+        c50, c95, c99 = self.percentiles("cuadro_ms")
+        i50, i95, i99 = self.percentiles("intervalo_ms")
+        ultimo = self.recientes[-1] if self.recientes else self.actual
+        media_mover = self.mover_ms / max(1, self.movimientos)
+        return (
+            f"cuadro ms p50 {c50:.2f} p95 {c95:.2f} p99 {c99:.2f}",
+            f"intervalo ms p50 {i50:.1f} p95 {i95:.1f} p99 {i99:.1f}",
+            f"ev {self.media('eventos_ms'):.2f} bot {self.media('bot_ms'):.2f} elem {self.media('elementos_ms'):.2f}"
+            f" pint {self.media('repintado_ms'):.2f} flip {self.media('presentar_ms'):.2f}",
+            f"blits {ultimo['blits']} trazos {ultimo['trazos']} rects {ultimo['rects']}",
+            f"mover_ficha {self.movimientos} x {media_mover:.3f} ms (max {self.mover_max_ms:.3f})",
+        )
+    
+    def guardar(self, ruta):
+        # Linea de tiempo en CSV (una fila por cuadro) o JSON (con el resumen)
+        if ruta.endswith(".json"):
+            with open(ruta, "w") as f:
+                json.dump({"campos": CAMPOS_PERFIL, "resumen": self.resumen(),
+                           "cuadros": [[registro[campo] for campo in CAMPOS_PERFIL]
+                                       for registro in self.linea_tiempo]}, f)
+        else:
+            with open(ruta, "w", newline="") as f:
+                escritor = csv.writer(f)
+                escritor.writerow(CAMPOS_PERFIL)
+                for registro in self.linea_tiempo:
+                    escritor.writerow([registro[campo] for campo in CAMPOS_PERFIL])
+
+class CacheTextos:
+    # Superficies de texto ya renderizadas, por (fuente, texto, color). Las
+    # etiquetas fijas se piden una y otra vez; los mensajes de estado van
+    # cambiando, por eso la cache tiene tamano limitado y descarta la que
+    # lleva mas tiempo sin usarse.
+    __slots__ = ("limite", "superficies")
+    
+    def __init__(self, limite=LIMITE_CACHE_TEXTOS):
+        self.limite = limite
+        self.superficies = OrderedDict()
+    
+    def render(self, fuente, texto, color):
+        clave = (fuente, texto, color)
+        superficie = self.superficies.get(clave)
+        if superficie is not None:
+            self.superficies.move_to_end(clave)
+            return superficie
+        superficie = fuente.render(texto, True, color)
+        self.superficies[clave] = superficie
+        if len(self.superficies) > self.limite:
+            self.superficies.popitem(last=False)
+        return superficie
+
+# Puntos de cada cara del dado (relativos a la esquina del dado de 40x40)
+PUNTOS_DADO = {
+    1: ((20, 20),),
+    2: ((12, 12), (28, 28)),
+    3: ((12, 12), (20, 20), (28, 28)),
+    4: ((12, 12), (28, 12), (12, 28), (28, 28)),
+    5: ((12, 12), (28, 12), (20, 20), (12, 28), (28, 28)),
+    6: ((12, 10), (28, 10), (12, 20), (28, 20), (12, 30), (28, 30)),
+}
+RADIO_FICHA = 10
+RADIO_RESALTE = 12
+# Las imagenes de fichas y resaltes son cuadradas con la ficha en el centro
+# (CENTRO_IMAGEN, CENTRO_IMAGEN); el margen deja sitio al borde grueso del resalte
+CENTRO_IMAGEN = RADIO_RESALTE + 2
+LADO_IMAGEN = 2 * CENTRO_IMAGEN + 1
+
+def superficie_transparente(ancho, alto):
+    return pygame.Surface((ancho, alto), pygame.SRCALPHA)
+
+class IndiceClics:
+    # Indice espacial de los objetivos de clic (casillas, celdas de la via
+    # interna, puestos de la carcel, dados y botones). La ventana se parte en
+    # cubetas de lado x lado pixeles; cada cubeta guarda, en orden de
+    # prioridad, los objetivos que la tocan. Una consulta mira una sola cubeta
+    # y prueba solo esos pocos objetivos.
+    __slots__ = ("lado", "columnas", "filas", "cubetas", "objetivos", "formas")
+    
+    def __init__(self, ancho, alto, lado=16):
+        self.lado = lado
+        self.columnas = ancho // lado + 1
+        self.filas = alto // lado + 1
+        self.cubetas = [[] for _ in range(self.columnas * self.filas)]
+        self.objetivos = []
+        self.formas = []
+    
+    def _registrar(self, objetivo, forma, x0, y0, x1, y1):
+        k = len(self.objetivos)
+        self.objetivos.append(objetivo)
+        self.formas.append(forma)
+        lado = self.lado
+        for fila in range(max(0, int(y0) // lado), min(self.filas - 1, int(y1) // lado) + 1):
+            for columna in range(max(0, int(x0) // lado), min(self.columnas - 1, int(x1) // lado) + 1):
+                self.cubetas[fila * self.columnas + columna].append(k)
+    
+    def agregar_rect(self, objetivo, rect):
+        # Acierta si left <= x < right y top <= y < bottom (como Rect.collidepoint)
+        self._registrar(objetivo, (rect.left, rect.top, rect.right, rect.bottom, None),
+                        rect.left, rect.top, rect.right - 1, rect.bottom - 1)
+    
+    def agregar_circulo(self, objetivo, cx, cy, radio):
+        # Acierta si la distancia al centro es menor que el radio
+        self._registrar(objetivo, (cx, cy, 0, 0, radio * radio),
+                        cx - radio, cy - radio, cx + radio, cy + radio)
+    
+    def consultar(self, x, y):
+        # Objetivos bajo el punto (en pixeles de la ventana), por prioridad
+        columna = int(x) // self.lado
+        fila = int(y) // self.lado
+        if not (0 <= columna < self.columnas and 0 <= fila < self.filas) or x < 0 or y < 0:
+            return []
+        aciertos = []
+        for k in self.cubetas[fila * self.columnas + columna]:
+            a, b, c, d, radio2 = self.formas[k]
+            if radio2 is None:
+                if a <= x < c and b <= y < d:
+                    aciertos.append(self.objetivos[k])
+            elif (x - a) * (x - a) + (y - b) * (y - b) < radio2:
+                aciertos.append(self.objetivos[k])
+        return aciertos
+
+def construir_cara_dado(valor):
+    cara = superficie_transparente(40, 40)
+    dado_rect = pygame.Rect(0, 0, 40, 40)
+    pygame.draw.rect(cara, COLOR_DADO, dado_rect, border_radius=5)
+    pygame.draw.rect(cara, (0, 0, 0), dado_rect, 2, border_radius=5)
+    for px, py in PUNTOS_DADO[valor]:
+        pygame.draw.circle(cara, COLOR_DADO_PUNTO, (px, py), 4)
+    return cara
+
+def construir_ficha(color):
+    r = CENTRO_IMAGEN
+    ficha = superficie_transparente(LADO_IMAGEN, LADO_IMAGEN)
+    pygame.draw.circle(ficha, color, (r, r), RADIO_FICHA)
+    pygame.draw.circle(ficha, (0, 0, 0), (r, r), RADIO_FICHA, 1)
+    return ficha
+
+def construir_resalte_ficha():
+    r = CENTRO_IMAGEN
+    resalte = superficie_transparente(LADO_IMAGEN, LADO_IMAGEN)
+    pygame.draw.circle(resalte, (255, 255, 255), (r, r), RADIO_RESALTE, 2)
+    return resalte
+
+def construir_triangulo(color):
+    # Ficha en la carcel
+    r = CENTRO_IMAGEN
+    triangulo = superficie_transparente(LADO_IMAGEN, LADO_IMAGEN)
+    puntos = [(r, r - 10), (r - 10, r + 10), (r + 10, r + 10)]
+    pygame.draw.polygon(triangulo, color, puntos)
+    pygame.draw.polygon(triangulo, (0, 0, 0), puntos, 1)
+    return triangulo
+
+def construir_resalte_triangulo():
+    r = CENTRO_IMAGEN
+    d = RADIO_RESALTE
+    resalte = superficie_transparente(LADO_IMAGEN, LADO_IMAGEN)
+    pygame.draw.polygon(resalte, (255, 255, 255), [(r, r - d), (r - d, r + d), (r + d, r + d)], 2)
+    return resalte
+
+class InterfazParquesPygame:
+    def __init__(self, juego=None, bots=None, segundo_plano=True, finales=None, perfil=None):
+        cargar_pygame()
+        construir_geometria()
+        pygame.init()
+        self.screen_width = TAMANO_TABLERO
+        self.screen_height = TAMANO_TABLERO + 100  # Espacio adicional para controles
+        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+        pygame.display.set_caption("Parques Tradicional")
+        
+        self.font = pygame.font.SysFont(None, 24)
+        self.title_font = pygame.font.SysFont(None, 32)
+        self.dado_font = pygame.font.SysFont(None, 30)
+        self.textos = CacheTextos()
+        
+        # Dados, fichas y resaltes pre-dibujados: en cada cuadro solo se copian
+        self.caras_dado = {valor: construir_cara_dado(valor) for valor in PUNTOS_DADO}
+        self.imagen_ficha = {nombre: construir_ficha(color) for nombre, color in COLORES_JUGADORES.items()}
+        self.imagen_triangulo = {nombre: construir_triangulo(color) for nombre, color in COLORES_JUGADORES.items()}
+        self.resalte_ficha = construir_resalte_ficha()
+        self.resalte_triangulo = construir_resalte_triangulo()
+        
+        # Variables de estado (el turno y los dados viven en el motor)
+        self.juego = juego if juego is not None else ParquesGame()
+        self.ficha_seleccionada = None
+        self.mensaje_estado = ""
+        self.mensaje_turno = ""
+        
+        # Asientos ocupados por bots: {indice de jugador: Bot}
+        self.bots = dict(bots) if bots else {}
+        self.proxima_accion_bot = 0
+        # Con segundo_plano los bots piensan en un TrabajadorIA (se crea con
+        # la primera jugada); pedido_ia es el pedido en curso, posicion_ia el
+        # estado para el que se pidio y respuesta_ia (movimiento,) al llegar
+        self.segundo_plano = segundo_plano
+        self.finales = finales  # TablaFinales para las pistas (tecla P)
+        # Perfilador opcional (F3 muestra el HUD y lo crea si no hay)
+        self.perfil = perfil
+        self.mostrar_perfil = False
+        self.rect_hud = pygame.Rect(RECT_HUD)
+        self.texto_perfil = ()
+        self.proximo_texto_perfil = 0
+        self.trabajador_ia = None
+        self.evento_ia = pygame.event.custom_type()
+        self.pedido_ia = None
+        self.posicion_ia = None
+        self.respuesta_ia = None
+        
+        # Botones
+        self.boton_lanzar = pygame.Rect(50, TAMANO_TABLERO + 20, 120, 40)
+        self.boton_terminar = pygame.Rect(200, TAMANO_TABLERO + 20, 120, 40)
+        self.indice_clics = self.construir_indice_clics()
+        
+        # Capa fija y lo dibujado en el ultimo cuadro
+        self.fondo = self.construir_fondo()
+        self.elementos_dibujados = {}
+        self.redibujar_todo = True
+        
+        self.actualizar_mensaje_turno()
+        self.dibujar_tablero()
+    
+    def actualizar_mensaje_turno(self):
+        actual = self.juego.jugador_actual()
+        self.mensaje_turno = f"Turno de: {actual.nombre} ({actual.color})"
+    
+    def alternar_perfil(self):
+        if self.perfil is None:
+            self.perfil = Perfilador()
+        if not hasattr(self, "fondo_hud"):
+            self.fuente_hud = pygame.font.SysFont(None, 18)
+            self.fondo_hud = superficie_transparente(self.rect_hud.width, self.rect_hud.height)
+            self.fondo_hud.fill((0, 0, 0, 170))
+        self.mostrar_perfil = not self.mostrar_perfil
+        self.proximo_texto_perfil = 0
+    
+    def mostrar_pista(self):
+        # Jugada recomendada por la tabla de finales: selecciona la ficha y
+        # dice con que dados moverla
+        j = self.juego.indice_jugador_actual
+        if self.finales is None or j in self.bots or self.juego.ganador() is not None:
+            return
+        turnos = self.finales.turnos_esperados(self.juego, j)
+        if turnos is None:
+            self.mensaje_estado = "Sin pista: hay fichas lejos de la meta."
+        elif not self.juego.valores_dados:
+            self.mensaje_estado = f"Pista: lanza los dados (~{turnos:.1f} turnos para terminar)"
+        else:
+            movimiento, turnos = self.finales.mejor_movimiento(self.juego)
+            if movimiento is None:
+                self.mensaje_estado = f"Pista: pasa el turno (~{turnos:.1f} turnos)"
+            else:
+                self.ficha_seleccionada = self.juego.ficha(movimiento[0])
+                dados = "+".join(map(str, movimiento[2]))
+                self.mensaje_estado = f"Pista: {self.ficha_seleccionada} con {dados} (~{turnos:.1f} turnos)"
+    
+    # ---------------------
+    # DIBUJO: FONDO FIJO Y REGIONES SUCIAS
+    # ---------------------
+    # Lo que no cambia (tablero, casillas con sus numeros, etiquetas de la
+    # carcel y panel) se dibuja una sola vez en self.fondo. Cada elemento
+    # dinamico (fichas de una casilla, fichas en la carcel, botones, mensajes,
+    # dados) tiene una firma con lo que se ve de el; en cada cuadro solo se
+    # repintan, y se envian a la pantalla, los rectangulos de los elementos
+    # cuya firma cambio.
+    def construir_fondo(self):
+        fondo = pygame.Surface((self.screen_width, self.screen_height))
+        fondo.fill(COLOR_FONDO)
+        
+        # Dibujar el tablero
+        pygame.draw.rect(fondo, COLOR_TABLERO, 
+                        (MARGEN, MARGEN, 
+                         TAMANO_TABLERO - 2*MARGEN, 
+                         TAMANO_TABLERO - 2*MARGEN))
+        
+        # Dibujar cuadrícula central
+        centro = TAMANO_TABLERO // 2
+        pygame.draw.line(fondo, (0, 0, 0), 
+                        (centro, MARGEN), 
+                        (centro, TAMANO_TABLERO - MARGEN), 2)
+        pygame.draw.line(fondo, (0, 0, 0), 
+                        (MARGEN, centro), 
+                        (TAMANO_TABLERO - MARGEN, centro), 2)
+        
+        # Dibujar casillas externas
+        for pos, (cx, cy) in coordenadas_del_tablero_externo.items():
+            rect = pygame.Rect(cx - 15, cy - 15, 30, 30)
+            pygame.draw.rect(fondo, (200, 200, 200), rect)
+            pygame.draw.rect(fondo, (100, 100, 100), rect, 1)
+            
+            # Numerar casillas importantes
+            num_casillas = pos + 1
+            if num_casillas in [1, 18, 35, 52, 68]:
+                texto = self.textos.render(self.font, str(num_casillas), (0, 0, 0))
+                fondo.blit(texto, (cx - 5, cy - 8))
+        
+        # Dibujar vías internas
+        for j in self.juego.jugadores:
+            for i, (cx, cy) in enumerate(coordenadas_de_la_via_interna[j.nombre]):
+                rect = pygame.Rect(cx - 15, cy - 15, 30, 30)
+                pygame.draw.rect(fondo, (240, 240, 240), rect)
+                pygame.draw.rect(fondo, (100, 100, 100), rect, 1)
+                texto = self.textos.render(self.font, str(i+1), (0, 0, 0))
+                fondo.blit(texto, (cx - 5, cy - 8))
+        
+        # Etiquetas de la cárcel
+        for j in self.juego.jugadores:
+            pos_carcel = posiciones_de_la_carcel[j.nombre]
+            texto = self.textos.render(self.font, f"Cárcel {j.nombre}", COLORES_JUGADORES[j.nombre])
+            fondo.blit(texto, (pos_carcel["x"] - 30, pos_carcel["y"] - 30))
+        
+        # Panel de control
+        pygame.draw.rect(fondo, (230, 230, 230), 
+                        (0, TAMANO_TABLERO, 
+                         self.screen_width, 100))
+        pygame.draw.line(fondo, (150, 150, 150), 
+                        (0, TAMANO_TABLERO), 
+                        (self.screen_width, TAMANO_TABLERO), 2)
+        return fondo
+    
+    def elementos_dinamicos(self):
+        # {clave: (firma, rectangulo)} en el orden de dibujo
+        juego = self.juego
+        seleccionada = self.ficha_seleccionada.indice if self.ficha_seleccionada is not None else NINGUNA
+        elementos = {}
+        
+        # Fichas en casillas externas (apiladas en orden de llegada)
+        for pos in range(NUM_CASILLAS_EXTERNAS):
+            n = juego.ocupacion[pos]
+            if n:
+                fichas = tuple(f.indice for f in juego.fichas_en(pos))
+                cx, cy = coordenadas_del_tablero_externo[pos]
+                lado = 34 + (n - 1) * 8
+                elementos["casilla", pos] = ((fichas, seleccionada if seleccionada in fichas else NINGUNA),
+                                             pygame.Rect(cx - 17, cy - 17, lado, lado))
+        
+        # Fichas en la vía interna
+        for i in range(NUM_FICHAS):
+            codigo = juego.posiciones[i]
+            if BASE_INTERNA <= codigo < CARCEL:
+                j = i // FICHAS_POR_JUGADOR
+                clave = ("interna", j, codigo - BASE_INTERNA)
+                anterior = elementos.get(clave)
+                marcada = i == seleccionada or (anterior is not None and anterior[0][1])
+                if anterior is None:
+                    cx, cy = coordenadas_de_la_via_interna[DATOS_JUGADORES[j][0]][codigo - BASE_INTERNA]
+                    elementos[clave] = ((1, marcada), pygame.Rect(cx - 13, cy - 13, 27, 27))
+                else:
+                    elementos[clave] = ((anterior[0][0] + 1, marcada), anterior[1])
+        
+        # Fichas en la cárcel: cuantas hay y cual de ellas esta seleccionada
+        for j in range(NUM_JUGADORES):
+            en_carcel = [i for i in range(j * FICHAS_POR_JUGADOR, (j + 1) * FICHAS_POR_JUGADOR)
+                         if juego.posiciones[i] == CARCEL]
+            if en_carcel:
+                pos_carcel = posiciones_de_la_carcel[DATOS_JUGADORES[j][0]]
+                marcada = en_carcel.index(seleccionada) if seleccionada in en_carcel else -1
+                elementos["carcel", j] = ((len(en_carcel), marcada),
+                                          pygame.Rect(pos_carcel["x"] - 14, pos_carcel["y"] - 14, 29,
+                                                      (FICHAS_POR_JUGADOR - 1) * pos_carcel["offset_y"] + 29))
+        
+        # Botones (cambian de color con el ratón encima)
+        raton = pygame.mouse.get_pos()
+        elementos["boton", 0] = (self.boton_lanzar.collidepoint(raton), self.boton_lanzar)
+        elementos["boton", 1] = (self.boton_terminar.collidepoint(raton), self.boton_terminar)
+        
+        # Mensajes
+        color = COLORES_JUGADORES[juego.jugador_actual().nombre]
+        elementos["turno",] = ((self.mensaje_turno, color),
+                               self.textos.render(self.title_font, self.mensaje_turno, color)
+                                   .get_rect(topleft=(400, TAMANO_TABLERO + 15)))
+        if self.mensaje_estado:
+            elementos["estado",] = (self.mensaje_estado,
+                                    self.textos.render(self.font, self.mensaje_estado, (200, 0, 0))
+                                    .get_rect(topleft=(50, TAMANO_TABLERO + 70)))
+        
+        # Dados lanzados
+        if juego.valores_dados:
+            dados = tuple(juego.valores_dados)
+            elementos["dados",] = (dados, pygame.Rect(500, TAMANO_TABLERO + 30, len(dados) * 60 - 20, 40))
+        
+        # HUD del perfilador, encima de todo; el texto cambia como mucho
+        # cada REFRESCO_HUD_MS para no repintarlo en cada cuadro
+        if self.mostrar_perfil:
+            ahora = pygame.time.get_ticks()
+            if ahora >= self.proximo_texto_perfil:
+                self.texto_perfil = self.perfil.lineas_hud()
+                self.proximo_texto_perfil = ahora + REFRESCO_HUD_MS
+            elementos["perfil",] = (self.texto_perfil, self.rect_hud)
+        return elementos
+    
+    def dibujar_elemento(self, clave, firma):
+        tipo = clave[0]
+        if tipo == "casilla":
+            fichas, seleccionada = firma
+            cx, cy = coordenadas_del_tablero_externo[clave[1]]
+            for i, indice in enumerate(fichas):
+                x = cx + i * 8 - 4 - CENTRO_IMAGEN
+                y = cy + i * 8 - 4 - CENTRO_IMAGEN
+                self.screen.blit(self.imagen_ficha[DATOS_JUGADORES[indice // FICHAS_POR_JUGADOR][0]], (x, y))
+                
+                # Resaltar ficha seleccionada
+                if indice == seleccionada:
+                    self.screen.blit(self.resalte_ficha, (x, y))
+            return len(fichas) + (seleccionada in fichas), 0
+        
+        elif tipo == "interna":
+            nombre = DATOS_JUGADORES[clave[1]][0]
+            cx, cy = coordenadas_de_la_via_interna[nombre][clave[2]]
+            self.screen.blit(self.imagen_ficha[nombre], (cx - CENTRO_IMAGEN, cy - CENTRO_IMAGEN))
+            if firma[1]:
+                self.screen.blit(self.resalte_ficha, (cx - CENTRO_IMAGEN, cy - CENTRO_IMAGEN))
+            return 1 + bool(firma[1]), 0
+        
+        elif tipo == "carcel":
+            cuantas, seleccionada = firma
+            nombre = DATOS_JUGADORES[clave[1]][0]
+            pos_carcel = posiciones_de_la_carcel[nombre]
+            for cont in range(cuantas):
+                x = pos_carcel["x"] - CENTRO_IMAGEN
+                y = pos_carcel["y"] + cont * pos_carcel["offset_y"] - CENTRO_IMAGEN
+                self.screen.blit(self.imagen_triangulo[nombre], (x, y))
+                
+                # Resaltar ficha seleccionada
+                if cont == seleccionada:
+                    self.screen.blit(self.resalte_triangulo, (x, y))
+            return cuantas + (0 <= seleccionada < cuantas), 0
+        
+        elif tipo == "boton":
+            boton = self.boton_lanzar if clave[1] == 0 else self.boton_terminar
+            boton_color = COLOR_BOTON_HOVER if firma else COLOR_BOTON
+            pygame.draw.rect(self.screen, boton_color, boton, border_radius=5)
+            pygame.draw.rect(self.screen, (0, 0, 0), boton, 2, border_radius=5)
+            texto = self.textos.render(self.font, "Lanzar dados" if clave[1] == 0 else "Terminar turno", (255, 255, 255))
+            self.screen.blit(texto, (boton.centerx - texto.get_width()//2, 
+                                    boton.centery - texto.get_height()//2))
+            return 1, 2
+        
+        elif tipo == "turno":
+            texto = self.textos.render(self.title_font, firma[0], firma[1])
+            self.screen.blit(texto, (400, TAMANO_TABLERO + 15))
+            return 1, 0
+        
+        elif tipo == "estado":
+            texto = self.textos.render(self.font, firma, (200, 0, 0))
+            self.screen.blit(texto, (50, TAMANO_TABLERO + 70))
+            return 1, 0
+        
+        elif tipo == "dados":
+            for i, valor in enumerate(firma):
+                self.dibujar_dado(500 + i*60, TAMANO_TABLERO + 30, valor)
+            return len(firma), 0
+        
+        elif tipo == "perfil":
+            self.screen.blit(self.fondo_hud, self.rect_hud)
+            for k, linea in enumerate(firma):
+                self.screen.blit(self.textos.render(self.fuente_hud, linea, (255, 255, 255)),
+                                 (self.rect_hud.x + 6, self.rect_hud.y + 5 + k * 18))
+            return 1 + len(firma), 0
+        return 0, 0
+    
+    def dibujar_tablero(self):
+        perfil = self.perfil
+        if perfil is not None:
+            inicio = time.perf_counter()
+        elementos = self.elementos_dinamicos()
+        anteriores = self.elementos_dibujados
+        if self.redibujar_todo:
+            sucias = [self.screen.get_rect()]
+        else:
+            sucias = []
+            for clave, (firma, rect) in elementos.items():
+                anterior = anteriores.get(clave)
+                if anterior is None:
+                    sucias.append(rect)
+                elif anterior[0] != firma:
+                    sucias.append(rect)
+                    sucias.append(anterior[1])
+            for clave, (firma, rect) in anteriores.items():
+                if clave not in elementos:
+                    sucias.append(rect)
+        self.elementos_dibujados = elementos
+        if perfil is not None:
+            calculado = time.perf_counter()
+            perfil.sumar("elementos_ms", (calculado - inicio) * 1000)
+        if not sucias:
+            return
+        
+        # Cada rectangulo sucio se rehace desde el fondo, con todos los
+        # elementos que lo tocan en su orden de dibujo (recortados a el)
+        blits = trazos = 0
+        for rect in sucias:
+            self.screen.set_clip(rect)
+            self.screen.blit(self.fondo, rect, rect)
+            blits += 1
+            for clave, (firma, r) in elementos.items():
+                if r.colliderect(rect):
+                    b, t = self.dibujar_elemento(clave, firma)
+                    blits += b
+                    trazos += t
+        self.screen.set_clip(None)
+        if perfil is not None:
+            pintado = time.perf_counter()
+        
+        if self.redibujar_todo:
+            self.redibujar_todo = False
+            pygame.display.flip()
+        else:
+            pygame.display.update(sucias)
+        if perfil is not None:
+            perfil.sumar("repintado_ms", (pintado - calculado) * 1000)
+            perfil.sumar("presentar_ms", (time.perf_counter() - pintado) * 1000)
+            perfil.sumar("rects", len(sucias))
+            perfil.sumar("blits", blits)
+            perfil.sumar("trazos", trazos)
+    
+    def dibujar_dado(self, x, y, valor):
+        self.screen.blit(self.caras_dado[valor], (x, y))
+    
+    def lanzar_dados(self):
+        self.mensaje_estado = self.juego.lanzar_dados(self.ficha_seleccionada)
+        self.pasar_si_no_hay_movimientos()
+    
+    def pasar_si_no_hay_movimientos(self):
+        if self.juego.valores_dados and not self.juego.hay_movimientos():
+            self.terminar_turno()
+            self.mensaje_estado = "Sin movimientos posibles: pasa el turno."
+    
+    def usar_dado(self, valor):
+        if self.ficha_seleccionada is None:
+            self.mensaje_estado = "Primero selecciona una ficha."
+            return
+        
+        self.jugar_movimiento((self.ficha_seleccionada.indice, valor, (valor,)))
+    
+    def jugar_movimiento(self, movimiento):
+        if self.perfil is None:
+            self.mensaje_estado = self.juego.jugar(movimiento)
+        else:
+            inicio = time.perf_counter()
+            self.mensaje_estado = self.juego.jugar(movimiento)
+            self.perfil.movimiento((time.perf_counter() - inicio) * 1000)
+        self.ficha_seleccionada = None
+        
+        # El motor ya paso el turno al gastar el ultimo dado
+        if not self.juego.valores_dados:
+            self.actualizar_mensaje_turno()
+            self.mensaje_estado = ""
+        else:
+            self.pasar_si_no_hay_movimientos()
+    
+    def terminar_turno(self):
+        self.juego.terminar_turno()
+        self.ficha_seleccionada = None
+        self.actualizar_mensaje_turno()
+        self.mensaje_estado = ""
+    
+    def turno_bot(self):
+        # Un paso del bot por llamada (tirar o mover), con una pausa entre
+        # pasos para que se pueda seguir la jugada en pantalla. En segundo
+        # plano la busqueda empieza en cuanto hay dados y corre durante la pausa.
+        self.vigilar_pedido_ia()
+        bot = self.bots.get(self.juego.indice_jugador_actual)
+        if bot is None or self.juego.ganador() is not None:
+            return
+        ahora = pygame.time.get_ticks()
+        if self.segundo_plano and self.juego.valores_dados:
+            if self.pedido_ia is None:
+                self.pedir_jugada_ia()
+            if self.respuesta_ia is None or ahora < self.proxima_accion_bot:
+                return
+            movimiento = self.respuesta_ia[0]
+            self.pedido_ia = self.posicion_ia = self.respuesta_ia = None
+        else:
+            if ahora < self.proxima_accion_bot:
+                return
+            if not self.juego.valores_dados:
+                self.proxima_accion_bot = ahora + PAUSA_BOT_MS
+                self.lanzar_dados()
+                return
+            movimiento = bot.elegir_movimiento(self.juego)
+        self.proxima_accion_bot = ahora + PAUSA_BOT_MS
+        if movimiento is None:
+            self.terminar_turno()
+        else:
+            self.jugar_movimiento(movimiento)
+    
+    def pedir_jugada_ia(self):
+        if self.trabajador_ia is None:
+            self.trabajador_ia = TrabajadorIA(self.bots, self.evento_ia)
+        self.posicion_ia = self.juego.exportar_estado()
+        self.pedido_ia = self.trabajador_ia.pedir(self.juego)
+        self.respuesta_ia = None
+    
+    def vigilar_pedido_ia(self):
+        # Si la posicion cambio desde el pedido, la busqueda ya no sirve
+        if self.pedido_ia is not None and self.juego.exportar_estado() != self.posicion_ia:
+            self.trabajador_ia.cancelar()
+            self.pedido_ia = self.posicion_ia = self.respuesta_ia = None
+    
+    # ---------------------
+    # CLICS: INDICE ESPACIAL DE OBJETIVOS
+    # ---------------------
+    def construir_indice_clics(self):
+        # El orden de registro es la prioridad cuando dos objetivos se
+        # solapan (las esquinas del tablero tienen dos casillas en el mismo
+        # sitio): botones, dados, casillas externas, vias internas y carcel.
+        indice = IndiceClics(self.screen_width, self.screen_height)
+        indice.agregar_rect(("boton", 0), self.boton_lanzar)
+        indice.agregar_rect(("boton", 1), self.boton_terminar)
+        for k in range(2):
+            indice.agregar_rect(("dado", k), pygame.Rect(500 + k*60, TAMANO_TABLERO + 30, 40, 40))
+        
+        # Casillas y celdas: |x - cx| < 15 y |y - cy| < 15
+        for pos in range(NUM_CASILLAS_EXTERNAS):
+            cx, cy = coordenadas_del_tablero_externo[pos]
+            indice.agregar_rect(("casilla", pos), pygame.Rect(cx - 14, cy - 14, 29, 29))
+        for j, datos in enumerate(DATOS_JUGADORES):
+            for idx, (cx, cy) in enumerate(coordenadas_de_la_via_interna[datos[0]]):
+                indice.agregar_rect(("interna", j, idx), pygame.Rect(cx - 14, cy - 14, 29, 29))
+        
+        # Puestos de la carcel: el k-esimo es la k-esima ficha encarcelada
+        for j, datos in enumerate(DATOS_JUGADORES):
+            info_carcel = posiciones_de_la_carcel[datos[0]]
+            for k in range(FICHAS_POR_JUGADOR):
+                indice.agregar_circulo(("carcel", j, k), info_carcel["x"],
+                                       info_carcel["y"] + k * info_carcel["offset_y"], 15)
+        return indice
+    
+    def ficha_en_objetivo(self, objetivo):
+        # Ficha del jugador en turno que se elige con ese objetivo, o None.
+        # En una casilla con varias fichas apiladas se elige la primera del
+        # jugador en orden de llegada.
+        juego = self.juego
+        actual = juego.indice_jugador_actual
+        tipo = objetivo[0]
+        if tipo == "casilla":
+            pos = objetivo[1]
+            if juego.ocupacion[pos] and juego.ocupacion_jugador[pos * NUM_JUGADORES + actual]:
+                for f in juego.fichas_en(pos):
+                    if f.indice // FICHAS_POR_JUGADOR == actual:
+                        return f
+        elif tipo == "interna":
+            if objetivo[1] == actual:
+                codigo = BASE_INTERNA + objetivo[2]
+                for f in juego.jugadores[actual].fichas:
+                    if f.estado == codigo:
+                        return f
+        elif tipo == "carcel":
+            if objetivo[1] == actual:
+                en_carcel = [f for f in juego.jugadores[actual].fichas if f.en_carcel()]
+                if objetivo[2] < len(en_carcel):
+                    return en_carcel[objetivo[2]]
+        return None
+    
+    def objetivo_en(self, pos):
+        # Lo que haria un clic en pos: ("boton", k), ("dado", valor),
+        # ("ficha", ficha) o None. Sirve tambien para resaltar al pasar el raton.
+        x, y = pos
+        for objetivo in self.indice_clics.consultar(x, y):
+            tipo = objetivo[0]
+            if tipo == "boton":
+                return objetivo
+            if tipo == "dado":
+                if objetivo[1] < len(self.juego.valores_dados):
+                    return ("dado", self.juego.valores_dados[objetivo[1]])
+                continue
+            ficha = self.ficha_en_objetivo(objetivo)
+            if ficha is not None:
+                return ("ficha", ficha)
+        return None
+    
+    def manejar_click(self, pos):
+        # Durante el turno de un bot no se aceptan clics
+        if self.juego.indice_jugador_actual in self.bots:
+            return
+        
+        objetivo = self.objetivo_en(pos)
+        if objetivo is None:
+            return
+        tipo, valor = objetivo
+        if tipo == "boton":
+            if valor == 0:
+                self.lanzar_dados()
+            else:
+                self.terminar_turno()
+        elif tipo == "dado":
+            self.usar_dado(valor)
+        else:
+            self.ficha_seleccionada = valor
+            self.mensaje_estado = f"Seleccionada {valor}"
+    
+    def ms_hasta_proxima_accion(self):
+        # Cuanto falta para algo programado (la siguiente jugada de un bot),
+        # o None si la pantalla solo puede cambiar por un evento
+        if self.juego.indice_jugador_actual not in self.bots or self.juego.ganador() is not None:
+            return None
+        if self.segundo_plano and self.juego.valores_dados:
+            if self.pedido_ia is None:
+                return 0  # hay que mandar el pedido ya
+            if self.respuesta_ia is None:
+                return None  # la respuesta llega como evento
+        return max(0, self.proxima_accion_bot - pygame.time.get_ticks())
+    
+    def manejar_evento(self, event):
+        # Devuelve False si hay que salir
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:  # Clic izquierdo
+                self.manejar_click(event.pos)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_p:
+                self.mostrar_pista()
+            elif event.key == pygame.K_F3:
+                self.alternar_perfil()
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # La ventana estuvo tapada: hay que repintarla entera
+            self.redibujar_todo = True
+        elif event.type == self.evento_ia:
+            # Respuestas de pedidos cancelados se descartan
+            if event.numero == self.pedido_ia:
+                self.respuesta_ia = (event.movimiento,)
+        return True
+    
+    def ejecutar(self, fps=0, ruta_perfil=None):
+        # fps > 0: bucle clasico que sondea eventos y dibuja a ritmo fijo.
+        # fps == 0: el bucle duerme en pygame.event.wait hasta que llega un
+        # evento o toca la siguiente accion programada, y solo dibuja lo que
+        # cambio.
+        if fps > 0:
+            self.ejecutar_sondeo(fps)
+        else:
+            self.ejecutar_por_eventos()
+        if self.trabajador_ia is not None:
+            self.trabajador_ia.cerrar()
+        if ruta_perfil and self.perfil is not None:
+            self.perfil.guardar(ruta_perfil)
+        pygame.quit()
+        sys.exit()
+    
+    def ejecutar_sondeo(self, fps):
+        clock = pygame.time.Clock()
+        running = True
+        
+        while running:
+            perfil = self.perfil
+            if perfil is not None:
+                inicio = time.perf_counter()
+            for event in pygame.event.get():
+                running = self.manejar_evento(event) and running
+            if perfil is not None:
+                eventos = time.perf_counter()
+                perfil.sumar("eventos_ms", (eventos - inicio) * 1000)
+            
+            self.turno_bot()
+            if perfil is not None:
+                perfil.sumar("bot_ms", (time.perf_counter() - eventos) * 1000)
+            self.dibujar_tablero()
+            if perfil is not None:
+                perfil.terminar_cuadro()
+            clock.tick(fps)
+    
+    def ejecutar_por_eventos(self):
+        intervalo = 1000 // FPS_MAXIMO
+        ultimo_cuadro = -intervalo
+        pendiente = True
+        
+        while True:
+            # Esperar al primer evento, a la proxima accion o al proximo cuadro
+            espera = self.ms_hasta_proxima_accion()
+            if pendiente:
+                falta = max(0, ultimo_cuadro + intervalo - pygame.time.get_ticks())
+                espera = falta if espera is None else min(espera, falta)
+            if espera is None:
+                espera = ESPERA_MAXIMA_MS
+            # event.wait(0) esperaria sin limite
+            primero = pygame.event.wait(espera) if espera > 0 else pygame.event.poll()
+            
+            perfil = self.perfil
+            if perfil is not None:
+                inicio = time.perf_counter()
+            eventos = pygame.event.get()
+            if primero.type != pygame.NOEVENT:
+                eventos.insert(0, primero)
+            urgente = False
+            for event in eventos:
+                if not self.manejar_evento(event):
+                    return
+                # Los clics se dibujan en el acto; el movimiento del raton y
+                # los bots se limitan a FPS_MAXIMO
+                urgente = urgente or event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN)
+            if perfil is not None:
+                tras_eventos = time.perf_counter()
+                perfil.sumar("eventos_ms", (tras_eventos - inicio) * 1000)
+            self.turno_bot()
+            if perfil is not None:
+                perfil.sumar("bot_ms", (time.perf_counter() - tras_eventos) * 1000)
+            
+            ahora = pygame.time.get_ticks()
+            pendiente = pendiente or bool(eventos) or self.ms_hasta_proxima_accion() is not None
+            if pendiente and (urgente or ahora - ultimo_cuadro >= intervalo):
+                self.dibujar_tablero()
+                if perfil is not None:
+                    perfil.terminar_cuadro()
+                ultimo_cuadro = ahora
+                pendiente = False
+
+# ---------------------
+# BENCHMARKS
+# ---------------------
+# Mediciones reproducibles del motor, de partidas completas, del dibujo (sin
+# ventana, con SDL_VIDEODRIVER=dummy) y de los clics. Todo sale de semillas
+# fijas: el corpus de posiciones se toma de partidas deterministas y se
+# clasifica por lo que hace el movimiento (captura, bloqueo, via interna,
+# salida de la carcel, normal). Cada medicion se repite y se guarda la
+# mediana; el resultado es un JSON que se puede comparar con uno anterior.
+VERSION_BENCHMARK = 1
+SEMILLA_BENCHMARK = 2024
+CASOS_POR_CATEGORIA = 64
+TOLERANCIA_BENCHMARK = 0.10
+DURACION_MINIMA_MEDIDA = 0.05  # segundos por repeticion, para que el reloj no pese
+CATEGORIAS_CORPUS = {
+    "captura": CAPTURAS,
+    "bloqueo": frozenset((RES_CAMINO_BLOQUEADO, RES_SALIDA_BLOQUEADA)),
+    "interna": frozenset((RES_ENTRA_INTERNA, RES_AVANZA_INTERNA, RES_META, RES_EXCESO_INTERNA)),
+    "carcel": frozenset((RES_SALE, RES_NECESITA_CINCO)),
+    "normal": frozenset((RES_MUEVE, RES_EXCESO)),
+}
+GRUPOS_BENCHMARK = ("motor", "partidas", "dibujo", "clics")
+
+def corpus_benchmark(semilla=SEMILLA_BENCHMARK, por_categoria=CASOS_POR_CATEGORIA):
+    # {categoria: [(juego, ficha, pasos)]} con posiciones de partidas
+    # deterministas; cada juego es una copia propia del estado
+    corpus = {categoria: [] for categoria in CATEGORIAS_CORPUS}
+    categoria_de = {resultado: categoria for categoria, resultados in CATEGORIAS_CORPUS.items()
+                    for resultado in resultados}
+    partida = 0
+    while any(len(casos) < por_categoria for casos in corpus.values()) and partida < 200:
+        juego = ParquesGame(rng=GeneradorDados(base_flujo(semilla, partida)))
+        politicas = politicas_deterministas(("azar",) * NUM_JUGADORES, base_flujo(semilla, partida))
+        for turno in range(MAX_TURNOS):
+            if juego.ganador() is not None:
+                break
+            if turno % 3 == 0:
+                base = juego.indice_jugador_actual * FICHAS_POR_JUGADOR
+                for i in range(base, base + FICHAS_POR_JUGADOR):
+                    for pasos in range(1, MAX_PASOS + 1):
+                        resultado, registro = juego.hacer_movimiento(i, pasos)
+                        if registro is not None:
+                            juego.deshacer_movimiento(registro)
+                        casos = corpus[categoria_de[resultado]]
+                        if len(casos) < por_categoria:
+                            casos.append((juego.copiar(), i, pasos))
+            jugar_turno(juego, politicas[juego.indice_jugador_actual])
+        partida += 1
+    return corpus
+
+def medir(lote, repeticiones, calibrar=True):
+    # lote(vueltas) repite el trabajo y devuelve cuantas operaciones hizo;
+    # las vueltas se doblan hasta que una repeticion dura al menos
+    # DURACION_MINIMA_MEDIDA. Devuelve la mediana de ns por operacion (sin
+    # el recolector ciclico).
+    tiempos = []
+    gc_activo = gc.isenabled()
+    gc.disable()
+    try:
+        vueltas = 1
+        while calibrar:
+            inicio = time.perf_counter_ns()
+            lote(vueltas)
+            if time.perf_counter_ns() - inicio >= DURACION_MINIMA_MEDIDA * 1e9:
+                break
+            vueltas *= 2
+        for _ in range(repeticiones):
+            inicio = time.perf_counter_ns()
+            operaciones = lote(vueltas)
+            tiempos.append((time.perf_counter_ns() - inicio) / operaciones)
+    finally:
+        if gc_activo:
+            gc.enable()
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+def resultado_benchmark(valor, unidad, mejor="menor"):
+    return {"valor": round(valor, 3), "unidad": unidad, "mejor": mejor}
+
+def benchmark_motor(repeticiones=7):
+    corpus = corpus_benchmark()
+    resultados = {}
+    casos = [(juego, juego.ficha(i), pasos) for lista in corpus.values() for juego, i, pasos in lista]
+    
+    def mover_todo(casos):
+        # mover_ficha y deshacer el movimiento para dejar la posicion igual
+        def lote(vueltas):
+            for _ in range(vueltas):
+                for juego, ficha, pasos in casos:
+                    resultado, registro = juego.hacer_movimiento(ficha.indice, pasos)
+                    juego.describir_movimiento(ficha, resultado, registro)
+                    if registro is not None:
+                        juego.deshacer_movimiento(registro)
+            return vueltas * len(casos)
+        return lote
+    
+    for categoria, lista in corpus.items():
+        if lista:
+            propios = [(juego, juego.ficha(i), pasos) for juego, i, pasos in lista]
+            resultados[f"motor.mover_ficha.{categoria}"] = resultado_benchmark(
+                medir(mover_todo(propios), repeticiones), "ns/op")
+    resultados["motor.mover_ficha"] = resultado_benchmark(medir(mover_todo(casos), repeticiones), "ns/op")
+    
+    caminos = [(juego, juego.posiciones[i], pasos) for juego, ficha, pasos in casos
+               for i in (ficha.indice,) if juego.posiciones[i] < NUM_CASILLAS_EXTERNAS]
+    def lote_camino(vueltas):
+        for _ in range(vueltas):
+            for juego, inicio, pasos in caminos:
+                juego.verificar_camino(inicio, pasos)
+        return vueltas * len(caminos)
+    resultados["motor.verificar_camino"] = resultado_benchmark(medir(lote_camino, repeticiones), "ns/op")
+    
+    juegos = [juego for lista in corpus.values() for juego, i, pasos in lista]
+    def lote_bloqueo(vueltas):
+        for _ in range(vueltas):
+            for juego in juegos:
+                for pos in range(NUM_CASILLAS_EXTERNAS):
+                    juego.es_bloqueo(pos)
+        return vueltas * len(juegos) * NUM_CASILLAS_EXTERNAS
+    resultados["motor.es_bloqueo"] = resultado_benchmark(medir(lote_bloqueo, repeticiones), "ns/op")
+    
+    # Las posiciones del corpus son de antes de tirar: se les ponen dados fijos
+    dados = GeneradorDados(SEMILLA_BENCHMARK)
+    con_dados = []
+    for juego in juegos:
+        copia = juego.copiar()
+        copia._fijar_dados([dados.randint(1, 6), dados.randint(1, 6)])
+        con_dados.append(copia)
+    def lote_legales(vueltas):
+        for _ in range(vueltas):
+            for juego in con_dados:
+                _cache_movimientos.pop(juego.clave_movimientos(), None)
+                juego.movimientos_legales()
+        return vueltas * len(con_dados)
+    resultados["motor.movimientos_legales"] = resultado_benchmark(medir(lote_legales, repeticiones), "ns/op")
+    return resultados
+
+def benchmark_partidas(partidas=200, repeticiones=3):
+    resultados = {}
+    for nombre in BOTS_DETERMINISTAS:
+        turnos = [0]
+        def lote(vueltas):
+            _cache_movimientos.clear()
+            turnos[0] = 0
+            for k in range(partidas):
+                turnos[0] += simular_partida_determinista((nombre,) * NUM_JUGADORES,
+                                                          base_flujo(SEMILLA_BENCHMARK, k)).turnos
+            return partidas
+        ns = medir(lote, repeticiones, calibrar=False)
+        resultados[f"partidas.{nombre}"] = resultado_benchmark(1e9 / ns, "partidas/s", "mayor")
+        resultados[f"partidas.{nombre}.turnos"] = resultado_benchmark(turnos[0] * 1e9 / (ns * partidas),
+                                                                      "turnos/s", "mayor")
+    if hay_numpy():
+        def lote_lote(vueltas):
+            ParquesLote([base_flujo(SEMILLA_BENCHMARK, k) for k in range(partidas * 5)]).ejecutar()
+            return partidas * 5
+        resultados["partidas.lote"] = resultado_benchmark(1e9 / medir(lote_lote, repeticiones, calibrar=False),
+                                                          "partidas/s", "mayor")
+    return resultados
+
+def interfaz_benchmark():
+    # Ventana sin pantalla con una partida fija
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    return InterfazParquesPygame(ParquesGame(rng=GeneradorDados(SEMILLA_BENCHMARK)), segundo_plano=False)
+
+def benchmark_dibujo(pasos=400, repeticiones=7):
+    interfaz = interfaz_benchmark()
+    juego = interfaz.juego
+    politicas = politicas_deterministas(("azar",) * NUM_JUGADORES, SEMILLA_BENCHMARK)
+    cuadros = []
+    for paso in range(pasos):
+        if juego.ganador() is not None:
+            break
+        if not juego.valores_dados:
+            interfaz.lanzar_dados()
+        else:
+            movimiento = politicas[juego.indice_jugador_actual].elegir_movimiento(juego)
+            if movimiento is None:
+                interfaz.terminar_turno()
+            else:
+                interfaz.jugar_movimiento(movimiento)
+        inicio = time.perf_counter_ns()
+        interfaz.dibujar_tablero()
+        cuadros.append(time.perf_counter_ns() - inicio)
+    cuadros.sort()
+    resultados = {
+        "dibujo.cuadro.mediana": resultado_benchmark(cuadros[len(cuadros) // 2] / 1e6, "ms"),
+        "dibujo.cuadro.p95": resultado_benchmark(cuadros[int(len(cuadros) * 0.95)] / 1e6, "ms"),
+    }
+    
+    def lote_completo(vueltas):
+        for _ in range(vueltas):
+            interfaz.redibujar_todo = True
+            interfaz.dibujar_tablero()
+        return vueltas
+    resultados["dibujo.cuadro_completo"] = resultado_benchmark(medir(lote_completo, repeticiones) / 1e6, "ms")
+    
+    def lote_quieto(vueltas):
+        for _ in range(vueltas):
+            interfaz.dibujar_tablero()
+        return vueltas
+    resultados["dibujo.cuadro_sin_cambios"] = resultado_benchmark(medir(lote_quieto, repeticiones) / 1e3, "us")
+    
+    def lote_dado(vueltas):
+        for _ in range(vueltas):
+            for valor in PUNTOS_DADO:
+                interfaz.dibujar_dado(50, TAMANO_TABLERO + 20, valor)
+        return vueltas * len(PUNTOS_DADO)
+    resultados["dibujo.dibujar_dado"] = resultado_benchmark(medir(lote_dado, repeticiones) / 1e3, "us")
+    return resultados
+
+def benchmark_clics(paso=5, repeticiones=7):
+    interfaz = interfaz_benchmark()
+    juego = interfaz.juego
+    politicas = politicas_deterministas(("azar",) * NUM_JUGADORES, SEMILLA_BENCHMARK)
+    for _ in range(60):
+        jugar_turno(juego, politicas[juego.indice_jugador_actual])
+    juego.lanzar_dados()
+    puntos = [(x, y) for x in range(0, interfaz.screen_width, paso)
+              for y in range(0, interfaz.screen_height, paso)]
+    # manejar_click solo con los puntos que no cambian la partida (fichas y
+    # zonas vacias): los botones y los dados tiran o mueven
+    tranquilos = [pos for pos in puntos
+                  if interfaz.objetivo_en(pos) is None or interfaz.objetivo_en(pos)[0] == "ficha"]
+    
+    def lote_objetivo(vueltas):
+        for _ in range(vueltas):
+            for pos in puntos:
+                interfaz.objetivo_en(pos)
+        return vueltas * len(puntos)
+    
+    def lote_click(vueltas):
+        for _ in range(vueltas):
+            for pos in tranquilos:
+                interfaz.manejar_click(pos)
+        return vueltas * len(tranquilos)
+    return {
+        "clics.objetivo_en": resultado_benchmark(medir(lote_objetivo, repeticiones), "ns/op"),
+        "clics.manejar_click": resultado_benchmark(medir(lote_click, repeticiones), "ns/op"),
+    }
+
+def ejecutar_benchmarks(grupos=GRUPOS_BENCHMARK, rapido=False):
+    funciones = {"motor": benchmark_motor, "partidas": benchmark_partidas,
+                 "dibujo": benchmark_dibujo, "clics": benchmark_clics}
+    resultados = {}
+    for grupo in grupos:
+        if rapido and grupo == "partidas":
+            resultados.update(benchmark_partidas(partidas=20, repeticiones=1))
+        else:
+            resultados.update(funciones[grupo]())
+    return {
+        "version": VERSION_BENCHMARK,
+        "semilla": SEMILLA_BENCHMARK,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "plataforma": sys.platform,
+        "numpy": hay_numpy(),
+        "rapido": rapido,
+        "resultados": resultados,
+    }
+
+def comparar_benchmarks(actual, base, tolerancia=TOLERANCIA_BENCHMARK):
+    # [(nombre, valor base, valor actual, cambio relativo, empeora)]; el
+    # cambio es positivo cuando mejora, sea "mejor" menor o mayor
+    filas = []
+    for nombre, medida in actual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nombre)
+        if anterior is None or not anterior["valor"]:
+            continue
+        cambio = medida["valor"] / anterior["valor"] - 1
+        if medida["mejor"] == "menor":
+            cambio = -cambio
+        filas.append((nombre, anterior["valor"], medida["valor"], cambio, cambio < -tolerancia))
+    return filas
+
+def informe_benchmarks(actual, filas=None):
+    lineas = []
+    cambios = {fila[0]: fila for fila in filas or ()}
+    for nombre, medida in actual["resultados"].items():
+        linea = f"{nombre:34} {medida['valor']:>12.3f} {medida['unidad']:<10}"
+        if nombre in cambios:
+            _, anterior, _, cambio, empeora = cambios[nombre]
+            linea += f" base {anterior:>12.3f}  {cambio:+7.1%}" + ("  REGRESION" if empeora else "")
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+# ---------------------
+# EJECUCION DEL JUEGO
+# ---------------------
+def indice_de_jugador(nombre):
+    for j, datos in enumerate(DATOS_JUGADORES):
+        if datos[0].lower() == nombre.lower() or datos[1] == nombre.lower():
+            return j
+    raise argparse.ArgumentTypeError(f"jugador desconocido: {nombre}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parques Tradicional")
+    parser.add_argument("--bots", nargs="*", type=indice_de_jugador, default=[],
+                        help="jugadores que controla la computadora (p. ej. Azul Verde)")
+    parser.add_argument("--presupuesto", type=float, default=50,
+                        help="tiempo de pensamiento de los bots por jugada, en ms")
+    parser.add_argument("--fps", type=int, default=0,
+                        help="redibujar a ritmo fijo (0: solo cuando algo cambia)")
+    parser.add_argument("--grabar", default=None,
+                        help="archivo donde grabar la partida (.prq)")
+    parser.add_argument("--autoguardado", default=None,
+                        help="archivo de autoguardado (por defecto en el directorio de datos del usuario; \"\" lo desactiva)")
+    parser.add_argument("--perfil", default=None,
+                        help="medir cada cuadro y guardar la linea de tiempo al salir (.csv o .json); F3 muestra el HUD")
+    parser.add_argument("--finales", default=None,
+                        help="tabla de finales para bots y pistas (se genera aparte con el subcomando finales)")
+    args = parser.parse_args(argv)
+    
+    # La tabla no se genera aqui: tarda segundos y la ventana tiene que abrir ya
+    finales = None
+    if args.finales:
+        if not os.path.exists(args.finales):
+            parser.error(f"no existe {args.finales}; generala con: python \"Parques final.py\" finales --salida {args.finales}")
+        finales = TablaFinales.abrir(args.finales)
+    bots = {j: BotExpectiminimax(presupuesto=args.presupuesto / 1000, finales=finales) for j in args.bots}
+    partida = ParquesGame()
+    diario = None
+    if args.autoguardado is None:
+        args.autoguardado = ruta_autoguardado()
+        os.makedirs(os.path.dirname(args.autoguardado), exist_ok=True)
+    if args.autoguardado:
+        diario = DiarioPartida.abrir(args.autoguardado, partida)
+        if partida.ganador() is not None:
+            # La partida guardada ya habia terminado: se empieza otra
+            diario.borrar()
+            partida = ParquesGame()
+            diario = DiarioPartida.abrir(args.autoguardado, partida)
+    repeticion = EscritorRepeticion.abrir(args.grabar, partida) if args.grabar else None
+    try:
+        juego = InterfazParquesPygame(partida, bots=bots, finales=finales,
+                                      perfil=Perfilador() if args.perfil else None)
+        if diario is not None and diario.restauradas is not None:
+            juego.mensaje_estado = "Partida restaurada."
+            if diario.aviso is not None:
+                print(f"Aviso: {diario.aviso}")
+                juego.mensaje_estado = "Partida restaurada (incompleta: ver la consola)."
+        juego.ejecutar(args.fps, args.perfil)
+    finally:
+        if repeticion is not None:
+            repeticion.cerrar()
+        if diario is not None:
+            if partida.ganador() is not None:
+                diario.borrar()
+            else:
+                diario.cerrar(partida)
+
+def main_torneo(argv=None):
+    parser = argparse.ArgumentParser(description="Torneo de bots de Parques (sin interfaz)")
+    parser.add_argument("politicas", nargs="+", choices=POLITICAS_TORNEO,
+                        help="bots que se enfrentan todos contra todos")
+    parser.add_argument("--partidas", type=int, default=1000,
+                        help="partidas por emparejamiento")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="procesos en paralelo (por defecto, uno por nucleo)")
+    parser.add_argument("--bloque", type=int, default=50,
+                        help="partidas por tarea enviada a cada proceso")
+    parser.add_argument("--presupuesto", type=float, default=50,
+                        help="tiempo de pensamiento de expectiminimax por jugada, en ms")
+    parser.add_argument("--max-turnos", type=int, default=MAX_TURNOS)
+    args = parser.parse_args(argv)
+    if len(args.politicas) < 2:
+        parser.error("hacen falta al menos dos politicas")
+    
+    inicio = time.perf_counter()
+    def progreso(marcadores, hechas, total):
+        transcurrido = time.perf_counter() - inicio
+        print(f"\n{hechas}/{total} partidas, {hechas / transcurrido:.1f} partidas/s")
+        print(informe_torneo(marcadores), flush=True)
+    
+    ejecutar_torneo(args.politicas, args.partidas, semilla=args.semilla, procesos=args.procesos,
+                    tamano_bloque=args.bloque, presupuesto=args.presupuesto / 1000,
+                    max_turnos=args.max_turnos, al_recibir=progreso)
+
+def main_texto(argv=None):
+    parser = argparse.ArgumentParser(description="Parques por consola (sin pygame)")
+    parser.add_argument("--bots", nargs="*", type=indice_de_jugador, default=[],
+                        help="jugadores que controla la computadora (p. ej. Azul Verde)")
+    parser.add_argument("--presupuesto", type=float, default=50,
+                        help="tiempo de pensamiento de los bots por jugada, en ms")
+    parser.add_argument("--semilla", type=int, default=None)
+    args = parser.parse_args(argv)
+    bots = {j: BotExpectiminimax(presupuesto=args.presupuesto / 1000) for j in args.bots}
+    InterfazTexto(ParquesGame(args.semilla), bots=bots).ejecutar()
+
+def validar_politicas(parser, politicas):
+    if len(politicas) != NUM_JUGADORES:
+        parser.error(f"hacen falta 1 o {NUM_JUGADORES} politicas")
+    for nombre in politicas:
+        if nombre not in POLITICAS_TORNEO:
+            parser.error(f"politica desconocida: {nombre} (elige entre {', '.join(POLITICAS_TORNEO)})")
+
+def main_simular(argv=None):
+    # Pensado para lanzar muchos procesos cortos: una linea JSON por partida
+    # (o solo el resumen). La partida k usa semilla_partida(semilla, 0, k),
+    # asi que --desde reparte un rango de partidas entre procesos.
+    parser = argparse.ArgumentParser(description="Simula partidas de Parques sin interfaz")
+    parser.add_argument("politicas", nargs="*", default=["primera"],
+                        help=f"bot de cada asiento ({', '.join(POLITICAS_TORNEO)}); con uno solo juega en los cuatro")
+    parser.add_argument("--partidas", type=int, default=1)
+    parser.add_argument("--desde", type=int, default=0, help="numero de la primera partida")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--presupuesto", type=float, default=50,
+                        help="tiempo de pensamiento de expectiminimax por jugada, en ms")
+    parser.add_argument("--max-turnos", type=int, default=MAX_TURNOS)
+    parser.add_argument("--resumen", action="store_true",
+                        help="solo victorias por asiento y turnos medios")
+    args = parser.parse_args(argv)
+    politicas = args.politicas * NUM_JUGADORES if len(args.politicas) == 1 else args.politicas
+    validar_politicas(parser, politicas)
+    
+    victorias = [0] * (NUM_JUGADORES + 1)  # la ultima cuenta las partidas sin ganador
+    turnos = 0
+    for k in range(args.desde, args.desde + args.partidas):
+        semilla = semilla_partida(args.semilla, 0, k)
+        bots = crear_politicas(politicas, semilla, args.presupuesto / 1000)
+        resultado = simular_partida(bots, max_turnos=args.max_turnos, rng=GeneradorDados(semilla))
+        victorias[NUM_JUGADORES if resultado.ganador is None else resultado.ganador] += 1
+        turnos += resultado.turnos
+        if not args.resumen:
+            print(json.dumps({"partida": k, "semilla": semilla, **resultado._asdict()}))
+    if args.resumen:
+        print(json.dumps({"partidas": args.partidas, "victorias": victorias[:NUM_JUGADORES],
+                          "sin_ganador": victorias[NUM_JUGADORES],
+                          "turnos_medios": turnos / max(1, args.partidas)}))
+
+def main_dataset(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta posiciones de autojuego a fragmentos .npy")
+    parser.add_argument("directorio", help="donde escribir los fragmentos e indice.json (se anade a lo que haya)")
+    parser.add_argument("politicas", nargs="*", default=["azar"],
+                        help=f"bot de cada asiento ({', '.join(POLITICAS_TORNEO)}); con uno solo juega en los cuatro")
+    parser.add_argument("--partidas", type=int, default=1000)
+    parser.add_argument("--desde", type=int, default=0, help="numero de la primera partida")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--presupuesto", type=float, default=50,
+                        help="tiempo de pensamiento de expectiminimax por jugada, en ms")
+    parser.add_argument("--max-turnos", type=int, default=MAX_TURNOS)
+    parser.add_argument("--filas-fragmento", type=int, default=FILAS_POR_FRAGMENTO,
+                        help="filas por archivo .npy")
+    args = parser.parse_args(argv)
+    politicas = args.politicas * NUM_JUGADORES if len(args.politicas) == 1 else args.politicas
+    validar_politicas(parser, politicas)
+    
+    inicio = time.perf_counter()
+    indice = exportar_dataset(args.directorio, politicas, args.partidas, semilla=args.semilla,
+                              desde=args.desde, presupuesto=args.presupuesto / 1000,
+                              max_turnos=args.max_turnos, filas_por_fragmento=args.filas_fragmento)
+    transcurrido = time.perf_counter() - inicio
+    print(f"{indice['filas']} posiciones de {indice['partidas']} partidas en "
+          f"{len(indice['fragmentos'])} fragmentos ({transcurrido:.1f} s)")
+
+def main_analizar(argv=None):
+    parser = argparse.ArgumentParser(description="Estadisticas de partidas grabadas (.prq), en paralelo")
+    parser.add_argument("rutas", nargs="+", help="archivos .prq o directorios donde buscarlos")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="procesos en paralelo (por defecto, uno por nucleo)")
+    parser.add_argument("--bloque", type=int, default=64, help="archivos por tarea enviada a cada proceso")
+    parser.add_argument("--json", default=None, help="guardar tambien los contadores en este archivo")
+    args = parser.parse_args(argv)
+    
+    inicio = time.perf_counter()
+    estadisticas = analizar_repeticiones(rutas_repeticiones(args.rutas), procesos=args.procesos,
+                                         tamano_bloque=args.bloque)
+    transcurrido = time.perf_counter() - inicio
+    print(informe_analisis(estadisticas))
+    print(f"({estadisticas.partidas + estadisticas.archivos_con_error} archivos en {transcurrido:.1f} s)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(estadisticas.como_dict(), f)
+
+def main_servidor(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de Parques en red (sin interfaz)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--tiempo-turno", type=float, default=TIEMPO_TURNO,
+                        help="segundos por turno antes de que el servidor juegue")
+    parser.add_argument("--repeticiones", default=None,
+                        help="directorio donde grabar cada sala (.prq)")
+    args = parser.parse_args(argv)
+    try:
+        cargar_asyncio().run(servir(args.host, args.puerto, args.tiempo_turno, args.repeticiones))
+    except KeyboardInterrupt:
+        pass
+
+def main_finales(argv=None):
+    parser = argparse.ArgumentParser(description="Genera la tabla de finales de Parques")
+    parser.add_argument("--salida", default=RUTA_TABLA_FINALES)
+    parser.add_argument("--anillo", type=int, default=RESTO_ANILLO,
+                        help="casillas del anillo antes de la entrada que cubre la tabla")
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+    tabla = TablaFinales.generar(args.anillo)
+    tabla.guardar(args.salida)
+    print(f"{len(tabla.valores)} posiciones en {time.perf_counter() - inicio:.1f} s -> {args.salida}")
+    print(f"Cuatro fichas al comienzo de la via interna: {tabla.valor((RESTO_INTERNA,) * FICHAS_POR_JUGADOR):.2f} turnos")
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de Parques (sin ventana)")
+    parser.add_argument("grupos", nargs="*",
+                        help="que medir: " + ", ".join(GRUPOS_BENCHMARK) + " (por defecto, todo)")
+    parser.add_argument("--salida", default=None, help="guardar los resultados en este JSON")
+    parser.add_argument("--base", default=None, help="JSON anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_BENCHMARK,
+                        help="empeoramiento relativo que se da por regresion (0.10 = 10 %%)")
+    parser.add_argument("--rapido", action="store_true", help="menos partidas (para pruebas)")
+    args = parser.parse_args(argv)
+    for grupo in args.grupos:
+        if grupo not in GRUPOS_BENCHMARK:
+            parser.error(f"grupo desconocido: {grupo}")
+    
+    actual = ejecutar_benchmarks(args.grupos or GRUPOS_BENCHMARK, args.rapido)
+    filas = None
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        if base.get("rapido") != actual["rapido"]:
+            print("Aviso: la base se midio con otro --rapido; las partidas no son comparables")
+        filas = comparar_benchmarks(actual, base, args.tolerancia)
+    print(informe_benchmarks(actual, filas))
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(actual, f, indent=2)
+    if filas and any(fila[4] for fila in filas):
+        sys.exit(1)
+
+# python "Parques final.py" <subcomando> ...; sin subcomando se abre la ventana
+SUBCOMANDOS = {
+    "torneo": main_torneo,
+    "servidor": main_servidor,
+    "finales": main_finales,
+    "benchmark": main_benchmark,
+    "texto": main_texto,
+    "simular": main_simular,
+    "dataset": main_dataset,
+    "analizar": main_analizar,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMANDOS:
+        SUBCOMANDOS[sys.argv[1]](sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,13 @@
+# El juego es un solo archivo con espacio en el nombre: se carga una vez como
+# modulo "parques" para que las pruebas puedan hacer "import parques"
+import importlib.util
+import os
+import sys
+
+RUTA_JUEGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Parques final.py")
+
+if "parques" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location("parques", RUTA_JUEGO)
+    _modulo = importlib.util.module_from_spec(_spec)
+    sys.modules["parques"] = _modulo
+    _spec.loader.exec_module(_modulo)
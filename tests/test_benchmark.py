@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+import parques as p
+
+
+def test_benchmark_guarda_y_compara(tmp_path, monkeypatch, capsys):
+    # Una sola vuelta por medida: aqui importa que todo corra, no el tiempo
+    monkeypatch.setattr(p, "DURACION_MINIMA_MEDIDA", 0)
+    salida = str(tmp_path / "actual.json")
+    p.main_benchmark(["motor", "partidas", "--rapido", "--salida", salida])
+    with open(salida) as f:
+        actual = json.load(f)
+    assert actual["version"] == p.VERSION_BENCHMARK and actual["rapido"]
+    assert "motor.movimientos_legales" in actual["resultados"]
+    assert "partidas.azar" in actual["resultados"]
+    assert all(medida["valor"] > 0 for medida in actual["resultados"].values())
+    
+    # Contra si mismo no hay regresiones; contra una base diez veces mejor, si
+    filas = p.comparar_benchmarks(actual, actual)
+    assert len(filas) == len(actual["resultados"]) and not any(fila[4] for fila in filas)
+    mas_rapida = {"rapido": True, "resultados": {
+        nombre: dict(medida, valor=medida["valor"] / 10 if medida["mejor"] == "menor" else medida["valor"] * 10)
+        for nombre, medida in actual["resultados"].items()}}
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps(mas_rapida))
+    capsys.readouterr()
+    with pytest.raises(SystemExit) as error:
+        p.main_benchmark(["motor", "--rapido", "--base", str(base)])
+    assert error.value.code == 1
+    assert "REGRESION" in capsys.readouterr().out
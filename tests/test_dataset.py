@@ -0,0 +1,31 @@
+import pytest
+
+import parques as p
+
+np = pytest.importorskip("numpy")
+
+
+def test_exportar_y_leer(tmp_path):
+    directorio = str(tmp_path / "datos")
+    p.exportar_dataset(directorio, ("azar",) * 4, 6, semilla=3, filas_por_fragmento=700)
+    indice = p.exportar_dataset(directorio, ("azar",) * 4, 2, semilla=3, desde=6, filas_por_fragmento=700)
+    assert indice["partidas"] == 8
+    
+    # Cada fragmento es un .npy normal
+    filas = np.concatenate([np.load(f"{directorio}/{f['archivo']}") for f in indice["fragmentos"]])
+    assert filas.shape == (indice["filas"], p.ANCHO_DATASET)
+    ganadores = [p.simular_partida([p.crear_politica("azar", p.semilla_partida(3, 0, k), a) for a in range(4)],
+                                   rng=p.GeneradorDados(p.semilla_partida(3, 0, k))).ganador for k in range(8)]
+    assert set(filas[:, p.COL_GANADOR].tolist()) <= set(ganadores)
+    for fila in filas[::50]:
+        juego = p.ParquesGame()
+        juego.cargar_posiciones(bytes(fila[:p.NUM_FICHAS]))
+        inicio, fin = p.COLUMNAS_DATASET["ocupacion"]
+        assert bytes(juego.ocupacion_jugador) == bytes(fila[inicio:fin])
+    
+    lector = p.LectorDataset(directorio)
+    vistas = [bytes(e) + bytes((g,)) for estados, ganadores in lector.lotes(64, semilla=1)
+              for e, g in zip(estados, ganadores)]
+    assert sorted(vistas) == sorted(bytes(f) for f in filas)
+    estados, ganadores = next(lector.lotes(64, mezclar=False))
+    assert np.shares_memory(estados, lector.fragmento(0))
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+import parques as p
+
+
+def jugar(juego, acciones, rng):
+    # Como la ventana: a veces sumas con los dados al reves y movimientos que
+    # el motor rechaza
+    for _ in range(acciones):
+        if juego.ganador() is not None:
+            return
+        if not juego.valores_dados:
+            juego.lanzar_dados()
+            continue
+        movimientos = juego.movimientos_legales()
+        eleccion = rng.random()
+        if eleccion < 0.1:
+            i = juego.indice_jugador_actual * p.FICHAS_POR_JUGADOR + rng.randrange(p.FICHAS_POR_JUGADOR)
+            valor = rng.choice(juego.valores_dados)
+            juego.aplicar_movimiento((i, valor, (valor,)))
+        elif not movimientos or eleccion < 0.15:
+            juego.terminar_turno()
+        else:
+            i, pasos, dados = rng.choice(movimientos)
+            juego.aplicar_movimiento((i, pasos, dados[::-1]))
+
+
+@pytest.mark.parametrize("semilla", range(6))
+def test_restaurar_tras_un_corte(tmp_path, semilla):
+    rng = random.Random(semilla)
+    ruta = str(tmp_path / "partida.guardado")
+    juego = p.ParquesGame(rng=p.GeneradorDados(semilla))
+    diario = p.DiarioPartida.abrir(ruta, juego, compactar_cada=50)
+    jugar(juego, 300 + 37 * semilla, rng)
+    diario.sincronizar()  # sin cerrar: como si el programa se cayera
+    
+    restaurado = p.ParquesGame()
+    otro = p.DiarioPartida(ruta)
+    assert otro.restaurar(restaurado)
+    assert otro.aviso is None
+    assert restaurado.exportar_estado() == juego.exportar_estado()
+    assert bytes(restaurado.posiciones) == bytes(juego.posiciones)
+    assert restaurado.hash == juego.hash
+    diario.cerrar(juego)
+
+
+def test_diario_corrupto_avisa(tmp_path):
+    ruta = str(tmp_path / "partida.guardado")
+    juego = p.ParquesGame(rng=p.GeneradorDados(3))
+    diario = p.DiarioPartida.abrir(ruta, juego)
+    jugar(juego, 40, random.Random(3))
+    diario.cerrar()
+    # Un movimiento de una ficha de otro jugador al final del diario
+    with open(ruta + ".diario", "ab") as f:
+        f.write(p.registro_movimiento((juego.indice_jugador_actual + 1) % p.NUM_JUGADORES * p.FICHAS_POR_JUGADOR, (1,)))
+    restaurado = p.ParquesGame()
+    otro = p.DiarioPartida(ruta)
+    otro.restaurar(restaurado)
+    assert otro.aviso is not None and f"accion {otro.restauradas}" in otro.aviso
+    assert restaurado.exportar_estado() == juego.exportar_estado()
@@ -0,0 +1,59 @@
+import pickle
+import random
+
+import pytest
+
+import parques as p
+
+
+@pytest.fixture(scope="module")
+def tablas(tmp_path_factory):
+    # Tabla pequena (dos casillas de anillo) en memoria y abierta con mmap
+    ruta = str(tmp_path_factory.mktemp("finales") / "finales.tbl")
+    generada = p.TablaFinales.generar(2)
+    generada.guardar(ruta)
+    abierta = p.TablaFinales.abrir(ruta)
+    yield generada, abierta
+    abierta.cerrar()
+
+
+def test_tabla_abierta_con_mmap_como_la_generada(tablas, tmp_path):
+    generada, abierta = tablas
+    assert abierta.mapa is not None and abierta.resto_maximo == generada.resto_maximo
+    assert list(abierta.valores) == list(generada.valores)
+    # Mas camino por recorrer nunca cuesta menos turnos
+    assert abierta.valor((1, 2, 3, 4)) > abierta.valor((0, 1, 2, 3))
+    # Otro proceso la recibe reabriendo el archivo
+    copia = pickle.loads(pickle.dumps(abierta))
+    assert copia.ruta == abierta.ruta and list(copia.valores) == list(abierta.valores)
+    copia.cerrar()
+    (tmp_path / "otra.tbl").write_bytes(b"XXXX" + bytes(60))
+    with pytest.raises(ValueError):
+        p.TablaFinales.abrir(str(tmp_path / "otra.tbl"))
+
+
+def test_expectiminimax_juega_el_final_de_la_tabla(tablas):
+    generada, abierta = tablas
+    rng = random.Random(20)
+    con_tabla = p.BotExpectiminimax(presupuesto=0.02, finales=abierta)
+    sin_tabla = p.BotExpectiminimax(presupuesto=0.02)
+    rematadas = 0
+    for partida in range(40):
+        # Muchas fichas ya en la meta, para que haya finales que se rematan
+        restos = [rng.choice((0, 0, 1, 2, 4, p.RESTO_INTERNA)) for i in range(p.FICHAS_POR_JUGADOR)]
+        juego = p.ParquesGame(0)
+        for i, resto in enumerate(restos):
+            juego.colocar_ficha(i, p.META - resto)
+        juego.aplicar_tirada(rng.randint(1, 6), rng.randint(1, 6))
+        if juego.todas_llegaron(0) or not juego.movimientos_legales():
+            continue
+        esperado, turnos = abierta.mejor_movimiento(juego)
+        assert generada.mejor_movimiento(juego) == (esperado, turnos)
+        assert con_tabla.elegir_movimiento(juego) == esperado
+        if turnos == pytest.approx(1.0):
+            # Se remata con estos dados: la busqueda sin tabla tambien lo ve
+            while juego.valores_dados and not juego.todas_llegaron(0):
+                juego.aplicar_movimiento(sin_tabla.elegir_movimiento(juego))
+            assert juego.todas_llegaron(0)
+            rematadas += 1
+    assert rematadas
@@ -0,0 +1,248 @@
+import os
+
+import pytest
+
+import parques as p
+
+# Sin pantalla: SDL dibuja en memoria
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+
+@pytest.fixture
+def interfaz():
+    interfaz = p.InterfazParquesPygame(p.ParquesGame(rng=p.GeneradorDados(5)), segundo_plano=False)
+    yield interfaz
+    pygame.quit()
+
+
+def pasos_de_partida(interfaz, pasos, semilla=5):
+    # Juega desde la interfaz (como los clics) y cede tras cada accion
+    juego = interfaz.juego
+    politicas = p.politicas_deterministas(("azar",) * p.NUM_JUGADORES, semilla)
+    for paso in range(pasos):
+        if juego.ganador() is not None:
+            return
+        if not juego.valores_dados:
+            interfaz.lanzar_dados()
+        else:
+            movimiento = politicas[juego.indice_jugador_actual].elegir_movimiento(juego)
+            if movimiento is None:
+                interfaz.terminar_turno()
+            else:
+                interfaz.jugar_movimiento(movimiento)
+        yield paso
+
+
+def pantalla(interfaz):
+    return pygame.image.tostring(interfaz.screen, "RGB")
+
+
+def test_repintar_solo_lo_sucio_da_la_misma_imagen(interfaz):
+    interfaz.perfil = p.Perfilador()
+    for paso in pasos_de_partida(interfaz, 150):
+        if paso % 3 == 0:
+            interfaz.ficha_seleccionada = interfaz.juego.ficha(paso * 7 % p.NUM_FICHAS)
+        interfaz.dibujar_tablero()
+        parcial = pantalla(interfaz)
+        interfaz.redibujar_todo = True
+        interfaz.dibujar_tablero()
+        assert pantalla(interfaz) == parcial, paso
+    
+    # Sin cambios no se repinta nada
+    interfaz.perfil.terminar_cuadro()
+    interfaz.dibujar_tablero()
+    interfaz.perfil.terminar_cuadro()
+    assert interfaz.perfil.recientes[-1]["rects"] == 0
+    assert interfaz.perfil.recientes[-1]["blits"] == 0
+
+
+def test_cache_de_textos_devuelve_la_misma_superficie(interfaz):
+    cache = p.CacheTextos(limite=2)
+    fuente = interfaz.font
+    primera = cache.render(fuente, "Turno de: Rojo", (0, 0, 0))
+    assert cache.render(fuente, "Turno de: Rojo", (0, 0, 0)) is primera
+    assert pygame.image.tostring(primera, "RGBA") == pygame.image.tostring(
+        fuente.render("Turno de: Rojo", True, (0, 0, 0)), "RGBA")
+    # La que lleva mas tiempo sin usarse es la que sale
+    cache.render(fuente, "a", (0, 0, 0))
+    cache.render(fuente, "Turno de: Rojo", (0, 0, 0))
+    cache.render(fuente, "b", (0, 0, 0))
+    assert len(cache.superficies) == 2
+    assert cache.render(fuente, "Turno de: Rojo", (0, 0, 0)) is primera
+    
+    # Con la cache vacia el tablero sale igual
+    for paso in pasos_de_partida(interfaz, 40):
+        interfaz.mensaje_estado = f"mensaje {paso}"
+        interfaz.dibujar_tablero()
+    assert len(interfaz.textos.superficies) <= p.LIMITE_CACHE_TEXTOS
+    antes = pantalla(interfaz)
+    interfaz.textos.superficies.clear()
+    interfaz.redibujar_todo = True
+    interfaz.dibujar_tablero()
+    assert pantalla(interfaz) == antes
+
+
+def test_imagenes_predibujadas_como_el_dibujo_directo(interfaz):
+    # Caras del dado y fichas copiadas deben quedar como si se dibujaran ahi
+    c = p.CENTRO_IMAGEN
+    for valor in p.PUNTOS_DADO:
+        directo = pygame.Surface((60, 60))
+        directo.fill(p.COLOR_FONDO)
+        rect = pygame.Rect(10, 10, 40, 40)
+        pygame.draw.rect(directo, p.COLOR_DADO, rect, border_radius=5)
+        pygame.draw.rect(directo, (0, 0, 0), rect, 2, border_radius=5)
+        for px, py in p.PUNTOS_DADO[valor]:
+            pygame.draw.circle(directo, p.COLOR_DADO_PUNTO, (10 + px, 10 + py), 4)
+        copiado = pygame.Surface((60, 60))
+        copiado.fill(p.COLOR_FONDO)
+        copiado.blit(interfaz.caras_dado[valor], (10, 10))
+        assert pygame.image.tostring(copiado, "RGB") == pygame.image.tostring(directo, "RGB"), valor
+    for nombre, color in p.COLORES_JUGADORES.items():
+        directo = pygame.Surface((40, 40))
+        directo.fill(p.COLOR_TABLERO)
+        pygame.draw.circle(directo, color, (20, 20), p.RADIO_FICHA)
+        pygame.draw.circle(directo, (0, 0, 0), (20, 20), p.RADIO_FICHA, 1)
+        copiado = pygame.Surface((40, 40))
+        copiado.fill(p.COLOR_TABLERO)
+        copiado.blit(interfaz.imagen_ficha[nombre], (20 - c, 20 - c))
+        assert pygame.image.tostring(copiado, "RGB") == pygame.image.tostring(directo, "RGB"), nombre
+
+
+def test_bucle_por_eventos_no_dibuja_si_nada_cambia(interfaz):
+    assert interfaz.ms_hasta_proxima_accion() is None
+    interfaz.perfil = p.Perfilador()
+    pygame.time.set_timer(pygame.QUIT, 200, 1)
+    interfaz.ejecutar_por_eventos()
+    # Solo el primer cuadro: esperando eventos no se redibuja
+    assert interfaz.perfil.cuadros == 1
+
+
+def test_bucle_por_eventos_con_bots_limita_los_cuadros(interfaz, monkeypatch):
+    # Sin pausa los bots juegan en cada vuelta del bucle, pero no se dibujan
+    # mas de FPS_MAXIMO cuadros por segundo
+    monkeypatch.setattr(p, "PAUSA_BOT_MS", 0)
+    interfaz.bots = {j: p.BotAleatorio() for j in range(p.NUM_JUGADORES)}
+    interfaz.perfil = p.Perfilador()
+    jugadas = []
+    jugar_movimiento = interfaz.jugar_movimiento
+    monkeypatch.setattr(interfaz, "jugar_movimiento", lambda m: jugadas.append(m) or jugar_movimiento(m))
+    
+    def oyente(registro):
+        if interfaz.juego.ganador() is not None:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+    interfaz.perfil.oyentes.append(oyente)
+    inicio = pygame.time.get_ticks()
+    interfaz.ejecutar_por_eventos()
+    duracion = pygame.time.get_ticks() - inicio
+    assert interfaz.juego.ganador() is not None
+    assert interfaz.perfil.cuadros <= duracion // (1000 // p.FPS_MAXIMO) + 2
+    assert len(jugadas) > interfaz.perfil.cuadros
+
+
+def objetivo_lineal(interfaz, x, y):
+    # La busqueda de antes del indice: todos los objetivos uno por uno
+    juego = interfaz.juego
+    if interfaz.boton_lanzar.collidepoint(x, y):
+        return ("boton", 0)
+    if interfaz.boton_terminar.collidepoint(x, y):
+        return ("boton", 1)
+    if y > p.TAMANO_TABLERO:
+        for k, valor in enumerate(juego.valores_dados):
+            if pygame.Rect(500 + k*60, p.TAMANO_TABLERO + 30, 40, 40).collidepoint(x, y):
+                return ("dado", valor)
+    if y < p.TAMANO_TABLERO:
+        actual = juego.jugador_actual()
+        for pos, (cx, cy) in p.coordenadas_del_tablero_externo.items():
+            if abs(x - cx) < 15 and abs(y - cy) < 15 and juego.ocupacion[pos]:
+                for f in juego.fichas_en(pos):
+                    if f.jugador == actual:
+                        return ("ficha", f.indice)
+        for idx, (cx, cy) in enumerate(p.coordenadas_de_la_via_interna[actual.nombre]):
+            if abs(x - cx) < 15 and abs(y - cy) < 15:
+                for f in actual.fichas:
+                    if f.estado == p.BASE_INTERNA + idx:
+                        return ("ficha", f.indice)
+        for jugador in juego.jugadores:
+            carcel = p.posiciones_de_la_carcel[jugador.nombre]
+            cont = 0
+            for f in jugador.fichas:
+                if f.en_carcel():
+                    py = carcel["y"] + cont * carcel["offset_y"]
+                    cont += 1
+                    if (x - carcel["x"]) ** 2 + (y - py) ** 2 < 225 and f.jugador == actual:
+                        return ("ficha", f.indice)
+    return None
+
+
+def test_indice_de_clics_como_la_busqueda_lineal(interfaz):
+    # Cada posicion mira un tercio de los pixeles, desplazado: entre todas
+    # pasan por los bordes de cada forma
+    comprobadas = 0
+    for paso in pasos_de_partida(interfaz, 360):
+        if paso % 60:
+            continue
+        desplazamiento = comprobadas % 3
+        for x in range(desplazamiento, interfaz.screen_width, 3):
+            for y in range(comprobadas // 3 % 3, interfaz.screen_height, 3):
+                objetivo = interfaz.objetivo_en((x, y))
+                if objetivo is not None and objetivo[0] == "ficha":
+                    objetivo = ("ficha", objetivo[1].indice)
+                assert objetivo == objetivo_lineal(interfaz, x, y), (paso, x, y)
+        comprobadas += 1
+    assert comprobadas >= 5
+
+
+def test_trabajador_ia_devuelve_un_movimiento_legal(interfaz, tmp_path, monkeypatch):
+    # El proceso hijo ("spawn") importa el juego por su nombre de modulo
+    (tmp_path / "parques.py").symlink_to(p.__file__)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    bots = {j: p.BotExpectiminimax(presupuesto=0.02) for j in range(p.NUM_JUGADORES)}
+    trabajador = p.TrabajadorIA(bots, interfaz.evento_ia)
+    try:
+        pedidos = 0
+        for paso in pasos_de_partida(interfaz, 200):
+            juego = interfaz.juego
+            if paso % 20 or not juego.hay_movimientos():
+                continue
+            numero = trabajador.pedir(juego)
+            evento = pygame.event.wait(10000)
+            while evento.type != interfaz.evento_ia:
+                assert evento.type != pygame.NOEVENT, "el trabajador no respondio"
+                evento = pygame.event.wait(10000)
+            assert evento.numero == numero
+            assert evento.movimiento in juego.movimientos_legales()
+            pedidos += 1
+        assert pedidos >= 3
+    finally:
+        trabajador.cerrar()
+
+
+def test_perfil_con_f3_y_exportado(interfaz, tmp_path):
+    assert interfaz.perfil is None
+    tecla = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F3, mod=0, unicode="", scancode=0)
+    interfaz.manejar_evento(tecla)
+    assert interfaz.mostrar_perfil and interfaz.perfil is not None
+    for paso in pasos_de_partida(interfaz, 60):
+        interfaz.dibujar_tablero()
+        interfaz.perfil.terminar_cuadro()
+    perfil = interfaz.perfil
+    assert perfil.cuadros == 60 and perfil.movimientos > 0
+    assert len(interfaz.texto_perfil) == len(perfil.lineas_hud()) == 5
+    # Al ocultarlo el HUD deja de dibujarse, pero el perfil sigue midiendo
+    con_hud = pantalla(interfaz)
+    interfaz.manejar_evento(tecla)
+    interfaz.dibujar_tablero()
+    assert not interfaz.mostrar_perfil and pantalla(interfaz) != con_hud
+    assert interfaz.perfil is perfil
+
+    perfil.guardar(str(tmp_path / "perfil.csv"))
+    perfil.guardar(str(tmp_path / "perfil.json"))
+    filas = (tmp_path / "perfil.csv").read_text().splitlines()
+    assert filas[0].split(",") == list(p.CAMPOS_PERFIL)
+    datos = p.json.loads((tmp_path / "perfil.json").read_text())
+    assert datos["campos"] == list(p.CAMPOS_PERFIL)
+    assert len(datos["cuadros"]) == len(filas) - 1 == perfil.cuadros
+    assert datos["resumen"]["cuadros"] == perfil.cuadros
+    assert datos["resumen"]["cuadro_ms_p50"] > 0
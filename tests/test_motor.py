@@ -0,0 +1,175 @@
+import random
+
+import pytest
+
+import parques as p
+
+
+def posiciones_de_partida(semilla, n=40):
+    # Posiciones variadas (antes de tirar) de una partida con jugadas al azar
+    rng = random.Random(semilla)
+    juego = p.ParquesGame(semilla)
+    vistas = []
+    for turno in range(n * 4):
+        if juego.ganador() is not None:
+            break
+        if turno % 4 == 0:
+            vistas.append(juego.copiar())
+        juego.lanzar_dados()
+        while juego.valores_dados:
+            movimientos = juego.movimientos_legales()
+            if not movimientos:
+                juego.terminar_turno()
+                break
+            juego.jugar(rng.choice(movimientos))
+    return vistas
+
+
+def movimientos_sin_cache(juego):
+    dados = juego.valores_dados
+    base = juego.indice_jugador_actual * p.FICHAS_POR_JUGADOR
+    opciones = []
+    for valor in dados:
+        if (valor,) not in opciones:
+            opciones.append((valor,))
+    if len(dados) == 2:
+        opciones.append(tuple(dados))
+    movimientos = []
+    for usados in opciones:
+        pasos = sum(usados)
+        for i in range(base, base + p.FICHAS_POR_JUGADOR):
+            if juego.es_movimiento_legal(i, pasos):
+                movimientos.append((i, pasos, usados))
+    return movimientos
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_cache_de_movimientos_respeta_el_orden_de_los_dados(semilla):
+    p._cache_movimientos.clear()
+    for juego in posiciones_de_partida(semilla):
+        for d1 in range(1, 7):
+            for d2 in range(1, 7):
+                # Primero en un orden y luego en el otro, para que el segundo
+                # llegue con la cache ya llena
+                for dados in ([min(d1, d2), max(d1, d2)], [max(d1, d2), min(d1, d2)]):
+                    copia = juego.copiar()
+                    copia._fijar_dados(list(dados))
+                    assert list(copia.movimientos_legales()) == movimientos_sin_cache(copia)
+                    for movimiento in copia.movimientos_legales():
+                        assert all(valor in copia.valores_dados for valor in movimiento[2])
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_deshacer_movimiento_restaura_estado_y_hash(semilla):
+    for juego in posiciones_de_partida(semilla):
+        antes = juego.exportar_estado()
+        hash_antes = juego.hash
+        for i in range(p.NUM_FICHAS):
+            for pasos in range(1, p.MAX_PASOS + 1):
+                juego.fijar_turno(i // p.FICHAS_POR_JUGADOR)
+                estado = juego.exportar_estado()
+                hash_estado = juego.hash
+                resultado, registro = juego.hacer_movimiento(i, pasos)
+                if registro is not None:
+                    assert juego.hash == juego.calcular_hash()
+                    juego.deshacer_movimiento(registro)
+                assert juego.exportar_estado() == estado
+                assert juego.hash == hash_estado == juego.calcular_hash()
+        juego.importar_estado(antes)
+        assert juego.hash == hash_antes
+
+
+def test_lote_coincide_con_el_motor():
+    pytest.importorskip("numpy")
+    semillas = [p.base_flujo(7, k) for k in range(24)]
+    for politicas in (("primera",) * 4, ("azar",) * 4, ("primera", "azar", "azar", "primera")):
+        lote = p.ParquesLote(semillas, politicas)
+        lote.ejecutar()
+        esperados = [tuple(p.simular_partida_determinista(politicas, s)) for s in semillas]
+        assert [tuple(r) for r in lote.resultados()] == esperados
+
+
+def valor_de_azar(juego, profundidad, tabla):
+    bot = p.BotExpectiminimax(tabla=tabla)
+    bot.raiz = juego.indice_jugador_actual
+    bot.sal = p.Z_RAIZ[bot.raiz]
+    bot.limite = float("inf")
+    return bot._azar(juego.copiar(), profundidad)
+
+
+def test_tabla_de_transposicion_distingue_la_ultima_ficha_movida():
+    # Con dos dobles seguidos, el tercero castiga a la ultima ficha movida:
+    # dos posiciones con el mismo hash pueden valer distinto
+    distintas = 0
+    for juego in posiciones_de_partida(5, 30):
+        j = juego.indice_jugador_actual
+        fuera = [i for i in range(j * p.FICHAS_POR_JUGADOR, (j + 1) * p.FICHAS_POR_JUGADOR)
+                 if juego.posiciones[i] != p.CARCEL]
+        if len(fuera) < 2:
+            continue
+        juego._fijar_dobles(j, 2)
+        otro = juego.copiar()
+        juego.ultima_ficha_movida[j] = fuera[0]
+        otro.ultima_ficha_movida[j] = fuera[-1]
+        assert juego.hash == otro.hash
+        
+        tabla = p.TablaTransposicion()
+        valor_de_azar(juego, 2, tabla)
+        esperado = valor_de_azar(otro, 2, p.TablaTransposicion())
+        assert valor_de_azar(otro, 2, tabla) == esperado
+        distintas += valor_de_azar(juego, 2, p.TablaTransposicion()) != esperado
+    assert distintas
+
+
+def final_en_la_via_interna(restos, dados):
+    # Jugador 0 con todas sus fichas a `restos` de la meta; el resto en la carcel
+    juego = p.ParquesGame(0)
+    for i, resto in enumerate(restos):
+        juego.colocar_ficha(i, p.META - resto)
+    juego.aplicar_tirada(*dados)
+    return juego
+
+
+@pytest.mark.parametrize("bot", [p.BotAleatorio(3), p.BotExpectiminimax(presupuesto=0.02)],
+                         ids=lambda bot: bot.nombre)
+def test_bots_eligen_jugadas_legales_sin_tocar_el_juego(bot):
+    for juego in posiciones_de_partida(8, 15):
+        juego.lanzar_dados()
+        if not juego.valores_dados:
+            continue
+        antes = (list(juego.posiciones), list(juego.valores_dados), juego.hash)
+        inicio = p.time.perf_counter()
+        movimiento = bot.elegir_movimiento(juego)
+        # El presupuesto es de tiempo de reloj: una iteracion de mas como mucho
+        assert p.time.perf_counter() - inicio < 0.5
+        assert (list(juego.posiciones), list(juego.valores_dados), juego.hash) == antes
+        legales = juego.movimientos_legales()
+        assert movimiento in legales if legales else movimiento is None
+
+
+def test_expectiminimax_con_turnos_que_todos_pasan():
+    # Con el resto de fichas en la carcel y conteo exacto a la meta, a veces
+    # nadie puede mover: la busqueda no debe pasar turnos sin fin
+    juego = final_en_la_via_interna((0, 0, 2, 4), (1, 2))
+    bot = p.BotExpectiminimax(presupuesto=0.2, profundidad_maxima=4)
+    assert bot.elegir_movimiento(juego) in juego.movimientos_legales()
+    assert bot.profundidad_alcanzada > 1
+
+
+def test_expectiminimax_remata_la_partida():
+    juego = final_en_la_via_interna((0, 0, 0, 3), (1, 2))
+    bot = p.BotExpectiminimax(presupuesto=0.05)
+    movimiento = bot.elegir_movimiento(juego)
+    assert bot.profundidad_alcanzada == 1
+    juego.aplicar_movimiento(movimiento)
+    assert juego.todas_llegaron(0)
+
+
+def test_torneo_reutiliza_la_tabla_del_proceso():
+    bots = p.crear_politicas(("expectiminimax", "primera") * 2, 1)
+    tabla = bots[0].tabla
+    assert bots[2].tabla is tabla and isinstance(bots[1], p.BOTS_DETERMINISTAS["primera"])
+    tabla.guardar(12345, 3, 0.5, p.TT_EXACTO)
+    # La siguiente partida usa la misma tabla, vacia
+    otros = p.crear_politicas(("expectiminimax",) * 4, 2)
+    assert all(bot.tabla is tabla for bot in otros) and tabla.buscar(12345) is None
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import parques as p
+
+
+def grabar_partida(ruta, semilla, politicas=("primera", "azar", "azar", "primera"), intervalo=16):
+    escritor = p.EscritorRepeticion.abrir(ruta, semilla=semilla, intervalo=intervalo)
+    bots = [p.crear_politica(nombre, semilla, asiento) for asiento, nombre in enumerate(politicas)]
+    resultado = p.simular_partida(bots, rng=p.GeneradorDados(semilla), registro=escritor)
+    escritor.cerrar()
+    return resultado
+
+
+@pytest.mark.parametrize("cortada", [False, True])
+def test_saltar_coincide_con_reproducir_desde_el_principio(tmp_path, cortada):
+    ruta = str(tmp_path / "partida.prq")
+    grabar_partida(ruta, 21)
+    if cortada:
+        # Sin el indice del final: se reconstruye leyendo los registros
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        with open(ruta, "wb") as f:
+            f.write(datos[:len(datos) * 2 // 3])
+    lector = p.LectorRepeticion(ruta)
+    estados = [lector.estado_en(0).exportar_estado()]
+    for numero, accion, juego in lector.reproducir():
+        estados.append(juego.exportar_estado())
+    assert len(estados) > 100
+    for n in list(range(0, len(estados), 7)) + [len(estados) - 1]:
+        juego = lector.estado_en(n)
+        assert juego is not None and juego.exportar_estado() == estados[n]
+        assert juego.hash == juego.calcular_hash()
+    assert lector.estado_en(len(estados)) is None
+    lector.cerrar()
+
+
+def test_analisis_coincide_con_las_partidas(tmp_path):
+    os.makedirs(tmp_path / "a" / "b")
+    esperado = p.EstadisticasPartidas()
+    capturas = penalizaciones = 0
+    for k in range(24):
+        semilla = p.semilla_partida(5, 0, k)
+        r = grabar_partida(str(tmp_path / ("a/b" if k % 2 else "a") / f"p{k:03d}.prq"), semilla)
+        esperado.partidas += 1
+        esperado.victorias[r.ganador] += 1
+        esperado.lanzamientos += r.turnos
+        capturas += r.capturas
+        penalizaciones += r.penalizaciones
+    (tmp_path / "a" / "roto.prq").write_bytes(b"basura")
+    
+    rutas = list(p.rutas_repeticiones([str(tmp_path)]))
+    assert len(rutas) == 25
+    serie = p.analizar_repeticiones(iter(rutas), procesos=1)
+    paralelo = p.analizar_repeticiones(iter(rutas), procesos=2, tamano_bloque=5)
+    assert serie.como_dict() == paralelo.como_dict()
+    assert serie.partidas == esperado.partidas and serie.archivos_con_error == 1
+    assert serie.victorias == esperado.victorias
+    assert serie.lanzamientos == esperado.lanzamientos
+    assert sum(serie.resultados[r] for r in p.CAPTURAS) == capturas
+    assert sum(serie.penalizaciones) == penalizaciones
+    assert sum(serie.duraciones) == serie.partidas
@@ -0,0 +1,133 @@
+import asyncio
+
+import parques as p
+
+
+def mismo_estado(a, b):
+    # Lo que transmiten instantaneas y deltas (ultima_ficha_movida y los
+    # movimientos extra se quedan en el servidor)
+    return (bytes(a.posiciones) == bytes(b.posiciones) and bytes(a.orden) == bytes(b.orden)
+            and a.indice_jugador_actual == b.indice_jugador_actual
+            and list(a.valores_dados) == list(b.valores_dados)
+            and bytes(a.contador_dobles) == bytes(b.contador_dobles) and a.ultimo_doble == b.ultimo_doble
+            and a.bloqueos == b.bloqueos and a.hash == b.hash)
+
+
+async def _partida_por_red(elegir):
+    # Cuatro clientes binarios juegan una partida entera; elegir(cliente)
+    # decide el mensaje de quien tiene el turno
+    servidor = p.ServidorParques(semilla=11)
+    puerto = await servidor.iniciar()
+    try:
+        clientes = [await p.ClienteParques.conectar("127.0.0.1", puerto, "sala", k, formato="binario")
+                    for k in range(p.NUM_JUGADORES)]
+        for cliente in clientes:
+            await cliente.recibir()
+            await cliente.recibir()
+        juego = servidor.salas["sala"].juego
+        acciones = 0
+        while juego.ganador() is None and acciones < 5000:
+            cliente = clientes[juego.indice_jugador_actual]
+            await cliente.enviar(elegir(cliente))
+            acciones += 1
+            for otro in clientes:
+                respuesta = await otro.recibir()
+                assert respuesta["tipo"] == "delta", respuesta
+                assert mismo_estado(otro.juego, juego)
+        return juego, acciones
+    finally:
+        await servidor.detener()
+
+
+def test_suma_con_los_dados_en_otro_orden():
+    invertidas = [0]
+    
+    def elegir(cliente):
+        juego = cliente.juego
+        if not juego.valores_dados:
+            return {"tipo": "lanzar"}
+        movimientos = juego.movimientos_legales()
+        if not movimientos:
+            return {"tipo": "pasar"}
+        # Preferir sumas y mandarlas con los dados al reves
+        i, pasos, dados = max(movimientos, key=lambda m: len(m[2]))
+        if len(dados) == 2 and dados[0] != dados[1]:
+            invertidas[0] += 1
+            dados = dados[::-1]
+        return {"tipo": "mover", "ficha": i, "dados": list(dados)}
+    
+    juego, acciones = asyncio.run(_partida_por_red(elegir))
+    assert juego.ganador() is not None
+    assert invertidas[0] > 10
+
+
+def acciones_de_partida(juego, bots, limite=3000):
+    # Genera una accion cada vez (lanzar, mover o pasar) hasta que alguien gana
+    for _ in range(limite):
+        if juego.ganador() is not None:
+            return
+        if not juego.valores_dados:
+            juego.lanzar_dados()
+        else:
+            movimiento = bots[juego.indice_jugador_actual].elegir_movimiento(juego)
+            if movimiento is None:
+                juego.terminar_turno()
+            else:
+                juego.aplicar_movimiento(movimiento)
+        yield
+
+
+def test_instantanea_y_deltas_reproducen_el_estado():
+    for semilla in range(4):
+        juego = p.ParquesGame(rng=p.GeneradorDados(semilla))
+        bots = p.politicas_deterministas(("azar",) * p.NUM_JUGADORES, semilla)
+        copia = p.ParquesGame()
+        assert p.aplicar_instantanea(copia, p.codificar_instantanea(juego, 0)) == 0
+        assert mismo_estado(copia, juego)
+        secuencia = 0
+        antes = p.foto_estado(juego)
+        for _ in acciones_de_partida(juego, bots):
+            secuencia += 1
+            delta = p.codificar_delta(secuencia, antes, juego)
+            antes = p.foto_estado(juego)
+            assert p.aplicar_delta(copia, delta)[0] == secuencia
+            assert mismo_estado(copia, juego)
+            # Una instantanea a mitad de partida tambien vale para empezar
+            if secuencia % 97 == 0:
+                otra = p.ParquesGame()
+                p.aplicar_instantanea(otra, p.codificar_instantanea(juego, secuencia))
+                assert mismo_estado(otra, juego)
+        assert juego.ganador() is not None
+
+
+async def _mensajes_mal_formados():
+    servidor = p.ServidorParques(semilla=3)
+    puerto = await servidor.iniciar()
+    try:
+        # Union mal formada: un error y se cierra la conexion, sin tumbar nada
+        for carga in (b'{"tipo":"unirse","sala":"s","asiento":"1"}', b'{"tipo":"unirse","asiento":[1]}',
+                      b"[]", b'"unirse"', b"{"):
+            reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+            writer.write(p.trama(p.MSG_JSON, carga))
+            tipo, respuesta = await p.leer_trama(reader)
+            assert p.json.loads(respuesta)["tipo"] == "error", carga
+            assert await reader.read() == b""
+            writer.close()
+        assert not servidor.clientes
+        
+        # Ya sentado: cada mensaje malo recibe su error y la conexion sigue
+        cliente = await p.ClienteParques.conectar("127.0.0.1", puerto, "s", 1, formato="binario")
+        assert (await cliente.recibir())["asiento"] == 1
+        await cliente.recibir()
+        for carga in (b"[]", b"3", b'{"tipo":"resincronizar","desde":[0]}', b"\xff"):
+            cliente.writer.write(p.trama(p.MSG_JSON, carga))
+            assert (await cliente.recibir())["tipo"] == "error", carga
+        await cliente.enviar({"tipo": "resincronizar", "desde": -1})
+        assert (await cliente.recibir())["tipo"] == "instantanea"
+        await cliente.cerrar()
+    finally:
+        await servidor.detener()
+
+
+def test_mensajes_mal_formados_reciben_un_error():
+    asyncio.run(_mensajes_mal_formados())
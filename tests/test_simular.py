@@ -0,0 +1,23 @@
+import json
+import subprocess
+import sys
+
+import parques as p
+
+
+def test_simular_sin_ventana_desde_la_linea_de_comandos(capsys):
+    # Proceso nuevo, como se lanza en lote: -X importtime lista cada modulo importado
+    argumentos = ["simular", "primera", "azar", "primera", "azar",
+                  "--partidas", "3", "--desde", "5", "--semilla", "7"]
+    proceso = subprocess.run([sys.executable, "-X", "importtime", p.__file__, *argumentos],
+                             capture_output=True, text=True, timeout=60, check=True)
+    importados = {linea.split("|")[-1].strip() for linea in proceso.stderr.splitlines()}
+    assert "json" in importados
+    assert not importados & {"pygame", "numpy", "asyncio"}
+
+    partidas = [json.loads(linea) for linea in proceso.stdout.splitlines()]
+    assert [partida["partida"] for partida in partidas] == [5, 6, 7]
+    assert all(set(partida) == {"partida", "semilla", *p.ResultadoPartida._fields} for partida in partidas)
+    # Las semillas por partida hacen que repetir el rango dentro del proceso da lo mismo
+    p.main_simular(argumentos[1:])
+    assert [json.loads(linea) for linea in capsys.readouterr().out.splitlines()] == partidas